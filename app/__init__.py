@@ -3,7 +3,7 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_restful import Api
 import os
 
-def create_app(config_name=None):
+def create_app(config_name=None, config_overrides=None):
     app = Flask(__name__)
     
     # Load configuration
@@ -12,14 +12,44 @@ def create_app(config_name=None):
     
     from config import config
     app.config.from_object(config[config_name])
+    if config_overrides:
+        app.config.update(config_overrides)
     
     # Initialize extensions
     from app.models import db
     db.init_app(app)
     
+    from app import auth
+    auth.init_app(app)
+    
+    from app.hashing import password_hasher
+    password_hasher.init_app(app)
+    
+    from app.search import suggest_index, trigram_index
+    suggest_index.init_app(app)
+    trigram_index.init_app(app)
+    
+    from app.facets import facet_counter
+    facet_counter.init_app(app)
+    
+    from app.categories import category_tree
+    category_tree.init_app(app)
+    
+    from app.response_cache import response_cache
+    response_cache.init_app(app)
+    
+    from app.conditional import catalog_version
+    catalog_version.init_app(app)
+    
+    from app.counters import view_counter
+    view_counter.init_app(app)
+    
     # Initialize Flask-RESTful
     api = Api(app)
     
+    from app import representations
+    representations.init_app(api, app)
+    
     # Import and register API resources
     from app.resources import (
         # Authentication APIs
@@ -44,9 +74,10 @@ def create_app(config_name=None):
         ContactAPI, NewsletterAPI,
         # Admin APIs
         AdminDashboardAPI, AdminProductAPI, AdminProductDetailAPI,
-        AdminOrderAPI, AdminOrderDetailAPI,
-        # Search API
-        SearchAPI
+        AdminProductImportAPI, AdminProductBulkPatchAPI, AdminInventoryAPI,
+        AdminOrderAPI, AdminOrderDetailAPI, AdminExportAPI,
+        # Search APIs
+        SearchAPI, SearchSuggestAPI
     )
     
     # Register API routes
@@ -95,11 +126,16 @@ def create_app(config_name=None):
     api.add_resource(AdminDashboardAPI, '/api/admin/dashboard')
     api.add_resource(AdminProductAPI, '/api/admin/products')
     api.add_resource(AdminProductDetailAPI, '/api/admin/products/<int:product_id>')
+    api.add_resource(AdminProductImportAPI, '/api/admin/products/import')
+    api.add_resource(AdminInventoryAPI, '/api/admin/inventory')
+    api.add_resource(AdminProductBulkPatchAPI, '/api/admin/products/bulk')
     api.add_resource(AdminOrderAPI, '/api/admin/orders')
     api.add_resource(AdminOrderDetailAPI, '/api/admin/orders/<int:order_id>')
+    api.add_resource(AdminExportAPI, '/api/admin/exports/<string:dataset>')
     
-    # Search route
+    # Search routes
     api.add_resource(SearchAPI, '/api/search')
+    api.add_resource(SearchSuggestAPI, '/api/search/suggest')
     
     # Create tables
     with app.app_context():
@@ -124,6 +160,12 @@ def create_app(config_name=None):
     
     @app.route('/health')
     def health_check():
-        return jsonify({"status": "healthy", "message": "Taru E-Commerce API is running"})
+        return jsonify({
+            "status": "healthy",
+            "message": "Taru E-Commerce API is running",
+            "auth_token_cache": auth.token_cache.stats(),
+            "response_cache": response_cache.stats(),
+            "view_counter": view_counter.stats()
+        })
 
     return app
@@ -0,0 +1,240 @@
+"""
+Authentication helpers: token principal cache, signed tokens and the current-user proxy
+"""
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.cache import LRUCache
+from app.models import db, User, UserSession
+
+# Slim identity cached per token so authenticated requests skip the user lookup
+Principal = namedtuple('Principal', ['user_id', 'is_admin', 'is_active', 'expires_at'])
+
+
+class CurrentUser:
+    """Per-request proxy around a cached Principal.
+
+    ``id``, ``is_admin`` and ``is_active`` are answered from the principal;
+    any other attribute loads the full User row on first access.
+    """
+    __slots__ = ('_principal', '_user')
+
+    def __init__(self, principal, user=None):
+        object.__setattr__(self, '_principal', principal)
+        object.__setattr__(self, '_user', user)
+
+    @property
+    def id(self):
+        return self._principal.user_id
+
+    @property
+    def is_admin(self):
+        return self._principal.is_admin
+
+    @property
+    def is_active(self):
+        return self._principal.is_active
+
+    @property
+    def user(self):
+        """Full User instance, loaded lazily"""
+        if self._user is None:
+            object.__setattr__(self, '_user', db.session.get(User, self._principal.user_id))
+        return self._user
+
+    def __getattr__(self, name):
+        return getattr(self.user, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.user, name, value)
+
+    def __repr__(self):
+        return f'<CurrentUser {self._principal.user_id}>'
+
+
+class TokenCache:
+    """Bounded LRU+TTL map of auth token -> Principal"""
+
+    def __init__(self, maxsize=10000, ttl=60):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def init_app(self, app):
+        """Configure cache size and TTL from the app config"""
+        self._cache = LRUCache(
+            maxsize=app.config.get('AUTH_TOKEN_CACHE_SIZE', 10000),
+            ttl=app.config.get('AUTH_TOKEN_CACHE_TTL', 60)
+        )
+        app.extensions['token_cache'] = self
+
+    def get(self, token):
+        return self._cache.get(token)
+
+    def put(self, token, principal):
+        """Cache principal until the cache TTL or the token expiry, whichever is first"""
+        remaining = (principal.expires_at - datetime.utcnow()).total_seconds()
+        if remaining > 0:
+            self._cache.set(token, principal, ttl=min(self._cache.ttl, remaining))
+
+    def invalidate(self, token):
+        """Drop a single token"""
+        if token:
+            self._cache.delete(token)
+
+    def invalidate_user(self, user_id):
+        """Drop every cached token belonging to a user"""
+        return self._cache.delete_where(lambda token, principal: principal.user_id == user_id)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+class TokenDenylist:
+    """Periodically refreshed map of user id -> lowest still-valid token version.
+
+    Only users revoked within the access token lifetime are loaded, since any
+    token issued before an older revocation has already expired.
+    """
+
+    def __init__(self, refresh_interval=30, window=3600):
+        self.refresh_interval = refresh_interval
+        self.window = window
+        self._versions = {}
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def min_version(self, user_id):
+        if time.monotonic() >= self._next_refresh:
+            self.refresh()
+        return self._versions.get(user_id, 0)
+
+    def refresh(self):
+        """Reload recent revocations from the user table"""
+        since = datetime.utcnow() - timedelta(seconds=self.window)
+        rows = db.session.query(User.id, User.token_version).filter(
+            User.tokens_revoked_at >= since
+        ).all()
+        with self._lock:
+            self._versions = {user_id: version for user_id, version in rows}
+            self._next_refresh = time.monotonic() + self.refresh_interval
+
+    def mark_stale(self):
+        """Force a reload on the next lookup"""
+        self._next_refresh = 0.0
+
+
+class SignedTokens:
+    """Stateless, signed and time-limited access tokens (AUTH_TOKEN_MODE = 'signed')"""
+
+    def __init__(self):
+        self.serializer = None
+        self.denylist = TokenDenylist()
+
+    def init_app(self, app):
+        self.serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='auth-token')
+        self.denylist = TokenDenylist(
+            refresh_interval=app.config.get('AUTH_TOKEN_DENYLIST_REFRESH', 30),
+            window=app.config.get('AUTH_TOKEN_EXPIRES', 3600)
+        )
+        app.extensions['signed_tokens'] = self
+
+    def dumps(self, user, expires_in):
+        return self.serializer.dumps({
+            'uid': user.id,
+            'ver': user.token_version or 0,
+            'adm': bool(user.is_admin),
+            'exp': expires_in
+        })
+
+    def load(self, token):
+        """Return a Principal for a valid, unexpired and unrevoked token"""
+        try:
+            payload, issued_at = self.serializer.loads(token, return_timestamp=True)
+        except BadSignature:
+            return None
+
+        expires_at = issued_at.replace(tzinfo=None) + timedelta(seconds=payload['exp'])
+        if expires_at <= datetime.utcnow():
+            return None
+        if payload['ver'] < self.denylist.min_version(payload['uid']):
+            return None
+        return Principal(payload['uid'], payload['adm'], True, expires_at)
+
+
+token_cache = TokenCache()
+signed_tokens = SignedTokens()
+
+
+def init_app(app):
+    """Set up token cache and signed-token support for the app"""
+    token_cache.init_app(app)
+    signed_tokens.init_app(app)
+
+
+def invalidate_user(user_id):
+    """Forget cached principals and refresh revocations for a user"""
+    token_cache.invalidate_user(user_id)
+    signed_tokens.denylist.mark_stale()
+
+
+def authenticate(token):
+    """Resolve a bearer token to a CurrentUser, consulting the token cache first"""
+    if not token:
+        return None
+
+    if current_app.config.get('AUTH_TOKEN_MODE') == 'signed':
+        principal = signed_tokens.load(token)
+        return CurrentUser(principal) if principal else None
+
+    principal = token_cache.get(token)
+    if principal is not None:
+        if principal.is_active and datetime.utcnow() < principal.expires_at:
+            return CurrentUser(principal)
+        token_cache.invalidate(token)
+        return None
+
+    session = UserSession.verify_access_token(token)
+    if not session:
+        return None
+
+    user = session.user
+    principal = Principal(user.id, bool(user.is_admin), bool(user.is_active), session.access_expires_at)
+    token_cache.put(token, principal)
+    return CurrentUser(principal, user)
+
+
+# Drop cached principals when a user's admin/active flags change (e.g. deactivation),
+# once the change is committed so a concurrent request cannot re-cache the old state.
+# Losing either flag also revokes outstanding signed tokens.
+@event.listens_for(User.is_active, 'set')
+@event.listens_for(User.is_admin, 'set')
+def _queue_principal_invalidation(target, value, oldvalue, initiator):
+    if target.id is None or value == oldvalue:
+        return
+    if not value:
+        target.bump_token_version()
+    session = object_session(target)
+    if session is None:
+        token_cache.invalidate_user(target.id)
+    else:
+        session.info.setdefault('invalidated_user_ids', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_principals(session):
+    for user_id in session.info.pop('invalidated_user_ids', ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_invalidations(session):
+    session.info.pop('invalidated_user_ids', None)
@@ -0,0 +1,598 @@
+"""
+Bulk catalog operations: streaming product import, inventory sync, catalog patches
+"""
+import csv
+import io
+import json
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import Integer, Numeric, bindparam, case, cast, column, func, literal, or_, select, update, values
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.models import db, Product, Category, ProductVariant
+
+
+class ImportFormatError(ValueError):
+    """Raised for an unsupported import format"""
+
+
+def invalidate_catalog(category_ids=(), product_ids=(), search=True):
+    """Drop in-process catalog indexes and caches after a bulk product write.
+
+    ``search=False`` keeps the search indexes and category tree, for writes
+    that cannot change names, tags, categories or visibility (e.g. stock).
+    """
+    from app.search import suggest_index, trigram_index
+    from app.facets import facet_counter
+    from app.categories import category_tree
+    from app.response_cache import response_cache
+
+    if search:
+        suggest_index.invalidate()
+        trigram_index.invalidate()
+        category_tree.invalidate()
+    facet_counter.cache.clear()
+
+    # Category pages list their whole subtree, so ancestors are purged too
+    affected = set(category_ids)
+    if affected:
+        for (path,) in db.session.query(Category.path).filter(Category.id.in_(affected)):
+            affected.update(Category.path_ids(path))
+    response_cache.purge(
+        'products',
+        *[f'category:{category_id}' for category_id in affected],
+        *[f'product:{product_id}' for product_id in product_ids]
+    )
+
+
+def _text_stream(stream):
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def iter_csv(stream):
+    """Yield (line number, row dict) from a CSV stream with a header row"""
+    reader = csv.DictReader(_text_stream(stream))
+    for row in reader:
+        yield reader.line_num, {key.strip(): value for key, value in row.items() if key}
+
+
+def iter_jsonl(stream):
+    """Yield (line number, row dict or parse error) from a JSON-lines stream"""
+    for line_number, line in enumerate(_text_stream(stream), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = e
+        if not isinstance(row, (dict, ValueError)):
+            row = ValueError('Each line must be a JSON object')
+        yield line_number, row
+
+
+def guess_format(filename=None, mimetype=None):
+    """Import format from a file name or content type; defaults to CSV"""
+    name = (filename or '').lower()
+    if name.endswith(('.jsonl', '.ndjson')) or mimetype in ('application/x-ndjson', 'application/jsonl'):
+        return 'jsonl'
+    return 'csv'
+
+
+def iter_rows(stream, fmt):
+    """Row generator for 'csv' or 'jsonl'"""
+    if fmt == 'csv':
+        return iter_csv(stream)
+    if fmt in ('jsonl', 'ndjson'):
+        return iter_jsonl(stream)
+    raise ImportFormatError(f'Unsupported import format: {fmt}')
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    normalized = str(value).strip().lower()
+    if normalized in ('1', 'true', 'yes', 'y'):
+        return True
+    if normalized in ('0', 'false', 'no', 'n'):
+        return False
+    raise ValueError(f'invalid boolean {value!r}')
+
+
+def _to_int(value):
+    number = float(value)
+    if not number.is_integer():
+        raise ValueError(f'invalid integer {value!r}')
+    return int(number)
+
+
+# Importable product fields and their parsers
+PRODUCT_IMPORT_FIELDS = {
+    'sku': str,
+    'name': str,
+    'price': float,
+    'category_id': _to_int,
+    'description': str,
+    'short_description': str,
+    'compare_price': float,
+    'cost_price': float,
+    'stock_quantity': _to_int,
+    'min_stock_level': _to_int,
+    'weight': float,
+    'dimensions': str,
+    'tags': str,
+    'is_active': _to_bool,
+    'is_featured': _to_bool,
+    'is_digital': _to_bool,
+    'requires_shipping': _to_bool,
+}
+PRODUCT_IMPORT_REQUIRED = ('sku', 'name', 'price', 'category_id')
+
+
+class ProductImporter:
+    """Upserts products by SKU from a row generator, chunk by chunk.
+
+    Rows are validated as they stream in and written ``chunk_size`` at a
+    time with INSERT ... ON CONFLICT (sku) DO UPDATE, executed as one
+    executemany per set of provided columns. Only the columns present in a
+    row are updated on existing products. A chunk that fails as a whole is
+    retried row by row so each bad row is reported individually. At most
+    ``max_errors`` errors are kept in the report; the count covers all.
+    """
+
+    def __init__(self, chunk_size=1000, max_errors=1000):
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self.processed = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+        self.product_ids = set()
+        self.category_ids = set()
+
+    def _error(self, line, sku, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': line, 'sku': sku, 'error': message})
+
+    def _validate(self, row, known_categories):
+        values = {}
+        for field, parse in PRODUCT_IMPORT_FIELDS.items():
+            raw = row.get(field)
+            if raw is None or (isinstance(raw, str) and raw.strip() == ''):
+                continue
+            try:
+                value = parse(raw.strip() if isinstance(raw, str) else raw)
+            except (TypeError, ValueError):
+                raise ValueError(f'{field}: invalid value {raw!r}')
+            length = getattr(Product.__table__.c[field].type, 'length', None)
+            if length and isinstance(value, str) and len(value) > length:
+                raise ValueError(f'{field}: longer than {length} characters')
+            values[field] = value
+
+        missing = [field for field in PRODUCT_IMPORT_REQUIRED if field not in values]
+        if missing:
+            raise ValueError(f'missing required field(s): {", ".join(missing)}')
+        if values['price'] < 0:
+            raise ValueError('price: must not be negative')
+        if values['category_id'] not in known_categories:
+            raise ValueError(f'category_id: unknown category {values["category_id"]}')
+        return values
+
+    def _upsert_statement(self, columns):
+        insert = postgresql.insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+        statement = insert(Product.__table__)
+        updates = {column: statement.excluded[column] for column in columns if column != 'sku'}
+        updates['updated_at'] = statement.excluded.updated_at
+        return statement.on_conflict_do_update(index_elements=['sku'], set_=updates)
+
+    def _write(self, chunk):
+        """Upsert one chunk of (line, values).
+
+        Returns ({sku: previous category id} for SKUs that already existed,
+        ids of every upserted product).
+        """
+        skus = [row_values['sku'] for _, row_values in chunk]
+        existing = dict(db.session.execute(
+            select(Product.sku, Product.category_id).where(Product.sku.in_(skus))
+        ).all())
+
+        groups = defaultdict(list)
+        for _, row_values in chunk:
+            groups[tuple(sorted(row_values))].append(dict(row_values, updated_at=datetime.utcnow()))
+        for columns, rows in groups.items():
+            db.session.execute(self._upsert_statement(columns), rows)
+        product_ids = db.session.scalars(select(Product.id).where(Product.sku.in_(skus))).all()
+        return existing, product_ids
+
+    def _flush(self, chunk):
+        if not chunk:
+            return
+        try:
+            existing, product_ids = self._write(chunk)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            existing, product_ids = {}, []
+            written = []
+            for line, row_values in chunk:
+                try:
+                    row_existing, row_ids = self._write([(line, row_values)])
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    self._error(line, row_values['sku'], str(getattr(e, 'orig', e)))
+                    continue
+                existing.update(row_existing)
+                product_ids.extend(row_ids)
+                written.append((line, row_values))
+            chunk = written
+
+        for _, row_values in chunk:
+            if row_values['sku'] in existing:
+                self.updated += 1
+            else:
+                self.created += 1
+            self.category_ids.add(row_values['category_id'])
+        # Products that moved also leave their old category's pages
+        self.category_ids.update(existing.values())
+        self.product_ids.update(product_ids)
+
+    def run(self, rows):
+        """Import from an iterable of (line number, row dict); returns the report"""
+        known_categories = set(db.session.scalars(select(Category.id)))
+        chunk, chunk_skus = [], set()
+
+        try:
+            for line, row in rows:
+                self.processed += 1
+                if isinstance(row, Exception):
+                    self._error(line, None, f'unparseable row: {row}')
+                    continue
+                try:
+                    row_values = self._validate(row, known_categories)
+                except ValueError as e:
+                    self._error(line, row.get('sku'), str(e))
+                    continue
+
+                # A repeated SKU goes into the next chunk so the later row wins
+                if row_values['sku'] in chunk_skus or len(chunk) >= self.chunk_size:
+                    self._flush(chunk)
+                    chunk, chunk_skus = [], set()
+                chunk.append((line, row_values))
+                chunk_skus.add(row_values['sku'])
+
+            self._flush(chunk)
+        finally:
+            # Also after a failure: earlier chunks are already committed.
+            # Core upserts bypass the ORM flush hooks, so this is also what
+            # rebuilds the category tree (search=True).
+            if self.product_ids:
+                invalidate_catalog(self.category_ids, self.product_ids)
+        return self.report()
+
+    def report(self):
+        return {
+            'processed': self.processed,
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors)
+        }
+
+
+# Inventory update keys: (model, key column)
+INVENTORY_KEYS = {
+    'product_id': (Product, Product.id),
+    'sku': (Product, Product.sku),
+    'variant_id': (ProductVariant, ProductVariant.id),
+    'variant_sku': (ProductVariant, ProductVariant.sku),
+}
+INVENTORY_MODES = ('absolute', 'delta')
+
+
+class InventoryUpdater:
+    """Applies stock levels to products and variants, ``chunk_size`` keys per transaction.
+
+    Each update names one key (product_id, sku, variant_id or variant_sku)
+    and a quantity: the new stock level in 'absolute' mode, a signed change
+    in 'delta' mode (stock never goes below 0). Keys are resolved with one
+    SELECT per chunk, then all changed rows are written with one
+    UPDATE ... FROM (VALUES ...) (executemany on other databases). Absolute
+    updates that match the current level are skipped, so unchanged rows in
+    a full snapshot are neither written nor purged from caches. Deltas for
+    one row named by different keys (e.g. sku and product_id) add up;
+    differing absolute levels for one row are reported as an error and the
+    row is left unchanged.
+    """
+
+    def __init__(self, mode='absolute', chunk_size=1000):
+        if mode not in INVENTORY_MODES:
+            raise ValueError(f'mode must be one of: {", ".join(INVENTORY_MODES)}')
+        self.mode = mode
+        self.chunk_size = chunk_size
+        self.received = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.missing = defaultdict(list)
+        self.errors = []
+        self.product_ids = set()
+        self.category_ids = set()
+
+    def _parse(self, item):
+        if not isinstance(item, dict):
+            raise ValueError('each update must be an object')
+        keys = [key for key in INVENTORY_KEYS if item.get(key) not in (None, '')]
+        if len(keys) != 1:
+            raise ValueError(f'exactly one of {", ".join(INVENTORY_KEYS)} is required')
+        key = keys[0]
+        value = item[key]
+        if INVENTORY_KEYS[key][1].key == 'id':
+            if isinstance(value, bool) or not isinstance(value, int):
+                raise ValueError(f'{key}: must be an integer')
+        else:
+            value = str(value)
+        quantity = item.get('quantity')
+        if isinstance(quantity, bool) or not isinstance(quantity, int):
+            raise ValueError('quantity: must be an integer')
+        if self.mode == 'absolute' and quantity < 0:
+            raise ValueError('quantity: must not be negative')
+        return key, value, quantity
+
+    def _write(self, model, changes):
+        """Apply {row id: quantity} to one table in a single statement"""
+        table = model.__table__
+        if self.mode == 'absolute':
+            new_stock = lambda quantity: quantity
+        else:
+            stock = func.coalesce(table.c.stock_quantity, 0)
+            new_stock = lambda quantity: case((stock + quantity < 0, 0), else_=stock + quantity)
+
+        if db.session.get_bind().dialect.name == 'postgresql':
+            rows = values(
+                column('row_id', Integer), column('quantity', Integer), name='updates'
+            ).data(sorted(changes.items()))
+            statement = update(table).where(table.c.id == rows.c.row_id).values(
+                stock_quantity=new_stock(rows.c.quantity)
+            )
+            db.session.execute(statement)
+        else:
+            statement = update(table).where(table.c.id == bindparam('row_id')).values(
+                stock_quantity=new_stock(bindparam('quantity'))
+            )
+            db.session.execute(statement, [
+                {'row_id': row_id, 'quantity': quantity} for row_id, quantity in sorted(changes.items())
+            ])
+
+    def _apply(self, chunk):
+        """Resolve and write one chunk of {key: {value: (quantity, index)}}"""
+        # {model: {row id: [quantity, stock, product id, category id, indexes, conflict]}};
+        # different keys (e.g. sku and product_id) may name the same row
+        targets = {Product: {}, ProductVariant: {}}
+        changes = {Product: {}, ProductVariant: {}}
+        variant_products = set()
+        product_ids, category_ids = set(), set()
+
+        for key, quantities in chunk.items():
+            model, key_column = INVENTORY_KEYS[key]
+            product_id = Product.id if model is Product else ProductVariant.product_id
+            statement = select(key_column, model.id, model.stock_quantity, product_id, Product.category_id)
+            if model is ProductVariant:
+                statement = statement.join(Product, Product.id == ProductVariant.product_id)
+            rows = db.session.execute(statement.where(key_column.in_(list(quantities)))).all()
+
+            found = set()
+            for value, row_id, stock, row_product_id, category_id in rows:
+                found.add(value)
+                quantity, index = quantities[value]
+                target = targets[model].get(row_id)
+                if target is None:
+                    targets[model][row_id] = [quantity, stock, row_product_id, category_id, [index], False]
+                    continue
+                target[4].append(index)
+                if self.mode == 'delta':
+                    target[0] += quantity
+                elif target[0] != quantity:
+                    target[5] = True
+            self.missing[key].extend(value for value in quantities if value not in found)
+
+        for model, model_targets in targets.items():
+            for row_id, (quantity, stock, row_product_id, category_id, indexes, conflict) in model_targets.items():
+                if conflict:
+                    self.errors.append({'index': max(indexes), 'error': (
+                        f'conflicting stock levels for the same {"variant" if model is ProductVariant else "product"} '
+                        f'(updates {", ".join(str(i) for i in sorted(indexes))}); not updated'
+                    )})
+                    continue
+                if quantity == (stock if self.mode == 'absolute' else 0):
+                    self.unchanged += 1
+                    continue
+                changes[model][row_id] = quantity
+                product_ids.add(row_product_id)
+                category_ids.add(category_id)
+                if model is ProductVariant:
+                    variant_products.add(row_product_id)
+
+        for model, model_changes in changes.items():
+            if model_changes:
+                self._write(model, model_changes)
+                self.updated += len(model_changes)
+        if variant_products:
+            # Variant stock is part of the product payload; move its validators
+            db.session.execute(
+                update(Product.__table__).where(Product.__table__.c.id.in_(sorted(variant_products)))
+                .values(updated_at=datetime.utcnow())
+            )
+        db.session.commit()
+        self.product_ids.update(product_ids)
+        self.category_ids.update(category_ids)
+
+    def run(self, updates):
+        """Apply a list of update dicts; returns the report"""
+        chunk, size = defaultdict(dict), 0
+        try:
+            for index, item in enumerate(updates):
+                self.received += 1
+                try:
+                    key, value, quantity = self._parse(item)
+                except ValueError as e:
+                    self.errors.append({'index': index, 'error': str(e)})
+                    continue
+
+                # Repeated keys: the last level wins, deltas add up
+                if self.mode == 'delta' and value in chunk[key]:
+                    chunk[key][value] = (chunk[key][value][0] + quantity, index)
+                else:
+                    if value not in chunk[key]:
+                        size += 1
+                    chunk[key][value] = (quantity, index)
+                if size >= self.chunk_size:
+                    self._apply(chunk)
+                    chunk, size = defaultdict(dict), 0
+
+            if size:
+                self._apply(chunk)
+        finally:
+            # Also after a failure: the ids cover every chunk committed so far
+            if self.product_ids:
+                invalidate_catalog(self.category_ids, self.product_ids, search=False)
+        return self.report()
+
+    def report(self):
+        return {
+            'mode': self.mode,
+            'received': self.received,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'missing': {key: values for key, values in self.missing.items() if values},
+            'errors': self.errors
+        }
+
+
+class InvalidPatch(ValueError):
+    """Raised for an invalid product selection or change set"""
+
+
+PATCH_FIELDS = ('price', 'compare_price', 'is_featured', 'is_active')
+
+
+class ProductPatch:
+    """One set-based UPDATE of price/flag columns over a selection of products.
+
+    ``select`` picks products by ``ids``, ``category_id`` (with its
+    subcategories unless ``include_subcategories`` is false) and/or ``tag``;
+    criteria combine with AND, and ``all: true`` is required to patch the
+    whole catalog. ``changes`` sets ``is_featured``/``is_active`` to booleans,
+    ``price`` to an amount or ``{"percent": -20}``, and ``compare_price``
+    to an amount, null, or ``"price"`` (the price before this patch, for
+    starting a sale). Rows that already hold the new values are not matched.
+    """
+
+    def __init__(self, selector, changes):
+        self.criteria = self._criteria(selector)
+        self.values = self._values(changes)
+        self.search = 'is_active' in self.values
+
+    @staticmethod
+    def _criteria(selector):
+        if not isinstance(selector, dict):
+            raise InvalidPatch('select must be an object')
+        criteria = []
+        if selector.get('ids') is not None:
+            ids = selector['ids']
+            if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+                raise InvalidPatch('select.ids must be a list of integers')
+            criteria.append(Product.id.in_(ids))
+        if selector.get('category_id') is not None:
+            category_id = selector['category_id']
+            path = db.session.query(Category.path).filter_by(id=category_id).scalar()
+            if path is None:
+                raise InvalidPatch(f'select.category_id: unknown category {category_id}')
+            if selector.get('include_subcategories', True):
+                criteria.append(Product.category_id.in_(Category.subtree_ids(path)))
+            else:
+                criteria.append(Product.category_id == category_id)
+        if selector.get('tag'):
+            # Whole-tag match within the comma-separated list; % and _ in the tag are literal
+            tag = str(selector['tag']).replace(' ', '').lower()
+            tag = tag.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            tags = literal(',') + func.lower(func.replace(Product.tags, ' ', '')) + literal(',')
+            criteria.append(tags.like(f'%,{tag},%', escape='\\'))
+        if not criteria and selector.get('all') is not True:
+            raise InvalidPatch('select needs ids, category_id or tag (or all: true for the whole catalog)')
+        return criteria
+
+    @staticmethod
+    def _values(changes):
+        if not isinstance(changes, dict) or not changes:
+            raise InvalidPatch('changes must be a non-empty object')
+        unknown = [field for field in changes if field not in PATCH_FIELDS]
+        if unknown:
+            raise InvalidPatch(f'changes: unsupported field(s): {", ".join(unknown)}')
+
+        def amount(field, value):
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                raise InvalidPatch(f'changes.{field}: must be a non-negative number')
+            return float(value)
+
+        values = {}
+        for field in ('is_featured', 'is_active'):
+            if field in changes:
+                if not isinstance(changes[field], bool):
+                    raise InvalidPatch(f'changes.{field}: must be true or false')
+                values[field] = changes[field]
+        if 'price' in changes:
+            price = changes['price']
+            if isinstance(price, dict):
+                percent = price.get('percent')
+                if isinstance(percent, bool) or not isinstance(percent, (int, float)) or percent <= -100:
+                    raise InvalidPatch('changes.price.percent: must be a number greater than -100')
+                values['price'] = func.round(cast(Product.price * (1 + percent / 100.0), Numeric), 2)
+            else:
+                values['price'] = amount('price', price)
+        if 'compare_price' in changes:
+            compare_price = changes['compare_price']
+            if compare_price is None:
+                values['compare_price'] = None
+            elif compare_price == 'price':
+                # SET expressions read the row as it was before the update
+                values['compare_price'] = Product.price
+            else:
+                values['compare_price'] = amount('compare_price', compare_price)
+        return values
+
+    def _where(self):
+        changed = or_(*[getattr(Product, field).is_distinct_from(value) for field, value in self.values.items()])
+        return [*self.criteria, changed]
+
+    def count(self):
+        """Number of products the patch would change"""
+        return db.session.scalar(select(func.count()).select_from(Product).where(*self._where()))
+
+    def apply(self, dry_run=False):
+        """Run the patch (or just count it); returns the report"""
+        if dry_run:
+            return {'dry_run': True, 'matched': self.count()}
+
+        table = Product.__table__
+        statement = update(table).where(*self._where()).values(self.values)
+        if db.session.get_bind().dialect.update_returning:
+            # The updated rows themselves, so every one of them is invalidated
+            rows = db.session.execute(statement.returning(table.c.id, table.c.category_id)).all()
+            updated = len(rows)
+        else:
+            # Only the selected ids can be updated, so none escape invalidation
+            rows = db.session.execute(select(Product.id, Product.category_id).where(*self._where())).all()
+            updated = db.session.execute(
+                statement.where(table.c.id.in_([product_id for product_id, _ in rows]))
+            ).rowcount if rows else 0
+        db.session.commit()
+        if rows:
+            invalidate_catalog({category_id for _, category_id in rows},
+                               [product_id for product_id, _ in rows], search=self.search)
+        return {'dry_run': False, 'matched': len(rows), 'updated': updated}
@@ -0,0 +1,136 @@
+"""
+Cached, immutable category tree with product counts
+"""
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.models import Category, Product
+from app.utils import DatabaseUtils
+
+CategoryNode = namedtuple('CategoryNode', [
+    'id', 'name', 'description', 'image_url', 'parent_id',
+    'product_count',        # active products directly in this category
+    'total_product_count',  # including every active descendant category
+    'children',             # tuple of child category ids
+])
+
+
+class CategoryTree:
+    """Snapshot of the active category tree; nodes are shared and never mutated"""
+
+    def __init__(self, nodes, roots):
+        self.nodes = MappingProxyType(nodes)
+        self.roots = roots
+
+    @classmethod
+    def build(cls):
+        """Build from one aggregate query (categories with active product counts)"""
+        rows = DatabaseUtils.get_categories_with_product_count()
+        categories = {category.id: (category, count) for category, count in rows}
+
+        children = {category_id: [] for category_id in categories}
+        roots = []
+        for category_id, (category, _) in sorted(categories.items()):
+            if category.parent_id in categories:
+                children[category.parent_id].append(category_id)
+            else:
+                # Top level, or its parent is inactive
+                roots.append(category_id)
+
+        totals = {}
+
+        def total(category_id):
+            # Depth-first; each category is summed once
+            if category_id not in totals:
+                totals[category_id] = categories[category_id][1] + sum(
+                    total(child_id) for child_id in children[category_id]
+                )
+            return totals[category_id]
+
+        nodes = {}
+        for category_id, (category, count) in categories.items():
+            nodes[category_id] = CategoryNode(
+                category.id, category.name, category.description, category.image_url,
+                category.parent_id, count, total(category_id), tuple(children[category_id])
+            )
+        return cls(nodes, tuple(roots))
+
+    def get(self, category_id):
+        return self.nodes.get(category_id)
+
+    def __iter__(self):
+        """Nodes in id order"""
+        return (self.nodes[category_id] for category_id in sorted(self.nodes))
+
+
+class CategoryTreeCache:
+    """Holds the current CategoryTree and rebuilds it after relevant commits.
+
+    A category write, or a product insert/delete/category/is_active change,
+    marks the tree stale once committed. ``max_age`` bounds how long another
+    worker's changes can go unnoticed.
+    """
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self._tree = None
+        self._built_at = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_age = app.config.get('CATEGORY_TREE_MAX_AGE', 300)
+        app.extensions['category_tree'] = self
+
+    def get(self):
+        """Current tree, rebuilt if stale"""
+        tree = self._tree
+        if tree is not None and time.monotonic() - self._built_at <= self.max_age:
+            return tree
+        with self._lock:
+            if self._tree is None or time.monotonic() - self._built_at > self.max_age:
+                self._tree = CategoryTree.build()
+                self._built_at = time.monotonic()
+            return self._tree
+
+    def invalidate(self):
+        with self._lock:
+            self._tree = None
+
+
+category_tree = CategoryTreeCache()
+
+
+def _affects_tree(obj):
+    if isinstance(obj, Category):
+        return True
+    if isinstance(obj, Product):
+        state = inspect(obj)
+        return state.attrs.category_id.history.has_changes() or state.attrs.is_active.history.has_changes()
+    return False
+
+
+@event.listens_for(Session, 'before_flush')
+def _mark_tree_stale(session, flush_context, instances):
+    changed = (
+        any(isinstance(obj, (Category, Product)) for obj in session.new)
+        or any(isinstance(obj, (Category, Product)) for obj in session.deleted)
+        or any(_affects_tree(obj) for obj in session.dirty)
+    )
+    if changed:
+        session.info['category_tree_stale'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _rebuild_tree_after_commit(session):
+    if session.info.pop('category_tree_stale', False):
+        category_tree.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_tree_staleness(session):
+    session.info.pop('category_tree_stale', None)
@@ -0,0 +1,208 @@
+"""
+Conditional GET support (ETag / Last-Modified) for catalog endpoints
+
+Validators come from small aggregate queries over timestamps and row
+counts, so a 304 is answered without loading or serializing the body.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import request, make_response
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from app.models import db, Product, Category, ProductImage, ProductVariant, Review
+from app.response_cache import response_cache
+
+
+def _count_and_max(column, *criteria):
+    return (
+        select(func.count(column)).where(*criteria).scalar_subquery(),
+        select(func.max(column)).where(*criteria).scalar_subquery(),
+    )
+
+
+def product_version(product_id):
+    """Validator row for one product detail payload, or None if not found"""
+    row = db.session.execute(
+        select(
+            Product.updated_at,
+            Category.updated_at,
+            *_count_and_max(ProductImage.id, ProductImage.product_id == Product.id),
+            *_count_and_max(ProductVariant.id, ProductVariant.product_id == Product.id),
+            *_count_and_max(Review.updated_at, Review.product_id == Product.id),
+        ).join(Category, Product.category_id == Category.id)
+        .where(Product.id == product_id, Product.is_active.is_(True))
+    ).first()
+    return tuple(row) if row else None
+
+
+class CatalogVersion:
+    """Validator covering every product and category; used by list endpoints.
+
+    Two index-only MAX(updated_at) lookups; products are soft-deleted and
+    image/variant changes touch their product (see below), so every payload
+    change moves one of them. The result is reused until the response cache's
+    'products' tag is purged, which every catalog write does, or for at most
+    ``max_age`` seconds so other workers' writes are picked up with a
+    per-process cache backend.
+    """
+
+    def __init__(self, max_age=5):
+        self.max_age = max_age
+        self._cached = None  # (products tag version, computed at, version)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_age = app.config.get('CATALOG_VERSION_MAX_AGE', 5)
+        app.extensions['catalog_version'] = self
+
+    @staticmethod
+    def compute():
+        return tuple(db.session.execute(
+            select(
+                select(func.max(Product.updated_at)).scalar_subquery(),
+                select(func.max(Category.updated_at)).scalar_subquery(),
+            )
+        ).one())
+
+    def __call__(self):
+        # Read the tag before querying: a purge in between forces a recompute
+        # (with the null backend the token is new on every call)
+        token = response_cache.tag_version('products')
+        cached = self._cached
+        if cached and cached[0] == token and time.monotonic() - cached[1] <= self.max_age:
+            return cached[2]
+        version = self.compute()
+        with self._lock:
+            self._cached = (token, time.monotonic(), version)
+        return version
+
+
+catalog_version = CatalogVersion()
+
+
+def _last_modified(version):
+    stamps = [value for value in version if hasattr(value, 'isoformat')]
+    if not stamps:
+        return None
+    return max(stamps).replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def _not_modified(etag, last_modified):
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2)
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional(namespace, version):
+    """Decorator adding ETag/Last-Modified to a Resource GET method.
+
+    ``version`` takes the view arguments and returns a tuple that changes
+    whenever the payload does, or None to skip validation (e.g. a 404).
+    The ETag also covers the query string, so each list page has its own.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(resource, *args, **kwargs):
+            current = version(**kwargs)
+            if current is None:
+                return f(resource, *args, **kwargs)
+
+            etag = hashlib.sha1(repr((
+                namespace, sorted(kwargs.items()), sorted(request.args.items(multi=True)), current
+            )).encode('utf-8')).hexdigest()
+            last_modified = _last_modified(current)
+
+            if _not_modified(etag, last_modified):
+                response = make_response('', 304)
+                response.set_etag(etag)
+                if last_modified:
+                    response.last_modified = last_modified
+                return response
+
+            result = f(resource, *args, **kwargs)
+            if not isinstance(result, tuple) or result[1] != 200:
+                return result
+            headers = dict(result[2]) if len(result) > 2 else {}
+            headers['ETag'] = f'"{etag}"'
+            if last_modified:
+                headers['Last-Modified'] = last_modified.strftime('%a, %d %b %Y %H:%M:%S GMT')
+            return result[0], 200, headers
+        return decorated
+    return decorator
+
+
+# Images and variants are part of the product payloads: a change to one
+# touches its product's updated_at, so Last-Modified and both validators
+# move, and its cached responses are purged once committed.
+
+def _changed_product_ids(session):
+    product_ids = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, (ProductImage, ProductVariant)):
+            product_ids.add(obj.product_id or (obj.product.id if obj.product else None))
+    for obj in session.dirty:
+        if isinstance(obj, (ProductImage, ProductVariant)) and session.is_modified(obj):
+            product_ids.add(obj.product_id)
+            product_ids.update(inspect(obj).attrs.product_id.history.deleted)
+        elif isinstance(obj, Product):
+            # Removed from product.images: the orphan is only deleted during the flush
+            state = inspect(obj)
+            if state.attrs.images.history.deleted or state.attrs.variants.history.deleted:
+                product_ids.add(obj.id)
+    product_ids.discard(None)
+    return product_ids
+
+
+@event.listens_for(Session, 'before_flush')
+def _touch_parent_products(session, flush_context, instances):
+    tags = set()
+    for product_id in _changed_product_ids(session):
+        product = session.get(Product, product_id)
+        if product is None or product in session.deleted:
+            continue
+        product.updated_at = datetime.utcnow()
+        tags.add(f'product:{product.id}')
+        category = session.get(Category, product.category_id)
+        tags.update(f'category:{category_id}' for category_id in Category.path_ids(category.path if category else None))
+    if tags:
+        session.info.setdefault('catalog_purge_tags', set()).update(tags)
+
+
+# Moving a category changes which products its old and new ancestors list
+
+@event.listens_for(Session, 'before_flush')
+def _purge_moved_categories(session, flush_context, instances):
+    tags = set()
+    for obj in session.dirty:
+        if not isinstance(obj, Category):
+            continue
+        history = inspect(obj).attrs.parent_id.history
+        if not history.has_changes():
+            continue
+        tags.add(f'category:{obj.id}')
+        for parent_id in [*history.deleted, obj.parent_id]:
+            parent = session.get(Category, parent_id) if parent_id else None
+            if parent is not None:
+                tags.update(f'category:{category_id}' for category_id in Category.path_ids(parent.path))
+    if tags:
+        session.info.setdefault('catalog_purge_tags', set()).update(tags)
+
+
+@event.listens_for(Session, 'after_commit')
+def _purge_after_commit(session):
+    tags = session.info.pop('catalog_purge_tags', None)
+    if tags:
+        response_cache.purge('products', *tags)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_purge_tags(session):
+    session.info.pop('catalog_purge_tags', None)
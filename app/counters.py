@@ -0,0 +1,170 @@
+"""
+Write-behind buffer for product view counters
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import Integer, bindparam, column, update, values
+
+from app.models import db, Product
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounterBuffer:
+    """Accumulates product view increments in memory and flushes them in batches.
+
+    Views are summed per product and written by a daemon thread every
+    ``interval`` seconds, or as soon as ``max_pending`` products have
+    pending views, at most ``batch_size`` products per statement, so
+    product detail reads never open a write transaction. Pending counts are
+    flushed on interpreter shutdown; counts from a failed flush are put back
+    for the next run. An interval of 0 writes through on every view; a
+    failed write is logged and never fails the request that counted it.
+
+    The counts are best effort: a process killed without a clean shutdown
+    (SIGKILL, OOM kill, crash) loses the views since its last flush, i.e. at
+    most ``interval`` seconds and ``max_pending`` products worth of views.
+    """
+
+    def __init__(self, interval=5, batch_size=500, max_pending=1000):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.app = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.flushed = 0
+        self.last_flush = None
+
+    def init_app(self, app):
+        self.interval = app.config.get('VIEW_COUNT_FLUSH_INTERVAL', 5)
+        self.batch_size = app.config.get('VIEW_COUNT_FLUSH_BATCH_SIZE', 500)
+        self.max_pending = app.config.get('VIEW_COUNT_FLUSH_MAX_PENDING', 1000)
+        self.app = app
+        atexit.register(self.shutdown)
+        app.extensions['view_counter'] = self
+
+    def increment(self, product_id, count=1):
+        """Record views for a product"""
+        self._ensure_worker()
+        with self._lock:
+            self._pending[product_id] = self._pending.get(product_id, 0) + count
+            full = len(self._pending) >= self.max_pending
+        if not self.interval:
+            try:
+                self.flush()
+            except Exception:
+                # The counts were put back; the next view retries them
+                logger.exception('View counter flush failed')
+        elif full:
+            # Flush early rather than let the loss window grow with traffic
+            self._wakeup.set()
+
+    def _ensure_worker(self):
+        # Started lazily and per process: a forked worker must not inherit
+        # the parent's thread or its unflushed counts
+        if self._pid == os.getpid() or not self.interval:
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pending = {}
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('View counter flush failed')
+
+    def _take_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def _restore(self, counts):
+        with self._lock:
+            for product_id, count in counts:
+                self._pending[product_id] = self._pending.get(product_id, 0) + count
+
+    def _write_batch(self, batch):
+        if db.session.get_bind().dialect.name == 'postgresql':
+            # One UPDATE ... FROM (VALUES ...) per batch
+            increments = values(
+                column('product_id', Integer), column('views', Integer), name='increments'
+            ).data(batch)
+            statement = update(Product.__table__).where(
+                Product.__table__.c.id == increments.c.product_id
+            ).values(
+                view_count=Product.__table__.c.view_count + increments.c.views,
+                # Views are not content changes; keep ETags and Last-Modified stable
+                updated_at=Product.__table__.c.updated_at
+            )
+            db.session.execute(statement)
+        else:
+            statement = update(Product.__table__).where(
+                Product.__table__.c.id == bindparam('product_id')
+            ).values(
+                view_count=Product.__table__.c.view_count + bindparam('views'),
+                updated_at=Product.__table__.c.updated_at
+            )
+            db.session.execute(statement, [
+                {'product_id': product_id, 'views': views} for product_id, views in batch
+            ])
+
+    def flush(self):
+        """Write all pending increments; returns the number of products updated"""
+        pending = sorted(self._take_pending().items())
+        if not pending or self.app is None:
+            return 0
+
+        written = 0
+        with self.app.app_context():
+            try:
+                for start in range(0, len(pending), self.batch_size):
+                    batch = pending[start:start + self.batch_size]
+                    self._write_batch(batch)
+                    db.session.commit()
+                    written += len(batch)
+            except Exception:
+                db.session.rollback()
+                self._restore(pending[written:])
+                raise
+            finally:
+                db.session.remove()
+
+        self.flushed += written
+        self.last_flush = time.time()
+        return written
+
+    def shutdown(self):
+        """Flush whatever is pending; registered with atexit"""
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Final view counter flush failed')
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'pending_products': pending,
+            'flushed_products': self.flushed,
+            'last_flush': self.last_flush,
+            'flush_interval': self.interval,
+            'max_pending': self.max_pending
+        }
+
+
+view_counter = ViewCounterBuffer()
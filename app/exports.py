@@ -0,0 +1,208 @@
+"""
+Streaming admin exports (CSV / NDJSON) for orders, products and customers
+"""
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app.models import db, User, Product, Category, Order, OrderItem
+
+try:
+    import orjson
+except ImportError:  # optional; falls back to the stdlib encoder
+    orjson = None
+
+
+class InvalidExport(ValueError):
+    """Raised for an unknown export, format or filter value"""
+
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def parse_date_range(date_from=None, date_to=None):
+    """(start, end) datetimes for ?from= / ?to=; a date-only ``to`` includes that whole day"""
+    def parse(value, name):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            raise InvalidExport(f'{name}: expected an ISO date or datetime, got {value!r}')
+
+    start = parse(date_from, 'from') if date_from else None
+    end = parse(date_to, 'to') if date_to else None
+    if end is not None and len(date_to) == 10:
+        end += timedelta(days=1)
+    return start, end
+
+
+def _created_between(statement, column, start, end):
+    if start is not None:
+        statement = statement.where(column >= start)
+    if end is not None:
+        statement = statement.where(column < end)
+    return statement
+
+
+def _split(value):
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+
+def _bool_arg(value, name):
+    normalized = value.strip().lower()
+    if normalized in ('1', 'true', 'yes'):
+        return True
+    if normalized in ('0', 'false', 'no'):
+        return False
+    raise InvalidExport(f'{name}: expected true or false, got {value!r}')
+
+
+def orders_export(args, start, end):
+    """Orders with customer and item count; filters: status, payment_status"""
+    item_count = select(func.count(OrderItem.id)).where(
+        OrderItem.order_id == Order.id
+    ).correlate(Order).scalar_subquery()
+    statement = select(
+        Order.id, Order.order_number, Order.created_at, Order.status, Order.payment_status,
+        User.email.label('customer_email'),
+        (User.first_name + ' ' + User.last_name).label('customer_name'),
+        item_count.label('item_count'),
+        Order.subtotal, Order.tax_amount, Order.shipping_amount, Order.discount_amount,
+        Order.total_amount, Order.currency,
+        Order.confirmed_at, Order.shipped_at, Order.delivered_at
+    ).join(User, User.id == Order.user_id)
+
+    statement = _created_between(statement, Order.created_at, start, end)
+    if _split(args.get('status')):
+        statement = statement.where(Order.status.in_(_split(args.get('status'))))
+    if _split(args.get('payment_status')):
+        statement = statement.where(Order.payment_status.in_(_split(args.get('payment_status'))))
+    return statement.order_by(Order.id)
+
+
+def products_export(args, start, end):
+    """Products with category name; filters: category_id, is_active"""
+    statement = select(
+        Product.id, Product.sku, Product.name, Category.name.label('category_name'),
+        Product.price, Product.compare_price, Product.cost_price,
+        Product.stock_quantity, Product.min_stock_level,
+        Product.is_active, Product.is_featured, Product.tags,
+        Product.sold_count, Product.view_count, Product.rating_average, Product.rating_count,
+        Product.created_at, Product.updated_at
+    ).outerjoin(Category, Category.id == Product.category_id)
+
+    statement = _created_between(statement, Product.created_at, start, end)
+    if args.get('category_id'):
+        try:
+            statement = statement.where(Product.category_id == int(args['category_id']))
+        except ValueError:
+            raise InvalidExport(f'category_id: expected an integer, got {args["category_id"]!r}')
+    if args.get('is_active'):
+        statement = statement.where(Product.is_active == _bool_arg(args['is_active'], 'is_active'))
+    return statement.order_by(Product.id)
+
+
+def customers_export(args, start, end):
+    """Non-admin users with order totals; filters: is_active"""
+    # Aggregated once per customer, then outer-joined
+    order_totals = select(
+        Order.user_id,
+        func.count(Order.id).label('order_count'),
+        func.sum(Order.total_amount).label('total_spent'),
+        func.max(Order.created_at).label('last_order_at')
+    ).where(Order.status != 'cancelled').group_by(Order.user_id).subquery()
+
+    statement = select(
+        User.id, User.username, User.email, User.first_name, User.last_name, User.phone,
+        User.is_active, User.created_at, User.last_login_at,
+        func.coalesce(order_totals.c.order_count, 0).label('order_count'),
+        func.coalesce(order_totals.c.total_spent, 0).label('total_spent'),
+        order_totals.c.last_order_at
+    ).outerjoin(order_totals, order_totals.c.user_id == User.id).where(User.is_admin.is_(False))
+
+    statement = _created_between(statement, User.created_at, start, end)
+    if args.get('is_active'):
+        statement = statement.where(User.is_active == _bool_arg(args['is_active'], 'is_active'))
+    return statement.order_by(User.id)
+
+
+EXPORTS = {
+    'orders': orders_export,
+    'products': products_export,
+    'customers': customers_export,
+}
+
+
+def build_export(dataset, fmt, args):
+    """SELECT statement for an export with the request's filters applied"""
+    if dataset not in EXPORTS:
+        raise InvalidExport(f'Unknown export: {dataset}')
+    if fmt not in EXPORT_FORMATS:
+        raise InvalidExport(f'Unsupported export format: {fmt}')
+    start, end = parse_date_range(args.get('from'), args.get('to'))
+    return EXPORTS[dataset](args, start, end)
+
+
+def _value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _csv_cell(value):
+    value = _value(value)
+    if value is None:
+        return ''
+    # Keep spreadsheet apps from evaluating user-entered text as a formula
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@', '\t', '\r'):
+        return "'" + value
+    return value
+
+
+def _csv_chunks(columns, rows, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_csv_cell(value) for value in row])
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj) + '\n').encode()
+
+
+def _ndjson_chunks(columns, rows, chunk_size):
+    buffer = bytearray()
+    for row in rows:
+        buffer += _dumps({column: _value(value) for column, value in zip(columns, row)})
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+    yield bytes(buffer)
+
+
+def stream_export(statement, fmt, yield_per=1000, chunk_size=64 * 1024):
+    """Generator of encoded output chunks for an export statement.
+
+    Rows are fetched ``yield_per`` at a time through a server-side cursor
+    (``stream_results``), so memory stays flat whatever the table size.
+    """
+    result = db.session.execute(statement.execution_options(yield_per=yield_per))
+    columns = list(result.keys())
+    chunks = _csv_chunks if fmt == 'csv' else _ndjson_chunks
+    try:
+        yield from chunks(columns, result, chunk_size)
+    finally:
+        result.close()
@@ -0,0 +1,145 @@
+"""
+Facet counts (category, price bucket, rating band, stock state) for product listings
+"""
+from sqlalchemy import Integer, case, cast, event, func, literal, select, tuple_, union_all
+from sqlalchemy.orm import Session
+
+from app.cache import LRUCache
+from app.models import db, Product, Category, Review
+
+FACETS = ('category', 'price', 'rating', 'stock')
+
+
+class FacetCounter:
+    """Computes facet counts for a filtered Product query in one statement.
+
+    Postgres gets a single GROUP BY GROUPING SETS scan; other databases a
+    UNION ALL of per-facet GROUP BYs over one CTE. Results are cached per
+    normalized filter key and dropped on any product or review write.
+    """
+
+    def __init__(self, price_buckets=(500, 1000, 5000, 10000, 50000), maxsize=1024, ttl=60):
+        self.price_buckets = tuple(price_buckets)
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def init_app(self, app):
+        self.price_buckets = tuple(app.config.get('FACET_PRICE_BUCKETS', self.price_buckets))
+        self.cache = LRUCache(
+            maxsize=app.config.get('FACET_CACHE_SIZE', 1024),
+            ttl=app.config.get('FACET_CACHE_TTL', 60)
+        )
+        app.extensions['facet_counter'] = self
+
+    @staticmethod
+    def parse(value):
+        """Parse a comma separated facets= argument into known facet names"""
+        requested = [name.strip() for name in (value or '').split(',')]
+        return tuple(name for name in FACETS if name in requested)
+
+    def _expressions(self, source):
+        price_bucket = case(
+            *[(source.c.price < bound, index) for index, bound in enumerate(self.price_buckets)],
+            else_=len(self.price_buckets)
+        )
+        return {
+            'category': source.c.category_id,
+            'price': price_bucket,
+            'rating': cast(func.floor(func.coalesce(source.c.rating_average, 0)), Integer),
+            'stock': case((source.c.stock_quantity > 0, 1), else_=0),
+        }
+
+    def _rows(self, filtered_query, facets):
+        """Return [(facet, value, count)] for the requested facets"""
+        source = filtered_query.order_by(None).with_entities(
+            Product.category_id, Product.price, Product.rating_average, Product.stock_quantity
+        )
+
+        if db.session.get_bind().dialect.name == 'postgresql':
+            source = source.subquery('faceted')
+            expressions = [self._expressions(source)[name] for name in facets]
+            statement = select(
+                *expressions,
+                *[func.grouping(expression) for expression in expressions],
+                func.count()
+            ).select_from(source).group_by(
+                func.grouping_sets(*[tuple_(expression) for expression in expressions])
+            )
+            rows = []
+            for row in db.session.execute(statement):
+                values, grouping = row[:len(facets)], row[len(facets):-1]
+                # grouping() is 0 for the column the row was grouped by
+                index = list(grouping).index(0)
+                rows.append((facets[index], values[index], row[-1]))
+            return rows
+
+        source = source.cte('faceted')
+        expressions = self._expressions(source)
+        statement = union_all(*[
+            select(literal(name).label('facet'), expressions[name].label('value'), func.count())
+            .select_from(source).group_by(expressions[name])
+            for name in facets
+        ])
+        return [tuple(row) for row in db.session.execute(statement)]
+
+    def _format(self, rows, facets):
+        result = {name: [] for name in facets}
+        for facet, value, count in rows:
+            if facet == 'price':
+                bounds = (0,) + self.price_buckets
+                result['price'].append({
+                    'min': bounds[value],
+                    'max': self.price_buckets[value] if value < len(self.price_buckets) else None,
+                    'count': count
+                })
+            elif facet == 'rating':
+                result['rating'].append({'rating': value, 'count': count})
+            elif facet == 'stock':
+                result['stock'].append({'in_stock': bool(value), 'count': count})
+            else:
+                result['category'].append({'id': value, 'count': count})
+
+        if result.get('category'):
+            names = dict(db.session.query(Category.id, Category.name).filter(
+                Category.id.in_([entry['id'] for entry in result['category']])
+            ))
+            for entry in result['category']:
+                entry['name'] = names.get(entry['id'])
+
+        for name in ('price', 'rating'):
+            if name in result:
+                result[name].sort(key=lambda entry: entry.get('min', entry.get('rating')))
+        if 'category' in result:
+            result['category'].sort(key=lambda entry: -entry['count'])
+        return result
+
+    def counts(self, filtered_query, facets, filter_key):
+        """Facet counts for filtered_query, cached under filter_key"""
+        if not facets:
+            return {}
+        key = (facets, filter_key)
+        cached = self.cache.get(key)
+        if cached is None:
+            cached = self._format(self._rows(filtered_query, facets), facets)
+            self.cache.set(key, cached)
+        return cached
+
+
+facet_counter = FacetCounter()
+
+
+# Reviews move rating_average, so they reset the counts like product writes
+@event.listens_for(Session, 'before_flush')
+def _mark_facets_stale(session, flush_context, instances):
+    if any(isinstance(obj, (Product, Review)) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['facets_stale'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _clear_facets_after_commit(session):
+    if session.info.pop('facets_stale', False):
+        facet_counter.cache.clear()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_facet_staleness(session):
+    session.info.pop('facets_stale', None)
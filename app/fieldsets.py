@@ -0,0 +1,301 @@
+"""
+Field specs and precomputed serializers for list endpoints
+
+Each field declares the columns and relationship loaders it needs, so the
+selected fields drive both the serialized dict and the SQL column list:
+unrequested columns (e.g. Product.description) are never fetched. Each
+distinct selection is resolved once into a tuple of (name, getter) pairs.
+"""
+from functools import lru_cache
+from operator import attrgetter
+
+from sqlalchemy.orm import joinedload, load_only, selectinload
+
+from app.models import Product, Category, Order, User, Review, CartItem
+
+
+class InvalidFieldset(ValueError):
+    """Raised for an unknown field or include name"""
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+class Field:
+    """One serializable field: the columns it reads, the relationship loaders it needs and a getter"""
+
+    def __init__(self, getter, columns=(), *loaders):
+        self.getter = getter
+        self.columns = columns
+        self.loaders = loaders
+
+
+def compile_serializer(fields):
+    """Build one function returning the dict for [(name, Field)]"""
+    getters = tuple((name, field.getter) for name, field in fields)
+
+    def serialize(obj):
+        return {name: getter(obj) for name, getter in getters}
+    return serialize
+
+
+class Fieldset:
+    """Named fields for a model; ``default`` is what a request without ?fields= gets"""
+
+    def __init__(self, model, fields, default):
+        self.model = model
+        self.fields = fields
+        self.default = tuple(default)
+        # Build the default selection up front; others on first use
+        self.selection(self.default)
+
+    @staticmethod
+    def _split(value):
+        return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+    def select(self, fields=None, include=None, default=None):
+        """Resolve ?fields= and ?include= into a Selection.
+
+        ``fields`` replaces the default field list; ``include`` adds to it.
+        """
+        names = self._split(fields) or list(default or self.default)
+        for name in self._split(include):
+            if name not in names:
+                names.append(name)
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise InvalidFieldset(f'Unknown field: {", ".join(unknown)}')
+        return self.selection(tuple(names))
+
+    @lru_cache(maxsize=256)
+    def selection(self, names):
+        """Cached Selection for a tuple of valid field names"""
+        return Selection(self, names)
+
+
+class Selection:
+    """The fields chosen for one request"""
+
+    def __init__(self, fieldset, names):
+        self.fieldset = fieldset
+        self.names = names
+        self._fields = [(name, fieldset.fields[name]) for name in names]
+        self.serialize = compile_serializer(self._fields)
+
+    def options(self, *extra_columns):
+        """load_only() for the needed columns plus one loader per relationship"""
+        columns = {'id': self.fieldset.model.id}
+        for column in extra_columns:
+            columns[column.key] = column
+        loaders = {}
+        for _, field in self._fields:
+            for column in field.columns:
+                columns[column.key] = column
+            for key, factory in field.loaders:
+                loaders[key] = factory
+        return [load_only(*columns.values())] + [factory() for factory in loaders.values()]
+
+
+def _column(column):
+    return Field(attrgetter(column.key), (column,))
+
+
+def _primary_image(product):
+    images = sorted(product.images, key=lambda img: (not img.is_primary, img.sort_order or 0, img.id))
+    return {'url': images[0].image_url, 'alt_text': images[0].alt_text} if images else None
+
+
+_product_category = ('category', lambda: joinedload(Product.category).load_only(Category.id, Category.name))
+_product_images = ('images', lambda: selectinload(Product.images))
+
+PRODUCT_FIELDS = Fieldset(Product, {
+    'id': _column(Product.id),
+    'name': _column(Product.name),
+    'description': _column(Product.description),
+    'short_description': _column(Product.short_description),
+    'sku': _column(Product.sku),
+    'price': _column(Product.price),
+    'compare_price': _column(Product.compare_price),
+    'discount_percentage': Field(lambda p: p.discount_percentage, (Product.price, Product.compare_price)),
+    'stock_quantity': _column(Product.stock_quantity),
+    'is_in_stock': Field(lambda p: p.is_in_stock, (Product.stock_quantity,)),
+    'is_featured': _column(Product.is_featured),
+    'rating_average': _column(Product.rating_average),
+    'rating_count': _column(Product.rating_count),
+    'category': Field(lambda p: {'id': p.category.id, 'name': p.category.name}, (), _product_category),
+    'images': Field(lambda p: [{'id': img.id, 'url': img.image_url, 'is_primary': img.is_primary}
+                               for img in p.images], (), _product_images),
+    'primary_image': Field(_primary_image, (), _product_images),
+    'created_at': Field(lambda p: _isoformat(p.created_at), (Product.created_at,)),
+    'is_active': _column(Product.is_active),
+    'category_name': Field(lambda p: p.category.name, (), _product_category),
+    'sold_count': _column(Product.sold_count),
+    'view_count': _column(Product.view_count),
+}, default=(
+    'id', 'name', 'description', 'short_description', 'sku', 'price', 'compare_price',
+    'discount_percentage', 'stock_quantity', 'is_in_stock', 'is_featured', 'rating_average',
+    'rating_count', 'category', 'images', 'created_at'
+))
+
+# Admin product table
+ADMIN_PRODUCT_DEFAULT = (
+    'id', 'name', 'sku', 'price', 'stock_quantity', 'is_active', 'is_featured', 'category_name',
+    'sold_count', 'view_count', 'created_at'
+)
+
+_product_category_detail = ('category', lambda: joinedload(Product.category).load_only(
+    Category.id, Category.name, Category.description))
+_product_variants = ('variants', lambda: selectinload(Product.variants))
+
+# Product page: the list fields plus details, full image and category blocks and active variants
+PRODUCT_DETAIL_FIELDS = Fieldset(Product, {
+    **PRODUCT_FIELDS.fields,
+    'weight': _column(Product.weight),
+    'dimensions': _column(Product.dimensions),
+    'tags': _column(Product.tags),
+    'rating_histogram': Field(lambda p: p.rating_histogram,
+                              tuple(Product.rating_count_column(stars) for stars in range(1, 6))),
+    'category': Field(lambda p: {
+        'id': p.category.id,
+        'name': p.category.name,
+        'description': p.category.description
+    }, (), _product_category_detail),
+    'images': Field(lambda p: [{
+        'id': img.id,
+        'url': img.image_url,
+        'alt_text': img.alt_text,
+        'is_primary': img.is_primary,
+        'sort_order': img.sort_order
+    } for img in p.images], (), _product_images),
+    'variants': Field(lambda p: [{
+        'id': variant.id,
+        'name': variant.name,
+        'sku': variant.sku,
+        'price': variant.price,
+        'stock_quantity': variant.stock_quantity,
+        'attributes': variant.attributes
+    } for variant in p.variants if variant.is_active], (), _product_variants),
+}, default=(
+    'id', 'name', 'description', 'short_description', 'sku', 'price', 'compare_price',
+    'discount_percentage', 'stock_quantity', 'is_in_stock', 'is_featured', 'weight', 'dimensions',
+    'tags', 'rating_average', 'rating_count', 'rating_histogram', 'view_count', 'sold_count',
+    'category', 'images', 'variants', 'created_at'
+))
+
+def _image_urls(product):
+    return [{'url': img.image_url, 'is_primary': img.is_primary} for img in product.images]
+
+
+# Compact product tiles used by category pages, search results and wishlists
+PRODUCT_TILE_FIELDS = Fieldset(Product, {
+    'id': _column(Product.id),
+    'name': _column(Product.name),
+    'price': _column(Product.price),
+    'compare_price': _column(Product.compare_price),
+    'discount_percentage': Field(lambda p: p.discount_percentage, (Product.price, Product.compare_price)),
+    'rating_average': _column(Product.rating_average),
+    'is_in_stock': Field(lambda p: p.is_in_stock, (Product.stock_quantity,)),
+    'category_name': Field(lambda p: p.category.name, (), _product_category),
+    'images': Field(_image_urls, (), _product_images),
+}, default=(
+    'id', 'name', 'price', 'compare_price', 'discount_percentage', 'rating_average', 'is_in_stock', 'images'
+))
+
+SEARCH_RESULT_FIELDS = (
+    'id', 'name', 'price', 'compare_price', 'discount_percentage', 'rating_average', 'is_in_stock',
+    'category_name', 'images'
+)
+
+_order_items = ('order_items', lambda: selectinload(Order.order_items))
+# User.wishlist_products is eager by default; the customer block does not need it
+_order_customer = ('customer', lambda: joinedload(Order.customer).load_only(
+    User.id, User.first_name, User.last_name, User.email
+).lazyload(User.wishlist_products))
+
+ORDER_FIELDS = Fieldset(Order, {
+    'id': _column(Order.id),
+    'order_number': _column(Order.order_number),
+    'customer': Field(lambda o: {
+        'id': o.customer.id,
+        'name': f"{o.customer.first_name} {o.customer.last_name}",
+        'email': o.customer.email
+    }, (), _order_customer),
+    'status': _column(Order.status),
+    'payment_status': _column(Order.payment_status),
+    'total_amount': _column(Order.total_amount),
+    'subtotal': _column(Order.subtotal),
+    'tax_amount': _column(Order.tax_amount),
+    'shipping_amount': _column(Order.shipping_amount),
+    'discount_amount': _column(Order.discount_amount),
+    'currency': _column(Order.currency),
+    'item_count': Field(lambda o: len(o.order_items), (), _order_items),
+    'created_at': Field(lambda o: _isoformat(o.created_at), (Order.created_at,)),
+    'confirmed_at': Field(lambda o: _isoformat(o.confirmed_at), (Order.confirmed_at,)),
+    'shipped_at': Field(lambda o: _isoformat(o.shipped_at), (Order.shipped_at,)),
+    'delivered_at': Field(lambda o: _isoformat(o.delivered_at), (Order.delivered_at,)),
+}, default=(
+    'id', 'order_number', 'status', 'payment_status', 'total_amount', 'subtotal', 'tax_amount',
+    'shipping_amount', 'discount_amount', 'item_count', 'created_at', 'confirmed_at',
+    'shipped_at', 'delivered_at'
+))
+
+# Admin order table: customer block, no price breakdown
+ADMIN_ORDER_DEFAULT = (
+    'id', 'order_number', 'customer', 'status', 'payment_status', 'total_amount', 'item_count', 'created_at'
+)
+
+# Reviewer names only; User.wishlist_products is eager by default
+_review_user = ('user', lambda: joinedload(Review.user).load_only(
+    User.id, User.first_name, User.last_name
+).lazyload(User.wishlist_products))
+
+REVIEW_FIELDS = Fieldset(Review, {
+    'id': _column(Review.id),
+    'rating': _column(Review.rating),
+    'title': _column(Review.title),
+    'comment': _column(Review.comment),
+    'user_name': Field(lambda r: r.user.first_name + ' ' + r.user.last_name, (), _review_user),
+    'is_verified_purchase': _column(Review.is_verified_purchase),
+    'created_at': Field(lambda r: _isoformat(r.created_at), (Review.created_at,)),
+}, default=('id', 'rating', 'title', 'comment', 'user_name', 'is_verified_purchase', 'created_at'))
+
+_cart_product = ('product', lambda: joinedload(CartItem.product).load_only(
+    Product.id, Product.name, Product.price, Product.sku
+).selectinload(Product.images))
+_cart_variant = ('variant', lambda: joinedload(CartItem.product_variant))
+
+CART_ITEM_FIELDS = Fieldset(CartItem, {
+    'id': _column(CartItem.id),
+    'product': Field(lambda i: {
+        'id': i.product.id,
+        'name': i.product.name,
+        'price': i.product.price,
+        'sku': i.product.sku,
+        'images': _image_urls(i.product)
+    }, (), _cart_product),
+    'variant': Field(lambda i: {
+        'id': i.product_variant.id,
+        'name': i.product_variant.name,
+        'price': i.product_variant.price,
+        'attributes': i.product_variant.attributes
+    } if i.product_variant else None, (), _cart_variant),
+    'quantity': _column(CartItem.quantity),
+    'item_total': Field(lambda i: i.total_price, (CartItem.quantity,), _cart_product, _cart_variant),
+    'added_at': Field(lambda i: _isoformat(i.created_at), (CartItem.created_at,)),
+}, default=('id', 'product', 'variant', 'quantity', 'item_total', 'added_at'))
+
+# Category tree nodes (app.categories.CategoryNode) share the attribute names
+CATEGORY_FIELDS = Fieldset(Category, {
+    'id': _column(Category.id),
+    'name': _column(Category.name),
+    'description': _column(Category.description),
+    'image_url': _column(Category.image_url),
+    'parent_id': _column(Category.parent_id),
+    'product_count': Field(attrgetter('product_count')),
+    'total_product_count': Field(attrgetter('total_product_count')),
+}, default=('id', 'name', 'description', 'image_url', 'parent_id'))
+
+CATEGORY_TREE_DEFAULT = ('id', 'name', 'description', 'image_url', 'parent_id', 'product_count',
+                         'total_product_count')
+SUBCATEGORY_DEFAULT = ('id', 'name', 'description')
@@ -0,0 +1,97 @@
+"""
+Password hashing on a bounded worker pool
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+
+def effective_method(method):
+    """Spell out the parameters werkzeug fills in for a method string.
+
+    'pbkdf2:sha256' becomes 'pbkdf2:sha256:<default iterations>' and
+    'scrypt' becomes 'scrypt:32768:8:1', matching the prefix werkzeug
+    stores in the hash. Unrecognized methods are returned unchanged.
+    """
+    name, *args = (method or '').split(':')
+    if name == 'scrypt' and not args:
+        return 'scrypt:32768:8:1'
+    if name == 'pbkdf2' and len(args) < 2:
+        return f"pbkdf2:{args[0] if args else 'sha256'}:{DEFAULT_PBKDF2_ITERATIONS}"
+    return method
+
+
+class HashingPoolSaturated(Exception):
+    """Raised when the password hashing pool has no free capacity"""
+
+
+class PasswordHasher:
+    """Runs password hashing on a size-limited executor.
+
+    At most ``workers + queue_depth`` hashes may be running or queued; further
+    callers get HashingPoolSaturated immediately instead of piling up behind
+    a login burst.
+    """
+
+    def __init__(self, method='scrypt:32768:8:1', workers=2, queue_depth=16, timeout=10):
+        self.configure(method, workers, queue_depth, timeout)
+
+    def configure(self, method, workers, queue_depth, timeout):
+        self.method = method
+        self._effective_method = effective_method(method)
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure hash method and pool limits from the app config"""
+        self.configure(
+            app.config.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'),
+            app.config.get('PASSWORD_HASH_WORKERS', 2),
+            app.config.get('PASSWORD_HASH_QUEUE_DEPTH', 16),
+            app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+        )
+        app.extensions['password_hasher'] = self
+
+    def _get_executor(self):
+        # Created lazily so pre-forking servers start the threads in each worker
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix='password-hash'
+                    )
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolSaturated('Password hashing pool is saturated')
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise HashingPoolSaturated('Password hashing timed out')
+
+    def hash(self, password):
+        """Hash a password with the configured method and cost"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """Check a password against a stored hash"""
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if the stored hash was made with a different method or cost"""
+        return not pwhash or effective_method(pwhash.split('$', 1)[0]) != self._effective_method
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,43 @@
+"""
+Named eager-loading profiles for list and detail endpoints
+
+Each profile lists the relationships an endpoint serializes, so they are
+fetched with a fixed number of queries instead of one lazy load per row.
+"""
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.models import Product, Order, OrderItem, CartItem
+
+# Built on first use: backref attributes such as Order.customer only exist
+# once the mappers are configured.
+LOADING_PROFILES = {
+    # Product grids: category name plus image list
+    'product_card': lambda: (
+        joinedload(Product.category),
+        selectinload(Product.images),
+    ),
+    # Cart lines with their product, product images and variant
+    'cart': lambda: (
+        joinedload(CartItem.product).selectinload(Product.images),
+        joinedload(CartItem.product_variant),
+    ),
+    # Order history: item counts
+    'order_summary': lambda: (
+        selectinload(Order.order_items),
+    ),
+    # Single order with items, item products/images and payments
+    'order_detail': lambda: (
+        selectinload(Order.order_items).joinedload(OrderItem.product).selectinload(Product.images),
+        selectinload(Order.payments),
+    ),
+    # Admin order tables: customer plus item counts
+    'order_admin': lambda: (
+        joinedload(Order.customer),
+        selectinload(Order.order_items),
+    ),
+}
+
+
+def with_profile(query, name):
+    """Apply a named loading profile to a query"""
+    return query.options(*LOADING_PROFILES[name]())
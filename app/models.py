@@ -1,6 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
+import hashlib
+import secrets
 from datetime import datetime, timedelta
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import current_app
+from sqlalchemy.dialects import postgresql  # registers typed to_tsvector()/setweight() before use below
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from app.hashing import password_hasher
 
 db = SQLAlchemy()
 
@@ -30,12 +36,10 @@ class User(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     is_admin = db.Column(db.Boolean, default=False)
     
-    # Authentication tokens
-    auth_token = db.Column(db.String(500), unique=True)  # Current active token
-    token_expires_at = db.Column(db.DateTime)  # Token expiration time
-    refresh_token = db.Column(db.String(500), unique=True)  # Refresh token for token renewal
-    refresh_token_expires_at = db.Column(db.DateTime)  # Refresh token expiration
+    # Authentication (login sessions live in UserSession)
     last_login_at = db.Column(db.DateTime)  # Track last login time
+    token_version = db.Column(db.Integer, default=0, nullable=False)  # Bumped to revoke signed tokens
+    tokens_revoked_at = db.Column(db.DateTime)  # Last revocation, feeds the signed-token denylist
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -44,49 +48,51 @@ class User(db.Model):
     orders = db.relationship('Order', backref='customer', lazy=True)
     cart_items = db.relationship('CartItem', backref='user', lazy=True, cascade='all, delete-orphan')
     reviews = db.relationship('Review', backref='user', lazy=True, cascade='all, delete-orphan')
+    sessions = db.relationship('UserSession', backref='user', lazy=True, cascade='all, delete-orphan')
     wishlist_products = db.relationship('Product', secondary=wishlist, lazy='subquery',
                                       backref=db.backref('wishlisted_by', lazy=True))
     
     def set_password(self, password):
         """Set password hash"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
         """Check password against hash"""
-        return check_password_hash(self.password_hash, password)
-    
-    def generate_auth_token(self, expires_in=3600):
-        """Generate authentication token (expires in 1 hour by default)"""
-        import secrets
-        self.auth_token = secrets.token_urlsafe(32)
-        self.token_expires_at = datetime.utcnow() + timedelta(seconds=expires_in)
-        return self.auth_token
-    
-    def generate_refresh_token(self, expires_in=604800):
-        """Generate refresh token (expires in 7 days by default)"""
-        import secrets
-        self.refresh_token = secrets.token_urlsafe(32)
-        self.refresh_token_expires_at = datetime.utcnow() + timedelta(seconds=expires_in)
-        return self.refresh_token
-    
-    def is_token_valid(self):
-        """Check if current auth token is valid and not expired"""
-        if not self.auth_token or not self.token_expires_at:
-            return False
-        return datetime.utcnow() < self.token_expires_at
-    
-    def is_refresh_token_valid(self):
-        """Check if refresh token is valid and not expired"""
-        if not self.refresh_token or not self.refresh_token_expires_at:
-            return False
-        return datetime.utcnow() < self.refresh_token_expires_at
+        return password_hasher.verify(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """Check if the stored hash uses outdated method or cost parameters"""
+        return password_hasher.needs_rehash(self.password_hash)
+    
+    def start_session(self, expires_in=None, refresh_expires_in=604800):
+        """Open a new login session and return (auth_token, refresh_token)"""
+        session = UserSession(user=self)
+        refresh_token = session.set_refresh_token(refresh_expires_in)
+        auth_token = self.generate_auth_token(session, expires_in)
+        db.session.add(session)
+        return auth_token, refresh_token
+    
+    def generate_auth_token(self, session, expires_in=None):
+        """Generate authentication token for a session (expires after AUTH_TOKEN_EXPIRES, 1 hour by default)"""
+        if expires_in is None:
+            expires_in = current_app.config.get('AUTH_TOKEN_EXPIRES', 3600)
+        
+        if current_app.config.get('AUTH_TOKEN_MODE') == 'signed':
+            # Stateless token: nothing is stored in the database
+            from app.auth import signed_tokens
+            return signed_tokens.dumps(self, expires_in)
+        
+        return session.set_access_token(expires_in)
     
     def revoke_tokens(self):
-        """Revoke all tokens (logout)"""
-        self.auth_token = None
-        self.token_expires_at = None
-        self.refresh_token = None
-        self.refresh_token_expires_at = None
+        """Revoke all tokens on every device"""
+        UserSession.query.filter_by(user_id=self.id).delete(synchronize_session=False)
+        self.bump_token_version()
+    
+    def bump_token_version(self):
+        """Invalidate every signed access token issued so far"""
+        self.token_version = (self.token_version or 0) + 1
+        self.tokens_revoked_at = datetime.utcnow()
     
     def update_last_login(self):
         """Update last login timestamp"""
@@ -95,16 +101,92 @@ class User(db.Model):
     @staticmethod
     def verify_auth_token(token):
         """Verify auth token and return user if valid"""
+        session = UserSession.verify_access_token(token)
+        return session.user if session else None
+    
+    def __repr__(self):
+        return f'<User {self.username}>'
+
+class UserSession(db.Model):
+    """Login session (one per device); tokens are stored only as SHA-256 hashes"""
+    __tablename__ = 'user_session'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    access_token_hash = db.Column(db.String(64), unique=True)  # Unused in signed token mode
+    access_expires_at = db.Column(db.DateTime)
+    refresh_token_hash = db.Column(db.String(64), unique=True, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # Refresh expiry; swept afterwards
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @staticmethod
+    def hash_token(token):
+        """Hash a token for storage and lookup"""
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+    
+    def set_access_token(self, expires_in):
+        """Issue a new access token for this session"""
+        token = secrets.token_urlsafe(32)
+        self.access_token_hash = UserSession.hash_token(token)
+        self.access_expires_at = datetime.utcnow() + timedelta(seconds=expires_in)
+        return token
+    
+    def set_refresh_token(self, expires_in=604800):
+        """Issue a new refresh token (expires in 7 days by default)"""
+        token = secrets.token_urlsafe(32)
+        self.refresh_token_hash = UserSession.hash_token(token)
+        self.expires_at = datetime.utcnow() + timedelta(seconds=expires_in)
+        return token
+    
+    def is_access_token_valid(self):
+        """Check if the access token is set and not expired"""
+        if not self.access_token_hash or not self.access_expires_at:
+            return False
+        return datetime.utcnow() < self.access_expires_at
+    
+    def is_refresh_token_valid(self):
+        """Check if the session can still be refreshed"""
+        return datetime.utcnow() < self.expires_at
+    
+    @staticmethod
+    def verify_access_token(token):
+        """Return the live session for an access token, with its user loaded"""
         if not token:
             return None
         
-        user = User.query.filter_by(auth_token=token).first()
-        if user and user.is_token_valid() and user.is_active:
-            return user
+        # The user's eager wishlist is not needed to authenticate a request
+        session = UserSession.query.options(
+            joinedload(UserSession.user).lazyload(User.wishlist_products)
+        ).filter_by(
+            access_token_hash=UserSession.hash_token(token)
+        ).first()
+        if session and session.is_access_token_valid() and session.user.is_active:
+            return session
         return None
     
+    @staticmethod
+    def find_by_refresh_token(token):
+        """Return the session for a refresh token, if any"""
+        if not token:
+            return None
+        return UserSession.query.filter_by(refresh_token_hash=UserSession.hash_token(token)).first()
+    
+    @staticmethod
+    def sweep_expired(batch_size=1000):
+        """Delete expired sessions in chunks, committing after each chunk"""
+        deleted = 0
+        while True:
+            ids = [row.id for row in db.session.query(UserSession.id).filter(
+                UserSession.expires_at < datetime.utcnow()
+            ).limit(batch_size).all()]
+            if not ids:
+                return deleted
+            UserSession.query.filter(UserSession.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            deleted += len(ids)
+    
     def __repr__(self):
-        return f'<User {self.username}>'
+        return f'<UserSession {self.id} user={self.user_id}>'
 
 class Category(db.Model):
     """Product category model"""
@@ -114,15 +196,110 @@ class Category(db.Model):
     image_url = db.Column(db.String(255))
     is_active = db.Column(db.Boolean, default=True)
     parent_id = db.Column(db.Integer, db.ForeignKey('category.id'))
+    # Materialized path of ancestor ids ending with this one, e.g. "/1/3/";
+    # maintained by the mapper events below
+    path = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Self-referential relationship for subcategories
     subcategories = db.relationship('Category', backref=db.backref('parent', remote_side=[id]))
     products = db.relationship('Product', backref='category', lazy=True)
     
+    @property
+    def ancestor_ids(self):
+        """Ids from the root down to and including this category"""
+        return Category.path_ids(self.path)
+    
+    @staticmethod
+    def path_ids(path):
+        """Category ids in a materialized path"""
+        return [int(part) for part in (path or '').strip('/').split('/') if part]
+    
+    @staticmethod
+    def subtree_ids(path):
+        """Select the ids of a category and all its descendants (indexed prefix match)"""
+        return db.select(Category.id).where(
+            _path_prefix_match(Category.path, path, db.session.get_bind().dialect.name)
+        )
+    
+    @staticmethod
+    def rebuild_paths():
+        """Recompute every category path from parent_id; returns the number changed"""
+        rows = db.session.query(Category.id, Category.parent_id, Category.path).all()
+        parents = {row.id: row.parent_id for row in rows}
+        paths = {}
+        
+        def build(category_id, seen=()):
+            if category_id not in paths:
+                parent_id = parents.get(category_id)
+                if parent_id is None or parent_id not in parents or category_id in seen:
+                    paths[category_id] = f'/{category_id}/'
+                else:
+                    paths[category_id] = build(parent_id, seen + (category_id,)) + f'{category_id}/'
+            return paths[category_id]
+        
+        changed = [{'id': row.id, 'path': build(row.id)} for row in rows if build(row.id) != row.path]
+        if changed:
+            db.session.execute(db.update(Category.__table__).where(
+                Category.__table__.c.id == db.bindparam('category_id')
+            ).values(path=db.bindparam('new_path')), [
+                {'category_id': row['id'], 'new_path': row['path']} for row in changed
+            ])
+        db.session.commit()
+        return len(changed)
+    
     def __repr__(self):
         return f'<Category {self.name}>'
 
+# text_pattern_ops lets Postgres use the index for LIKE 'prefix%' under any collation
+db.Index('ix_category_path', Category.path, postgresql_ops={'path': 'text_pattern_ops'})
+
+def _path_prefix_match(column, path, dialect_name):
+    # SQLite only searches an index for case-sensitive prefix matches, which
+    # LIKE is not; paths hold digits and slashes only, so GLOB needs no escaping
+    if dialect_name == 'sqlite':
+        return column.op('GLOB')(f'{path}*')
+    return column.like(f'{path}%')
+
+def _parent_path(connection, parent_id):
+    if parent_id is None:
+        return '/'
+    path = connection.execute(
+        db.select(Category.path).where(Category.id == parent_id)
+    ).scalar()
+    return path or f'/{parent_id}/'
+
+@db.event.listens_for(Category, 'after_insert')
+def _set_category_path(mapper, connection, target):
+    path = f'{_parent_path(connection, target.parent_id)}{target.id}/'
+    connection.execute(
+        db.update(Category.__table__).where(Category.__table__.c.id == target.id).values(path=path)
+    )
+    set_committed_value(target, 'path', path)
+
+@db.event.listens_for(Category, 'before_update')
+def _check_category_move(mapper, connection, target):
+    if not db.inspect(target).attrs.parent_id.history.has_changes() or target.parent_id is None:
+        return
+    if target.parent_id == target.id or f'/{target.id}/' in _parent_path(connection, target.parent_id):
+        raise ValueError('A category cannot be moved under itself or one of its subcategories')
+
+@db.event.listens_for(Category, 'after_update')
+def _move_category_subtree(mapper, connection, target):
+    if not db.inspect(target).attrs.parent_id.history.has_changes():
+        return
+    old_path = target.path or f'/{target.id}/'
+    new_path = f'{_parent_path(connection, target.parent_id)}{target.id}/'
+    table = Category.__table__
+    # Re-prefix this category and every descendant in one statement
+    connection.execute(
+        db.update(table).where(_path_prefix_match(table.c.path, old_path, connection.dialect.name)).values(
+            path=db.literal(new_path) + db.func.substr(table.c.path, len(old_path) + 1)
+        )
+    )
+    set_committed_value(target, 'path', new_path)
+
 class Product(db.Model):
     """Product model"""
     id = db.Column(db.Integer, primary_key=True)
@@ -146,10 +323,17 @@ class Product(db.Model):
     tags = db.Column(db.String(500))  # Comma-separated tags
     rating_average = db.Column(db.Float, default=0.0)
     rating_count = db.Column(db.Integer, default=0)
+    # Approved reviews per star rating, kept in step with each review insert
+    rating_1_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_2_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_3_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_4_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_5_count = db.Column(db.Integer, default=0, nullable=False)
     view_count = db.Column(db.Integer, default=0)
     sold_count = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Indexed for the catalog Last-Modified validator (MAX(updated_at))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Foreign Keys
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
@@ -177,13 +361,74 @@ class Product(db.Model):
             return round(((self.compare_price - self.price) / self.compare_price) * 100, 2)
         return 0
     
+    @property
+    def rating_histogram(self):
+        """Approved review counts keyed by star rating"""
+        return {str(stars): getattr(self, f'rating_{stars}_count') or 0 for stars in range(1, 6)}
+    
+    @staticmethod
+    def rating_count_column(stars):
+        """Histogram column for a 1-5 star rating"""
+        return getattr(Product, f'rating_{stars}_count')
+    
     def __repr__(self):
         return f'<Product {self.name}>'
 
+# Listing filters: active products by category and price range, newest first
+db.Index('ix_product_active_category_price', Product.is_active, Product.category_id, Product.price)
+db.Index('ix_product_active_created_at', Product.is_active, Product.created_at)
+# Partial index: only the (few) products at or below their minimum stock level
+db.Index('ix_product_low_stock', Product.stock_quantity,
+         postgresql_where=Product.stock_quantity <= Product.min_stock_level,
+         sqlite_where=Product.stock_quantity <= Product.min_stock_level)
+
+# Full-text search document: name > tags > description
+def _weighted_tsvector(column, weight):
+    return db.func.setweight(
+        db.func.to_tsvector(db.text("'english'"), db.func.coalesce(column, db.text("''"))),
+        db.text(f"'{weight}'")
+    )
+
+def product_search_vector():
+    """Weighted tsvector expression over a product (Postgres)"""
+    return _weighted_tsvector(Product.name, 'A').op('||')(
+        _weighted_tsvector(Product.tags, 'B')
+    ).op('||')(
+        _weighted_tsvector(Product.description, 'C')
+    )
+
+db.Index('ix_product_search_vector', product_search_vector(), postgresql_using='gin').ddl_if(dialect='postgresql')
+
+# Typo-tolerant search: pg_trgm GIN indexes for word similarity on name, SKU and tags
+db.event.listen(Product.__table__, 'before_create',
+                db.DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+for _column in (Product.name, Product.sku, Product.tags):
+    db.Index(f'ix_product_{_column.key}_trgm', _column, postgresql_using='gin',
+             postgresql_ops={_column.key: 'gin_trgm_ops'}).ddl_if(dialect='postgresql')
+
+# SQLite: external-content FTS5 table kept in sync by triggers
+_PRODUCT_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5("
+    "name, tags, description, content='product', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN "
+    "INSERT INTO product_fts(rowid, name, tags, description) VALUES (new.id, new.name, new.tags, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN "
+    "INSERT INTO product_fts(product_fts, rowid, name, tags, description) "
+    "VALUES ('delete', old.id, old.name, old.tags, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE OF name, tags, description ON product BEGIN "
+    "INSERT INTO product_fts(product_fts, rowid, name, tags, description) "
+    "VALUES ('delete', old.id, old.name, old.tags, old.description); "
+    "INSERT INTO product_fts(rowid, name, tags, description) VALUES (new.id, new.name, new.tags, new.description); END",
+]
+for _statement in _PRODUCT_FTS_DDL:
+    db.event.listen(Product.__table__, 'after_create', db.DDL(_statement).execute_if(dialect='sqlite'))
+db.event.listen(Product.__table__, 'before_drop',
+                db.DDL('DROP TABLE IF EXISTS product_fts').execute_if(dialect='sqlite'))
+
 class ProductImage(db.Model):
     """Product image model"""
     id = db.Column(db.Integer, primary_key=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, index=True)
     image_url = db.Column(db.String(255), nullable=False)
     alt_text = db.Column(db.String(200))
     is_primary = db.Column(db.Boolean, default=False)
@@ -196,7 +441,7 @@ class ProductImage(db.Model):
 class ProductVariant(db.Model):
     """Product variant model (for size, color, etc.)"""
     id = db.Column(db.Integer, primary_key=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)  # e.g., "Red - Large"
     sku = db.Column(db.String(100), unique=True, nullable=False)
     price = db.Column(db.Float)  # If different from base product price
@@ -270,10 +515,15 @@ class Order(db.Model):
     def __repr__(self):
         return f'<Order {self.order_number}>'
 
+# Order history per customer and admin listings by status, newest first
+db.Index('ix_order_user_created_at', Order.user_id, Order.created_at)
+db.Index('ix_order_status_created_at', Order.status, Order.created_at)
+db.Index('ix_order_created_at', Order.created_at)
+
 class OrderItem(db.Model):
     """Order item model"""
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     product_variant_id = db.Column(db.Integer, db.ForeignKey('product_variant.id'))
     
@@ -296,7 +546,7 @@ class OrderItem(db.Model):
 class CartItem(db.Model):
     """Shopping cart item model"""
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     product_variant_id = db.Column(db.Integer, db.ForeignKey('product_variant.id'))
     quantity = db.Column(db.Integer, nullable=False, default=1)
@@ -356,6 +606,9 @@ class Review(db.Model):
     def __repr__(self):
         return f'<Review {self.rating}★ for {self.product.name}>'
 
+# Approved reviews of a product, newest first
+db.Index('ix_review_product_approved_created_at', Review.product_id, Review.is_approved, Review.created_at)
+
 class Coupon(db.Model):
     """Coupon/Discount code model"""
     id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,98 @@
+"""
+Keyset (cursor) pagination with opaque, signed cursors
+"""
+from datetime import datetime
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import tuple_
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that is tampered with or built for another sort"""
+
+
+class KeysetPage:
+    """One page of keyset results"""
+
+    def __init__(self, items, per_page, next_cursor):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.has_next = next_cursor is not None
+
+    def meta(self):
+        """Pagination block for responses; totals are skipped in cursor mode"""
+        return {
+            'per_page': self.per_page,
+            'next_cursor': self.next_cursor,
+            'has_next': self.has_next
+        }
+
+
+class ListPage:
+    """Page-number pagination over an already ranked in-memory result"""
+
+    def __init__(self, items, page, per_page, total):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.pages = (total + per_page - 1) // per_page if per_page else 0
+        self.has_next = page < self.pages
+        self.has_prev = page > 1
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='keyset-cursor')
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def keyset_paginate(query, sort_column, id_column, per_page, cursor=None, descending=True, max_per_page=100):
+    """Return a KeysetPage ordered by (sort_column, id_column).
+
+    ``sort_column`` must be non-nullable; ``id_column`` breaks ties. An empty
+    cursor starts from the first page. ``per_page`` is clamped to
+    1..``max_per_page``.
+    """
+    per_page = max(1, min(per_page, max_per_page))
+    sort_key = f'{sort_column.key}:{"desc" if descending else "asc"}'
+
+    if cursor:
+        try:
+            payload = _serializer().loads(cursor)
+        except BadSignature:
+            raise InvalidCursor('Invalid cursor')
+        if payload.get('k') != sort_key:
+            raise InvalidCursor('Cursor does not match the requested sort')
+        position = (_decode_value(payload['v']), payload['id'])
+        keys = tuple_(sort_column, id_column)
+        query = query.filter(keys < position if descending else keys > position)
+
+    if descending:
+        query = query.order_by(None).order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(None).order_by(sort_column.asc(), id_column.asc())
+
+    items = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = _serializer().dumps({
+            'k': sort_key,
+            'v': _encode_value(getattr(last, sort_column.key)),
+            'id': getattr(last, id_column.key)
+        })
+    return KeysetPage(items, per_page, next_cursor)
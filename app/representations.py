@@ -0,0 +1,41 @@
+"""
+JSON representation for Flask-RESTful responses, using orjson when installed
+"""
+from datetime import date
+from decimal import Decimal
+
+from flask import current_app, make_response
+from flask_restful.representations.json import output_json
+
+try:
+    import orjson
+except ImportError:  # optional; falls back to the stdlib encoder
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError
+
+
+def output_orjson(data, code, headers=None):
+    """Flask-RESTful JSON representation encoded with orjson"""
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+    if current_app.debug:
+        option |= orjson.OPT_INDENT_2
+    resp = make_response(orjson.dumps(data, default=_default, option=option), code)
+    resp.headers.extend(headers or {})
+    resp.mimetype = 'application/json'
+    return resp
+
+
+def init_app(api, app):
+    """Register the configured JSON encoder ('orjson' or 'json') on the Api"""
+    encoder = app.config.get('API_JSON_ENCODER', 'orjson')
+    if encoder == 'orjson' and orjson is not None:
+        api.representations['application/json'] = output_orjson
+    else:
+        api.representations['application/json'] = output_json
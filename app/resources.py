@@ -1,44 +1,84 @@
 """
 API Resources for Taru E-Commerce
 """
-from flask import request, jsonify
-from flask_restful import Resource, Api
+from flask import request, current_app, Response, stream_with_context
+from flask_restful import Resource
 from functools import wraps
-import secrets
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from app.models import (
     db, User, Product, Category, Order, OrderItem, CartItem, 
-    Address, Review, Coupon, Newsletter, ContactMessage,
-    ProductImage, ProductVariant, Payment
+    Address, Review, Newsletter, ContactMessage, UserSession, wishlist
 )
 from app.utils import DatabaseUtils
+from app.loading import with_profile
+from app.pagination import keyset_paginate, InvalidCursor
+from app.search import get_search_backend, suggest_index, trigram_index
+from app.facets import facet_counter
+from app.categories import category_tree
+from app.bulk import (
+    ProductImporter, ImportFormatError, iter_rows, guess_format, INVENTORY_MODES,
+    ProductPatch, InvalidPatch, invalidate_catalog
+)
+from app.exports import build_export, stream_export, InvalidExport, EXPORT_FORMATS
+from app.fieldsets import (
+    PRODUCT_FIELDS, PRODUCT_TILE_FIELDS, SEARCH_RESULT_FIELDS, ORDER_FIELDS, ADMIN_ORDER_DEFAULT, InvalidFieldset,
+    ADMIN_PRODUCT_DEFAULT, PRODUCT_DETAIL_FIELDS, REVIEW_FIELDS, CART_ITEM_FIELDS, CATEGORY_FIELDS,
+    CATEGORY_TREE_DEFAULT, SUBCATEGORY_DEFAULT
+)
+from app.response_cache import response_cache
+from app.counters import view_counter
+from app.conditional import conditional, product_version, catalog_version
+from app.auth import authenticate, invalidate_user
+from app.hashing import HashingPoolSaturated
+
+def hashing_unavailable():
+    """503 response for a saturated password hashing pool"""
+    return {'error': 'Server is busy, please retry shortly'}, 503, {'Retry-After': '1'}
+
+def product_changed(product, previous_category_id=None):
+    """Propagate a committed product write to catalog indexes and caches"""
+    suggest_index.update_product(product)
+    trigram_index.update_product(product)
+    facet_counter.cache.clear()
+    # Category pages list their whole subtree, so ancestors are purged too
+    category_ids = {product.category_id, previous_category_id or product.category_id}
+    for (path,) in db.session.query(Category.path).filter(Category.id.in_(category_ids)):
+        category_ids.update(Category.path_ids(path))
+    response_cache.purge(
+        'products', f'product:{product.id}', *[f'category:{category_id}' for category_id in category_ids]
+    )
+
+def get_bearer_token():
+    """Extract the bearer token from the Authorization header"""
+    token = request.headers.get('Authorization')
+    if token and token.startswith('Bearer '):
+        token = token.split(' ')[1]
+    return token
 
 def token_required(f):
     """Decorator to require authentication token"""
     @wraps(f)
-    def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if token and token.startswith('Bearer '):
-            token = token.split(' ')[1]
+    def decorated(self, *args, **kwargs):
+        token = get_bearer_token()
         
         if not token:
             return {'error': 'Token is missing'}, 401
         
-        current_user = User.verify_auth_token(token)
+        current_user = authenticate(token)
         if not current_user:
             return {'error': 'Invalid or expired token'}, 401
         
-        return f(current_user, *args, **kwargs)
+        return f(self, current_user, *args, **kwargs)
     return decorated
 
 def admin_required(f):
     """Decorator to require admin privileges"""
     @wraps(f)
-    def decorated(current_user, *args, **kwargs):
+    def decorated(self, current_user, *args, **kwargs):
         if not current_user.is_admin:
             return {'error': 'Admin privileges required'}, 403
-        return f(current_user, *args, **kwargs)
+        return f(self, current_user, *args, **kwargs)
     return decorated
 
 # Authentication APIs
@@ -85,6 +125,9 @@ class RegisterAPI(Resource):
                 }
             }, 201
             
+        except HashingPoolSaturated:
+            db.session.rollback()
+            return hashing_unavailable()
         except Exception as e:
             db.session.rollback()
             return {'error': str(e)}, 500
@@ -106,9 +149,16 @@ class LoginAPI(Resource):
             if not user.is_active:
                 return {'error': 'Account is deactivated'}, 401
             
-            # Generate tokens
-            auth_token = user.generate_auth_token()
-            refresh_token = user.generate_refresh_token()
+            # Transparently upgrade hashes made with outdated parameters; with the
+            # hashing pool full the upgrade waits for a later login instead
+            if user.password_needs_rehash():
+                try:
+                    user.set_password(data['password'])
+                except HashingPoolSaturated:
+                    pass
+            
+            # Open a new session; sessions on other devices stay signed in
+            auth_token, refresh_token = user.start_session()
             user.update_last_login()
             
             db.session.commit()
@@ -127,6 +177,9 @@ class LoginAPI(Resource):
                 }
             }, 200
             
+        except HashingPoolSaturated:
+            db.session.rollback()
+            return hashing_unavailable()
         except Exception as e:
             return {'error': str(e)}, 500
 
@@ -135,8 +188,15 @@ class LogoutAPI(Resource):
     def post(self, current_user):
         """User Logout"""
         try:
-            current_user.revoke_tokens()
+            if current_app.config.get('AUTH_TOKEN_MODE') == 'signed':
+                # Signed tokens cannot be revoked one by one
+                current_user.revoke_tokens()
+            else:
+                UserSession.query.filter_by(
+                    access_token_hash=UserSession.hash_token(get_bearer_token())
+                ).delete(synchronize_session=False)
             db.session.commit()
+            invalidate_user(current_user.id)
             return {'message': 'Logout successful'}, 200
         except Exception as e:
             return {'error': str(e)}, 500
@@ -151,14 +211,16 @@ class RefreshTokenAPI(Resource):
             if not refresh_token:
                 return {'error': 'Refresh token is required'}, 400
             
-            user = User.query.filter_by(refresh_token=refresh_token).first()
+            session = UserSession.find_by_refresh_token(refresh_token)
             
-            if not user or not user.is_refresh_token_valid():
+            if not session or not session.is_refresh_token_valid() or not session.user.is_active:
                 return {'error': 'Invalid or expired refresh token'}, 401
             
-            # Generate new auth token
-            new_auth_token = user.generate_auth_token()
+            # Generate new auth token; the session's previous one is no longer valid
+            user = session.user
+            new_auth_token = user.generate_auth_token(session)
             db.session.commit()
+            invalidate_user(user.id)
             
             return {
                 'auth_token': new_auth_token,
@@ -227,15 +289,28 @@ class ChangePasswordAPI(Resource):
             current_user.revoke_tokens()
             
             db.session.commit()
+            invalidate_user(current_user.id)
             
             return {'message': 'Password changed successfully. Please login again.'}, 200
             
+        except HashingPoolSaturated:
+            db.session.rollback()
+            return hashing_unavailable()
         except Exception as e:
             db.session.rollback()
             return {'error': str(e)}, 500
 
 # Product APIs
+PRODUCT_SORT_COLUMNS = {
+    'price': Product.price,
+    'name': Product.name,
+    'rating': Product.rating_average,
+    'created_at': Product.created_at
+}
+
 class ProductListAPI(Resource):
+    @conditional('product_list', catalog_version)
+    @response_cache.cached('product_list', tags=('products',))
     def get(self):
         """Get Products List with Pagination and Filters"""
         try:
@@ -247,6 +322,8 @@ class ProductListAPI(Resource):
             max_price = request.args.get('max_price', type=float)
             sort_by = request.args.get('sort_by', 'created_at')
             sort_order = request.args.get('sort_order', 'desc')
+            facets = facet_counter.parse(request.args.get('facets'))
+            selection = PRODUCT_FIELDS.select(request.args.get('fields'), request.args.get('include'))
             
             query = Product.query.filter_by(is_active=True)
             
@@ -254,15 +331,10 @@ class ProductListAPI(Resource):
             if category_id:
                 query = query.filter_by(category_id=category_id)
             
+            # Relevance ordering is only available in page-number mode
+            rank_by_relevance = bool(search) and sort_by == 'relevance' and 'cursor' not in request.args
             if search:
-                search_query = f"%{search}%"
-                query = query.filter(
-                    db.or_(
-                        Product.name.ilike(search_query),
-                        Product.description.ilike(search_query),
-                        Product.tags.ilike(search_query)
-                    )
-                )
+                query = get_search_backend().apply(query, search, order_by_rank=rank_by_relevance)
             
             if min_price:
                 query = query.filter(Product.price >= min_price)
@@ -270,41 +342,27 @@ class ProductListAPI(Resource):
             if max_price:
                 query = query.filter(Product.price <= max_price)
             
+            # Facet counts for the current filter set, cached per normalized filter key
+            filter_key = (category_id, ' '.join((search or '').lower().split()), min_price, max_price)
+            facet_counts = facet_counter.counts(query, facets, filter_key)
+            
             # Apply sorting
-            if sort_by == 'price':
-                query = query.order_by(Product.price.desc() if sort_order == 'desc' else Product.price.asc())
-            elif sort_by == 'name':
-                query = query.order_by(Product.name.desc() if sort_order == 'desc' else Product.name.asc())
-            elif sort_by == 'rating':
-                query = query.order_by(Product.rating_average.desc() if sort_order == 'desc' else Product.rating_average.asc())
-            else:
-                query = query.order_by(Product.created_at.desc() if sort_order == 'desc' else Product.created_at.asc())
+            sort_column = PRODUCT_SORT_COLUMNS.get(sort_by, Product.created_at)
+            descending = sort_order == 'desc'
             
-            products = query.paginate(page=page, per_page=per_page, error_out=False)
+            # Fetch only the columns and relationships the requested fields need
+            query = query.options(*selection.options(sort_column))
             
-            return {
-                'products': [{
-                    'id': product.id,
-                    'name': product.name,
-                    'description': product.description,
-                    'short_description': product.short_description,
-                    'sku': product.sku,
-                    'price': product.price,
-                    'compare_price': product.compare_price,
-                    'discount_percentage': product.discount_percentage,
-                    'stock_quantity': product.stock_quantity,
-                    'is_in_stock': product.is_in_stock,
-                    'is_featured': product.is_featured,
-                    'rating_average': product.rating_average,
-                    'rating_count': product.rating_count,
-                    'category': {
-                        'id': product.category.id,
-                        'name': product.category.name
-                    },
-                    'images': [{'id': img.id, 'url': img.image_url, 'is_primary': img.is_primary} for img in product.images],
-                    'created_at': product.created_at.isoformat()
-                } for product in products.items],
-                'pagination': {
+            if 'cursor' in request.args:
+                # Keyset mode: no OFFSET scan and no COUNT(*)
+                products = keyset_paginate(query, sort_column, Product.id, per_page,
+                                           request.args.get('cursor'), descending)
+                pagination = products.meta()
+            else:
+                if not rank_by_relevance:
+                    query = query.order_by(sort_column.desc() if descending else sort_column.asc())
+                products = query.paginate(page=page, per_page=per_page, error_out=False)
+                pagination = {
                     'page': page,
                     'per_page': per_page,
                     'total': products.total,
@@ -312,107 +370,79 @@ class ProductListAPI(Resource):
                     'has_next': products.has_next,
                     'has_prev': products.has_prev
                 }
-            }, 200
             
+            response = {
+                'products': [selection.serialize(product) for product in products.items],
+                'pagination': pagination
+            }
+            if facets:
+                response['facets'] = facet_counts
+            
+            return response, 200
+            
+        except (InvalidCursor, InvalidFieldset) as e:
+            return {'error': str(e)}, 400
         except Exception as e:
             return {'error': str(e)}, 500
 
 class ProductDetailAPI(Resource):
     def get(self, product_id):
         """Get Product Details"""
+        result = self._get_product(product_id=product_id)
+        # A 304 revalidation is still a view
+        if getattr(result, 'status_code', None) == 304 or (isinstance(result, tuple) and result[1] == 200):
+            view_counter.increment(product_id)
+        return result
+    
+    @conditional('product_detail', product_version)
+    @response_cache.cached('product_detail', tags=('product:{product_id}',))
+    def _get_product(self, product_id):
+        """Product detail payload; cached, so view counting happens in get()"""
         try:
-            product = Product.query.filter_by(id=product_id, is_active=True).first()
+            selection = PRODUCT_DETAIL_FIELDS.select()
+            product = Product.query.options(*selection.options()).filter_by(id=product_id, is_active=True).first()
             
             if not product:
                 return {'error': 'Product not found'}, 404
             
-            # Increment view count
-            product.view_count += 1
-            db.session.commit()
+            # Only the latest few reviews are embedded; the rest are paged via /reviews
+            reviews = REVIEW_FIELDS.select()
+            recent_reviews = Review.query.options(*reviews.options(Review.created_at)).filter_by(
+                product_id=product.id, is_approved=True
+            ).order_by(Review.created_at.desc(), Review.id.desc()).limit(
+                current_app.config.get('PRODUCT_DETAIL_REVIEW_LIMIT', 5)
+            ).all()
             
-            return {
-                'product': {
-                    'id': product.id,
-                    'name': product.name,
-                    'description': product.description,
-                    'short_description': product.short_description,
-                    'sku': product.sku,
-                    'price': product.price,
-                    'compare_price': product.compare_price,
-                    'discount_percentage': product.discount_percentage,
-                    'stock_quantity': product.stock_quantity,
-                    'is_in_stock': product.is_in_stock,
-                    'is_featured': product.is_featured,
-                    'weight': product.weight,
-                    'dimensions': product.dimensions,
-                    'tags': product.tags,
-                    'rating_average': product.rating_average,
-                    'rating_count': product.rating_count,
-                    'view_count': product.view_count,
-                    'sold_count': product.sold_count,
-                    'category': {
-                        'id': product.category.id,
-                        'name': product.category.name,
-                        'description': product.category.description
-                    },
-                    'images': [{
-                        'id': img.id, 
-                        'url': img.image_url, 
-                        'alt_text': img.alt_text,
-                        'is_primary': img.is_primary,
-                        'sort_order': img.sort_order
-                    } for img in product.images],
-                    'variants': [{
-                        'id': variant.id,
-                        'name': variant.name,
-                        'sku': variant.sku,
-                        'price': variant.price,
-                        'stock_quantity': variant.stock_quantity,
-                        'attributes': variant.attributes
-                    } for variant in product.variants if variant.is_active],
-                    'reviews': [{
-                        'id': review.id,
-                        'rating': review.rating,
-                        'title': review.title,
-                        'comment': review.comment,
-                        'user_name': review.user.first_name + ' ' + review.user.last_name,
-                        'is_verified_purchase': review.is_verified_purchase,
-                        'created_at': review.created_at.isoformat()
-                    } for review in product.reviews if review.is_approved],
-                    'created_at': product.created_at.isoformat()
-                }
-            }, 200
+            payload = selection.serialize(product)
+            payload['reviews'] = [reviews.serialize(review) for review in recent_reviews]
+            return {'product': payload}, 200
             
         except Exception as e:
             return {'error': str(e)}, 500
 
 # Category APIs
 class CategoryListAPI(Resource):
+    @conditional('category_list', catalog_version)
+    @response_cache.cached('category_list', tags=('products',))
     def get(self):
         """Get Categories List"""
         try:
-            categories = Category.query.filter_by(is_active=True).all()
+            tree = category_tree.get()
+            serialize = CATEGORY_FIELDS.select(default=CATEGORY_TREE_DEFAULT).serialize
+            serialize_child = CATEGORY_FIELDS.select(default=SUBCATEGORY_DEFAULT).serialize
             
             return {
                 'categories': [{
-                    'id': category.id,
-                    'name': category.name,
-                    'description': category.description,
-                    'image_url': category.image_url,
-                    'parent_id': category.parent_id,
-                    'subcategories': [{
-                        'id': sub.id,
-                        'name': sub.name,
-                        'description': sub.description
-                    } for sub in category.subcategories if sub.is_active],
-                    'product_count': len([p for p in category.products if p.is_active])
-                } for category in categories]
+                    **serialize(node),
+                    'subcategories': [serialize_child(tree.nodes[child_id]) for child_id in node.children]
+                } for node in tree]
             }, 200
             
         except Exception as e:
             return {'error': str(e)}, 500
 
 class CategoryDetailAPI(Resource):
+    @response_cache.cached('category_detail', tags=('category:{category_id}',))
     def get(self, category_id):
         """Get Category Details with Products"""
         try:
@@ -424,26 +454,14 @@ class CategoryDetailAPI(Resource):
             page = request.args.get('page', 1, type=int)
             per_page = request.args.get('per_page', 12, type=int)
             
-            products = DatabaseUtils.get_products_by_category(category_id, page, per_page)
+            include_subcategories = request.args.get('include_subcategories', 'true').lower() != 'false'
+            
+            products = DatabaseUtils.get_products_by_category(category_id, page, per_page, include_subcategories)
+            serialize = PRODUCT_TILE_FIELDS.select().serialize
             
             return {
-                'category': {
-                    'id': category.id,
-                    'name': category.name,
-                    'description': category.description,
-                    'image_url': category.image_url,
-                    'parent_id': category.parent_id
-                },
-                'products': [{
-                    'id': product.id,
-                    'name': product.name,
-                    'price': product.price,
-                    'compare_price': product.compare_price,
-                    'discount_percentage': product.discount_percentage,
-                    'rating_average': product.rating_average,
-                    'is_in_stock': product.is_in_stock,
-                    'images': [{'url': img.image_url, 'is_primary': img.is_primary} for img in product.images]
-                } for product in products.items],
+                'category': CATEGORY_FIELDS.select().serialize(category),
+                'products': [serialize(product) for product in products.items],
                 'pagination': {
                     'page': page,
                     'per_page': per_page,
@@ -463,34 +481,10 @@ class CartAPI(Resource):
     def get(self, current_user):
         """Get User Cart"""
         try:
-            cart_items = DatabaseUtils.get_user_cart_items(current_user.id)
-            
-            total_amount = 0
-            cart_data = []
-            
-            for item in cart_items:
-                item_total = item.total_price
-                total_amount += item_total
-                
-                cart_data.append({
-                    'id': item.id,
-                    'product': {
-                        'id': item.product.id,
-                        'name': item.product.name,
-                        'price': item.product.price,
-                        'sku': item.product.sku,
-                        'images': [{'url': img.image_url, 'is_primary': img.is_primary} for img in item.product.images]
-                    },
-                    'variant': {
-                        'id': item.product_variant.id,
-                        'name': item.product_variant.name,
-                        'price': item.product_variant.price,
-                        'attributes': item.product_variant.attributes
-                    } if item.product_variant else None,
-                    'quantity': item.quantity,
-                    'item_total': item_total,
-                    'added_at': item.created_at.isoformat()
-                })
+            selection = CART_ITEM_FIELDS.select()
+            cart_items = DatabaseUtils.get_user_cart_items(current_user.id, options=selection.options())
+            cart_data = [selection.serialize(item) for item in cart_items]
+            total_amount = sum(line['item_total'] for line in cart_data)
             
             return {
                 'cart_items': cart_data,
@@ -603,27 +597,16 @@ class OrderAPI(Resource):
         try:
             page = request.args.get('page', 1, type=int)
             per_page = request.args.get('per_page', 10, type=int)
+            selection = ORDER_FIELDS.select(request.args.get('fields'), request.args.get('include'))
+            options = selection.options(Order.created_at)
             
-            orders = DatabaseUtils.get_user_orders(current_user.id, page, per_page)
-            
-            return {
-                'orders': [{
-                    'id': order.id,
-                    'order_number': order.order_number,
-                    'status': order.status,
-                    'payment_status': order.payment_status,
-                    'total_amount': order.total_amount,
-                    'subtotal': order.subtotal,
-                    'tax_amount': order.tax_amount,
-                    'shipping_amount': order.shipping_amount,
-                    'discount_amount': order.discount_amount,
-                    'item_count': len(order.order_items),
-                    'created_at': order.created_at.isoformat(),
-                    'confirmed_at': order.confirmed_at.isoformat() if order.confirmed_at else None,
-                    'shipped_at': order.shipped_at.isoformat() if order.shipped_at else None,
-                    'delivered_at': order.delivered_at.isoformat() if order.delivered_at else None
-                } for order in orders.items],
-                'pagination': {
+            if 'cursor' in request.args:
+                orders = DatabaseUtils.get_user_orders(current_user.id, per_page=per_page,
+                                                       cursor=request.args.get('cursor'), options=options)
+                pagination = orders.meta()
+            else:
+                orders = DatabaseUtils.get_user_orders(current_user.id, page, per_page, options=options)
+                pagination = {
                     'page': page,
                     'per_page': per_page,
                     'total': orders.total,
@@ -631,8 +614,14 @@ class OrderAPI(Resource):
                     'has_next': orders.has_next,
                     'has_prev': orders.has_prev
                 }
+            
+            return {
+                'orders': [selection.serialize(order) for order in orders.items],
+                'pagination': pagination
             }, 200
             
+        except (InvalidCursor, InvalidFieldset) as e:
+            return {'error': str(e)}, 400
         except Exception as e:
             return {'error': str(e)}, 500
     
@@ -690,8 +679,22 @@ class OrderAPI(Resource):
             # Clear cart
             for cart_item in cart_items:
                 db.session.delete(cart_item)
+            db.session.flush()
+            
+            touched = {(item.product_id, item.product.category_id) for item in cart_items}
+            
+            # Reserve stock last so the conditional UPDATEs hold their row locks only until the commit
+            out_of_stock = DatabaseUtils.reserve_stock([
+                (item.product_id, item.product_variant_id, item.quantity) for item in cart_items
+            ])
+            if out_of_stock:
+                db.session.rollback()
+                return {'error': 'Some items are out of stock', 'out_of_stock': out_of_stock}, 409
             
             db.session.commit()
+            # Stock and sold counts appear in product, list and category payloads
+            invalidate_catalog({category_id for _, category_id in touched},
+                               {product_id for product_id, _ in touched}, search=False)
             
             return {
                 'message': 'Order created successfully',
@@ -712,7 +715,7 @@ class OrderDetailAPI(Resource):
     def get(self, current_user, order_id):
         """Get Order Details"""
         try:
-            order = Order.query.filter_by(
+            order = with_profile(Order.query, 'order_detail').filter_by(
                 id=order_id,
                 user_id=current_user.id
             ).first()
@@ -772,17 +775,16 @@ class WishlistAPI(Resource):
     def get(self, current_user):
         """Get User Wishlist"""
         try:
+            selection = PRODUCT_TILE_FIELDS.select()
+            products = Product.query.options(*selection.options()).join(
+                wishlist, wishlist.c.product_id == Product.id
+            ).filter(
+                wishlist.c.user_id == current_user.id,
+                Product.is_active == True
+            ).all()
+            
             return {
-                'wishlist': [{
-                    'id': product.id,
-                    'name': product.name,
-                    'price': product.price,
-                    'compare_price': product.compare_price,
-                    'discount_percentage': product.discount_percentage,
-                    'is_in_stock': product.is_in_stock,
-                    'rating_average': product.rating_average,
-                    'images': [{'url': img.image_url, 'is_primary': img.is_primary} for img in product.images]
-                } for product in current_user.wishlist_products if product.is_active]
+                'wishlist': [selection.serialize(product) for product in products]
             }, 200
             
         except Exception as e:
@@ -836,7 +838,51 @@ class WishlistItemAPI(Resource):
             return {'error': str(e)}, 500
 
 # Review APIs
+REVIEW_SORTS = {
+    'newest': (Review.created_at, True),
+    'oldest': (Review.created_at, False),
+    'highest': (Review.rating, True),
+    'lowest': (Review.rating, False)
+}
+
 class ReviewAPI(Resource):
+    @response_cache.cached('product_reviews', tags=('product:{product_id}',))
+    def get(self, product_id):
+        """Get Product Reviews (cursor paginated)"""
+        try:
+            product = Product.query.filter_by(id=product_id, is_active=True).first()
+            if not product:
+                return {'error': 'Product not found'}, 404
+            
+            per_page = min(request.args.get('per_page', 10, type=int), 50)
+            sort_column, descending = REVIEW_SORTS.get(request.args.get('sort', 'newest'), REVIEW_SORTS['newest'])
+            rating = request.args.get('rating', type=int)
+            
+            selection = REVIEW_FIELDS.select()
+            query = Review.query.options(*selection.options(sort_column)).filter_by(
+                product_id=product_id, is_approved=True
+            )
+            if rating:
+                query = query.filter_by(rating=rating)
+            
+            reviews = keyset_paginate(query, sort_column, Review.id, per_page,
+                                      request.args.get('cursor'), descending)
+            
+            return {
+                'reviews': [selection.serialize(review) for review in reviews.items],
+                'summary': {
+                    'rating_average': product.rating_average,
+                    'rating_count': product.rating_count,
+                    'rating_histogram': product.rating_histogram
+                },
+                'pagination': reviews.meta()
+            }, 200
+            
+        except InvalidCursor as e:
+            return {'error': str(e)}, 400
+        except Exception as e:
+            return {'error': str(e)}, 500
+    
     @token_required
     def post(self, current_user, product_id):
         """Add Product Review"""
@@ -849,6 +895,7 @@ class ReviewAPI(Resource):
             
             if not rating or rating not in range(1, 6):
                 return {'error': 'Rating must be between 1 and 5'}, 400
+            rating = int(rating)  # 4.0 passes the range check
             
             product = Product.query.filter_by(id=product_id, is_active=True).first()
             if not product:
@@ -880,10 +927,13 @@ class ReviewAPI(Resource):
             )
             
             db.session.add(review)
-            db.session.commit()
             
-            # Update product rating
-            DatabaseUtils.update_product_rating(product_id)
+            # New reviews are approved by default: update the product's rating
+            # aggregates in the same transaction as the insert
+            DatabaseUtils.add_product_rating(product_id, rating)
+            db.session.commit()
+            # Ratings show on the category pages of every ancestor and in the rating facets
+            invalidate_catalog({product.category_id}, {product_id}, search=False)
             
             return {'message': 'Review added successfully'}, 201
             
@@ -1088,9 +1138,9 @@ class AdminDashboardAPI(Resource):
             total_users = User.query.count()
             total_products = Product.query.filter_by(is_active=True).count()
             total_categories = Category.query.filter_by(is_active=True).count()
-            low_stock_products = len(DatabaseUtils.get_low_stock_products())
+            low_stock_products = DatabaseUtils.count_low_stock_products()
             
-            recent_orders = Order.query.order_by(Order.created_at.desc()).limit(10).all()
+            recent_orders = with_profile(Order.query, 'order_admin').order_by(Order.created_at.desc()).limit(10).all()
             
             return {
                 'sales_stats': stats,
@@ -1119,24 +1169,18 @@ class AdminProductAPI(Resource):
         try:
             page = request.args.get('page', 1, type=int)
             per_page = request.args.get('per_page', 20, type=int)
+            selection = PRODUCT_FIELDS.select(request.args.get('fields'), request.args.get('include'),
+                                              default=ADMIN_PRODUCT_DEFAULT)
             
-            products = Product.query.paginate(page=page, per_page=per_page, error_out=False)
+            query = Product.query.options(*selection.options(Product.created_at))
             
-            return {
-                'products': [{
-                    'id': product.id,
-                    'name': product.name,
-                    'sku': product.sku,
-                    'price': product.price,
-                    'stock_quantity': product.stock_quantity,
-                    'is_active': product.is_active,
-                    'is_featured': product.is_featured,
-                    'category_name': product.category.name,
-                    'sold_count': product.sold_count,
-                    'view_count': product.view_count,
-                    'created_at': product.created_at.isoformat()
-                } for product in products.items],
-                'pagination': {
+            if 'cursor' in request.args:
+                products = keyset_paginate(query, Product.created_at, Product.id, per_page,
+                                           request.args.get('cursor'))
+                pagination = products.meta()
+            else:
+                products = query.paginate(page=page, per_page=per_page, error_out=False)
+                pagination = {
                     'page': page,
                     'per_page': per_page,
                     'total': products.total,
@@ -1144,8 +1188,14 @@ class AdminProductAPI(Resource):
                     'has_next': products.has_next,
                     'has_prev': products.has_prev
                 }
+            
+            return {
+                'products': [selection.serialize(product) for product in products.items],
+                'pagination': pagination
             }, 200
             
+        except (InvalidCursor, InvalidFieldset) as e:
+            return {'error': str(e)}, 400
         except Exception as e:
             return {'error': str(e)}, 500
     
@@ -1187,6 +1237,7 @@ class AdminProductAPI(Resource):
             
             db.session.add(product)
             db.session.commit()
+            product_changed(product)
             
             return {
                 'message': 'Product created successfully',
@@ -1208,6 +1259,7 @@ class AdminProductDetailAPI(Resource):
                 return {'error': 'Product not found'}, 404
             
             data = request.get_json()
+            previous_category_id = product.category_id
             
             # Update fields
             for field in ['name', 'description', 'short_description', 'price', 'compare_price',
@@ -1217,6 +1269,7 @@ class AdminProductDetailAPI(Resource):
                     setattr(product, field, data[field])
             
             db.session.commit()
+            product_changed(product, previous_category_id)
             
             return {'message': 'Product updated successfully'}, 200
             
@@ -1236,6 +1289,7 @@ class AdminProductDetailAPI(Resource):
             # Soft delete - just set as inactive
             product.is_active = False
             db.session.commit()
+            product_changed(product)
             
             return {'message': 'Product deleted successfully'}, 200
             
@@ -1243,6 +1297,77 @@ class AdminProductDetailAPI(Resource):
             db.session.rollback()
             return {'error': str(e)}, 500
 
+class AdminProductImportAPI(Resource):
+    @token_required
+    @admin_required
+    def post(self, current_user):
+        """Bulk Import Products from CSV or JSON lines (upsert by SKU)"""
+        try:
+            # Catalog files are far larger than ordinary request bodies
+            request.max_content_length = current_app.config.get('BULK_IMPORT_MAX_CONTENT_LENGTH')
+            
+            if request.mimetype == 'multipart/form-data':
+                upload = request.files.get('file')
+                if not upload:
+                    return {'error': 'file is required'}, 400
+                stream = upload.stream
+                fmt = request.args.get('format') or guess_format(upload.filename, upload.mimetype)
+            else:
+                stream = request.stream
+                fmt = request.args.get('format') or guess_format(mimetype=request.mimetype)
+            
+            importer = ProductImporter(
+                chunk_size=current_app.config.get('BULK_IMPORT_CHUNK_SIZE', 1000),
+                max_errors=current_app.config.get('BULK_IMPORT_MAX_ERRORS', 1000)
+            )
+            return importer.run(iter_rows(stream, fmt)), 200
+            
+        except ImportFormatError as e:
+            return {'error': str(e)}, 400
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 500
+
+class AdminInventoryAPI(Resource):
+    @token_required
+    @admin_required
+    def post(self, current_user):
+        """Bulk Update Product and Variant Stock (absolute levels or deltas)"""
+        try:
+            data = request.get_json() or {}
+            updates = data.get('updates')
+            mode = data.get('mode', 'absolute')
+            
+            if not isinstance(updates, list) or not updates:
+                return {'error': 'updates must be a non-empty list'}, 400
+            if mode not in INVENTORY_MODES:
+                return {'error': f'mode must be one of: {", ".join(INVENTORY_MODES)}'}, 400
+            max_updates = current_app.config.get('BULK_INVENTORY_MAX_UPDATES', 100000)
+            if len(updates) > max_updates:
+                return {'error': f'At most {max_updates} updates per request'}, 400
+            
+            return DatabaseUtils.bulk_update_inventory(updates, mode), 200
+            
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 500
+
+class AdminProductBulkPatchAPI(Resource):
+    @token_required
+    @admin_required
+    def patch(self, current_user):
+        """Bulk Update Price, Compare Price or Flags on Selected Products"""
+        try:
+            data = request.get_json() or {}
+            patch = ProductPatch(data.get('select'), data.get('changes'))
+            return patch.apply(dry_run=bool(data.get('dry_run'))), 200
+            
+        except InvalidPatch as e:
+            return {'error': str(e)}, 400
+        except Exception as e:
+            db.session.rollback()
+            return {'error': str(e)}, 500
+
 class AdminOrderAPI(Resource):
     @token_required
     @admin_required
@@ -1252,31 +1377,22 @@ class AdminOrderAPI(Resource):
             page = request.args.get('page', 1, type=int)
             per_page = request.args.get('per_page', 20, type=int)
             status = request.args.get('status')
+            selection = ORDER_FIELDS.select(request.args.get('fields'), request.args.get('include'),
+                                            default=ADMIN_ORDER_DEFAULT)
             
-            query = Order.query
+            query = Order.query.options(*selection.options(Order.created_at))
             if status:
                 query = query.filter_by(status=status)
             
-            orders = query.order_by(Order.created_at.desc()).paginate(
-                page=page, per_page=per_page, error_out=False
-            )
-            
-            return {
-                'orders': [{
-                    'id': order.id,
-                    'order_number': order.order_number,
-                    'customer': {
-                        'id': order.customer.id,
-                        'name': f"{order.customer.first_name} {order.customer.last_name}",
-                        'email': order.customer.email
-                    },
-                    'status': order.status,
-                    'payment_status': order.payment_status,
-                    'total_amount': order.total_amount,
-                    'item_count': len(order.order_items),
-                    'created_at': order.created_at.isoformat()
-                } for order in orders.items],
-                'pagination': {
+            if 'cursor' in request.args:
+                orders = keyset_paginate(query, Order.created_at, Order.id, per_page,
+                                         request.args.get('cursor'))
+                pagination = orders.meta()
+            else:
+                orders = query.order_by(Order.created_at.desc()).paginate(
+                    page=page, per_page=per_page, error_out=False
+                )
+                pagination = {
                     'page': page,
                     'per_page': per_page,
                     'total': orders.total,
@@ -1284,8 +1400,14 @@ class AdminOrderAPI(Resource):
                     'has_next': orders.has_next,
                     'has_prev': orders.has_prev
                 }
+            
+            return {
+                'orders': [selection.serialize(order) for order in orders.items],
+                'pagination': pagination
             }, 200
             
+        except (InvalidCursor, InvalidFieldset) as e:
+            return {'error': str(e)}, 400
         except Exception as e:
             return {'error': str(e)}, 500
 
@@ -1323,8 +1445,34 @@ class AdminOrderDetailAPI(Resource):
             db.session.rollback()
             return {'error': str(e)}, 500
 
+class AdminExportAPI(Resource):
+    @token_required
+    @admin_required
+    def get(self, current_user, dataset):
+        """Stream an Export of Orders, Products or Customers as CSV or NDJSON"""
+        try:
+            fmt = request.args.get('format', 'csv')
+            statement = build_export(dataset, fmt, request.args)
+            
+            body = stream_export(
+                statement, fmt,
+                yield_per=current_app.config.get('EXPORT_YIELD_PER', 1000),
+                chunk_size=current_app.config.get('EXPORT_CHUNK_SIZE', 64 * 1024)
+            )
+            filename = f"{dataset}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{fmt}"
+            return Response(stream_with_context(body), mimetype=EXPORT_FORMATS[fmt], headers={
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                'Cache-Control': 'no-store'
+            })
+            
+        except InvalidExport as e:
+            return {'error': str(e)}, 400
+        except Exception as e:
+            return {'error': str(e)}, 500
+
 # Search API
 class SearchAPI(Resource):
+    @response_cache.cached('search', tags=('products',))
     def get(self):
         """Global Search for Products"""
         try:
@@ -1335,21 +1483,19 @@ class SearchAPI(Resource):
             if not query:
                 return {'error': 'Search query is required'}, 400
             
-            products = DatabaseUtils.search_products(query, page, per_page)
+            fuzzy = request.args.get('fuzzy', 'false').lower() == 'true'
+            
+            if fuzzy:
+                products = DatabaseUtils.fuzzy_search_products(query, page, per_page)
+            else:
+                products = DatabaseUtils.search_products(query, page, per_page)
+            
+            serialize = PRODUCT_TILE_FIELDS.selection(SEARCH_RESULT_FIELDS).serialize
             
             return {
                 'query': query,
-                'products': [{
-                    'id': product.id,
-                    'name': product.name,
-                    'price': product.price,
-                    'compare_price': product.compare_price,
-                    'discount_percentage': product.discount_percentage,
-                    'rating_average': product.rating_average,
-                    'is_in_stock': product.is_in_stock,
-                    'category_name': product.category.name,
-                    'images': [{'url': img.image_url, 'is_primary': img.is_primary} for img in product.images]
-                } for product in products.items],
+                'fuzzy': fuzzy,
+                'products': [serialize(product) for product in products.items],
                 'pagination': {
                     'page': page,
                     'per_page': per_page,
@@ -1362,3 +1508,15 @@ class SearchAPI(Resource):
             
         except Exception as e:
             return {'error': str(e)}, 500
+
+class SearchSuggestAPI(Resource):
+    def get(self):
+        """Prefix Suggestions for Search-as-you-type"""
+        try:
+            prefix = request.args.get('q', '')
+            limit = min(request.args.get('limit', 5, type=int), 20)
+            
+            return dict(suggest_index.suggest(prefix, limit), query=prefix), 200
+            
+        except Exception as e:
+            return {'error': str(e)}, 500
@@ -0,0 +1,276 @@
+"""
+Response caching for public catalog reads with tag-based invalidation
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from functools import wraps
+
+from flask import request
+
+from app.cache import LRUCache
+
+
+class NullBackend:
+    """Backend that never stores anything (CACHE_TYPE = 'null')"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {'type': 'null'}
+
+
+class SimpleBackend:
+    """In-process LRU backend; each worker keeps its own copy"""
+
+    def __init__(self, maxsize=2048, default_timeout=300):
+        self.default_timeout = default_timeout
+        self._entries = LRUCache(maxsize=maxsize, ttl=default_timeout)
+        # Tag versions are small and must outlive the entries they guard
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        if key.startswith('tag:'):
+            with self._lock:
+                return self._tags.get(key)
+        return self._entries.get(key)
+
+    def set(self, key, value, timeout=None):
+        if key.startswith('tag:'):
+            with self._lock:
+                self._tags[key] = value
+            return
+        self._entries.set(key, value, ttl=timeout)
+
+    def delete(self, key):
+        if key.startswith('tag:'):
+            with self._lock:
+                self._tags.pop(key, None)
+            return
+        self._entries.delete(key)
+
+    def clear(self):
+        self._entries.clear()
+        with self._lock:
+            self._tags.clear()
+
+    def stats(self):
+        return dict(self._entries.stats(), type='simple')
+
+
+class FileSystemBackend:
+    """Pickle-per-key backend in a private directory, for multi-worker deployments.
+
+    Writes go through a temp file and os.replace so readers in other workers
+    never see a partial entry. Tag versions live in their own subdirectory:
+    they never expire and do not count toward ``threshold``. The entry count
+    is checked every ``threshold // 20`` writes per worker, and only then is
+    the directory pruned, oldest files first, by modification time (expired
+    entries are otherwise dropped when read).
+    """
+
+    def __init__(self, directory, threshold=5000, default_timeout=300):
+        self.directory = directory
+        self.threshold = threshold
+        self.default_timeout = default_timeout
+        self._entries = os.path.join(directory, 'entries')
+        self._tags = os.path.join(directory, 'tags')
+        # Entries are unpickled, so only this user may write them
+        for path in (directory, self._entries, self._tags):
+            os.makedirs(path, mode=0o700, exist_ok=True)
+        self._check_every = max(threshold // 20, 1)
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        folder = self._tags if key.startswith('tag:') else self._entries
+        return os.path.join(folder, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires_at, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires_at and expires_at <= time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        expires_at = time.time() + timeout if timeout else 0
+        path = self._path(key)
+        if not key.startswith('tag:'):
+            self._maybe_prune()
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((expires_at, value), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for folder in (self._entries, self._tags):
+            for name in os.listdir(folder):
+                try:
+                    os.remove(os.path.join(folder, name))
+                except OSError:
+                    pass
+
+    def _maybe_prune(self):
+        with self._lock:
+            self._writes += 1
+            if self._writes < self._check_every:
+                return
+            self._writes = 0
+        self._prune()
+
+    def _prune(self):
+        """Drop the least recently written entries once over threshold"""
+        names = [name for name in os.listdir(self._entries) if not name.startswith('.tmp-')]
+        if len(names) <= self.threshold:
+            return
+        entries = []
+        for name in names:
+            path = os.path.join(self._entries, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        entries.sort()
+        for _, path in entries[:max(len(entries) - self.threshold, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        return {'type': 'filesystem', 'size': len(os.listdir(self._entries)), 'threshold': self.threshold}
+
+
+class ResponseCache:
+    """Caches (payload, 200) results of GET resources, tagged for invalidation.
+
+    Every tag has a version token. An entry stores the versions of its tags as
+    they were before the response was built; purging a tag replaces its token,
+    so every entry carrying the old one misses on its next read.
+    """
+
+    def __init__(self):
+        self.backend = NullBackend()
+        self.default_timeout = 300
+
+    def init_app(self, app):
+        cache_type = app.config.get('CACHE_TYPE', 'simple')
+        self.default_timeout = app.config.get('CACHE_DEFAULT_TIMEOUT', 300)
+        if cache_type == 'simple':
+            self.backend = SimpleBackend(
+                maxsize=app.config.get('CACHE_THRESHOLD', 2048),
+                default_timeout=self.default_timeout
+            )
+        elif cache_type == 'filesystem':
+            self.backend = FileSystemBackend(
+                app.config.get('CACHE_DIR') or os.path.join(app.instance_path, 'response-cache'),
+                threshold=app.config.get('CACHE_THRESHOLD', 2048),
+                default_timeout=self.default_timeout
+            )
+        elif cache_type == 'null':
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f'Unknown CACHE_TYPE: {cache_type}')
+        app.extensions['response_cache'] = self
+
+    @staticmethod
+    def make_key(namespace, view_args):
+        """Cache key from the view arguments and the sorted query string"""
+        args = sorted(request.args.items(multi=True))
+        return 'response:' + repr((namespace, sorted(view_args.items()), args))
+
+    def _tag_versions(self, tags):
+        versions = {}
+        for tag in tags:
+            version = self.backend.get('tag:' + tag)
+            if version is None:
+                version = uuid.uuid4().hex
+                self.backend.set('tag:' + tag, version, timeout=0)
+            versions[tag] = version
+        return versions
+
+    def get(self, key):
+        """Return a cached payload whose tags are all still current, else None"""
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        payload, versions = entry
+        for tag, version in versions.items():
+            if self.backend.get('tag:' + tag) != version:
+                return None
+        return payload
+
+    def set(self, key, payload, versions, timeout=None):
+        self.backend.set(key, (payload, versions), timeout=timeout)
+
+    def tag_version(self, tag):
+        """Current version token of a tag (created on first use)"""
+        return self._tag_versions([tag])[tag]
+
+    def purge(self, *tags):
+        """Invalidate every entry carrying any of the given tags"""
+        for tag in set(tags):
+            self.backend.set('tag:' + tag, uuid.uuid4().hex, timeout=0)
+
+    def cached(self, namespace, tags, timeout=None):
+        """Decorator for a Resource GET method.
+
+        ``tags`` are format strings filled from the view arguments, e.g.
+        ``'product:{product_id}'``. Only 200 responses are stored.
+        """
+        def decorator(f):
+            @wraps(f)
+            def decorated(resource, *args, **kwargs):
+                if isinstance(self.backend, NullBackend):
+                    return f(resource, *args, **kwargs)
+
+                key = self.make_key(namespace, kwargs)
+                payload = self.get(key)
+                if payload is not None:
+                    return payload, 200, {'X-Cache': 'HIT'}
+
+                versions = self._tag_versions([tag.format(**kwargs) for tag in tags])
+                result = f(resource, *args, **kwargs)
+                if isinstance(result, tuple) and len(result) == 2 and result[1] == 200:
+                    self.set(key, result[0], versions, timeout=timeout)
+                    return result[0], 200, {'X-Cache': 'MISS'}
+                return result
+            return decorated
+        return decorator
+
+    def stats(self):
+        return self.backend.stats()
+
+
+response_cache = ResponseCache()
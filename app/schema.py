@@ -0,0 +1,125 @@
+"""
+Idempotent schema upgrade for databases created before the current models
+
+db.create_all() only creates missing tables, so columns and indexes added
+to existing tables since they were created are applied here. Every step
+checks the live schema first, so the upgrade can be re-run safely. Retired
+columns are only dropped when asked for explicitly.
+"""
+from sqlalchemy import inspect, text
+
+from app.models import db, User, Category, Product, _PRODUCT_FTS_DDL
+from app.utils import DatabaseUtils
+
+# Columns added to existing tables, with the default that fills existing rows
+ADDED_COLUMNS = [
+    (User.__table__.c.token_version, '0'),
+    (User.__table__.c.tokens_revoked_at, None),
+    (Category.__table__.c.path, None),
+    (Category.__table__.c.updated_at, None),
+    *[(Product.__table__.c[f'rating_{stars}_count'], '0') for stars in range(1, 6)],
+]
+
+# Per-user token columns replaced by the user_session table
+DROPPED_COLUMNS = [
+    (User.__table__, 'auth_token'),
+    (User.__table__, 'token_expires_at'),
+    (User.__table__, 'refresh_token'),
+    (User.__table__, 'refresh_token_expires_at'),
+]
+
+
+def _columns(connection, table):
+    return {column['name'] for column in inspect(connection).get_columns(table.name)}
+
+
+def _add_columns(connection, steps):
+    preparer = connection.dialect.identifier_preparer
+    existing = {}
+    for column, default in ADDED_COLUMNS:
+        table = column.table
+        if table.name not in existing:
+            existing[table.name] = _columns(connection, table)
+        if column.name in existing[table.name]:
+            continue
+        ddl = (f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} '
+               f'{column.type.compile(dialect=connection.dialect)}')
+        if default is not None:
+            ddl += f' DEFAULT {default}'
+        if not column.nullable:
+            ddl += ' NOT NULL'
+        connection.execute(text(ddl))
+        steps.append(f'added {table.name}.{column.name}')
+
+    # Existing categories count as last modified when they were created
+    if 'added category.updated_at' in steps:
+        table = Category.__table__
+        connection.execute(table.update().where(table.c.updated_at.is_(None)).values(
+            updated_at=db.func.coalesce(table.c.created_at, db.func.current_timestamp())
+        ))
+
+
+def _drop_columns(connection, steps):
+    preparer = connection.dialect.identifier_preparer
+    for table, name in DROPPED_COLUMNS:
+        if name not in _columns(connection, table):
+            continue
+        if connection.dialect.name == 'sqlite':
+            # SQLite cannot drop UNIQUE columns; clear the stale tokens instead
+            result = connection.execute(text(f'UPDATE {preparer.format_table(table)} SET {preparer.quote(name)} = NULL '
+                                             f'WHERE {preparer.quote(name)} IS NOT NULL'))
+            if result.rowcount:
+                steps.append(f'cleared {table.name}.{name}')
+        else:
+            connection.execute(text(f'ALTER TABLE {preparer.format_table(table)} DROP COLUMN {preparer.quote(name)}'))
+            steps.append(f'dropped {table.name}.{name}')
+
+
+def _create_search_objects(connection, steps):
+    if connection.dialect.name == 'postgresql':
+        # Needed by the gin_trgm_ops indexes below
+        connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    elif connection.dialect.name == 'sqlite' and not inspect(connection).has_table('product_fts'):
+        for statement in _PRODUCT_FTS_DDL:
+            connection.execute(text(statement))
+        connection.execute(text("INSERT INTO product_fts(product_fts) VALUES ('rebuild')"))
+        steps.append('created product_fts')
+
+
+def _create_indexes(connection, steps):
+    inspector = inspect(connection)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        missing = [index for index in table.indexes if index.name not in existing]
+        for index in missing:
+            # Skips dialect-specific indexes (ddl_if) on other databases
+            index.create(connection)
+        if missing:
+            created = {index['name'] for index in inspect(connection).get_indexes(table.name)} - existing
+            steps.extend(f'created index {name}' for name in sorted(created))
+
+
+def upgrade_schema(drop_columns=False):
+    """Bring an existing database up to the current models; returns the steps applied.
+
+    ``drop_columns`` also drops DROPPED_COLUMNS (destructive, so off by default).
+    """
+    steps = []
+    db.create_all()
+    with db.engine.begin() as connection:
+        _add_columns(connection, steps)
+        if drop_columns:
+            _drop_columns(connection, steps)
+        _create_search_objects(connection, steps)
+        _create_indexes(connection, steps)
+
+    # Backfills for the new columns; both only write rows that differ
+    changed = Category.rebuild_paths()
+    if changed:
+        steps.append(f'rebuilt {changed} category paths')
+    updated = DatabaseUtils.recompute_product_ratings()
+    if updated:
+        steps.append(f'recomputed ratings for {updated} products')
+    return steps
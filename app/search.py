@@ -0,0 +1,465 @@
+"""
+Product search backends
+
+``get_search_backend()`` picks the implementation for the bound database:
+Postgres full-text search (weighted tsvector + GIN index), SQLite FTS5, or
+the plain ILIKE scan for anything else.
+"""
+import bisect
+import heapq
+import itertools
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+
+from sqlalchemy import func, literal, literal_column, select, text
+
+from app.models import db, Product, Category, product_search_vector
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchBackend(ABC):
+    """Filters a Product query by free text and optionally orders it by relevance"""
+
+    @abstractmethod
+    def apply(self, query, search_text, order_by_rank=True):
+        """Return ``query`` filtered to products matching search_text"""
+
+
+class LikeSearch(SearchBackend):
+    """Substring match on name, description and tags (no index, no ranking)"""
+
+    def apply(self, query, search_text, order_by_rank=True):
+        pattern = f"%{search_text}%"
+        return query.filter(
+            db.or_(
+                Product.name.ilike(pattern),
+                Product.description.ilike(pattern),
+                Product.tags.ilike(pattern)
+            )
+        )
+
+
+class PostgresFullTextSearch(SearchBackend):
+    """tsvector match served by ix_product_search_vector, ranked with ts_rank"""
+
+    def apply(self, query, search_text, order_by_rank=True):
+        vector = product_search_vector()
+        tsquery = func.websearch_to_tsquery(text("'english'"), search_text)
+        query = query.filter(vector.op('@@')(tsquery))
+        if order_by_rank:
+            query = query.order_by(func.ts_rank(vector, tsquery).desc(), Product.id.desc())
+        return query
+
+
+class SqliteFullTextSearch(SearchBackend):
+    """FTS5 match on the product_fts table, ranked with weighted bm25"""
+
+    @staticmethod
+    def match_expression(search_text):
+        """Quote each word as an FTS5 prefix term so user input cannot inject syntax"""
+        words = _WORD_RE.findall(search_text)
+        return ' '.join('"%s"*' % word for word in words)
+
+    def apply(self, query, search_text, order_by_rank=True):
+        expression = self.match_expression(search_text)
+        if not expression:
+            return query.filter(db.false())
+
+        matches = select(
+            literal_column('rowid').label('product_id'),
+            literal_column('bm25(product_fts, 10.0, 5.0, 1.0)').label('rank')
+        ).select_from(text('product_fts')).where(
+            text('product_fts MATCH :fts_query').bindparams(fts_query=expression)
+        ).cte('fts_matches').prefix_with('MATERIALIZED')
+
+        # Materialized (SQLite 3.35+) so MATCH runs once: as a flattened subquery
+        # the planner may drive from an is_active index and re-run MATCH per product
+        query = query.join(matches, matches.c.product_id == Product.id)
+        if order_by_rank:
+            # bm25 scores are negative; lower means more relevant
+            query = query.order_by(matches.c.rank.asc(), Product.id.desc())
+        return query
+
+
+_BACKENDS = {
+    'postgresql': PostgresFullTextSearch(),
+    'sqlite': SqliteFullTextSearch(),
+}
+_FALLBACK = LikeSearch()
+
+
+def get_search_backend():
+    """Return the search backend for the current database dialect"""
+    return _BACKENDS.get(db.session.get_bind().dialect.name, _FALLBACK)
+
+
+def _normalize(value):
+    return ' '.join((value or '').lower().split())
+
+
+def _split_tags(tags):
+    return [tag.strip() for tag in (tags or '').split(',') if tag.strip()]
+
+
+class SuggestIndex:
+    """In-process prefix index for search-as-you-type suggestions.
+
+    Product names, category names and tags are kept in sorted arrays of
+    (normalized key, id) and looked up with bisect. Product names are also
+    indexed from each later word, so "pho" finds "Smart Phone X". The index
+    is built lazily, patched per product on admin writes and fully rebuilt
+    after ``max_age`` seconds so other workers' changes are picked up.
+
+    For prefixes up to ``RANKED_PREFIX_LENGTH`` characters the best
+    ``TOP_SIZE`` products (by sold_count) and tags (by product count) are
+    ranked at index time, so a popular prefix answers from a short list;
+    longer prefixes rank their (few) matching keys per request.
+    """
+    MAX_NAME_SUFFIXES = 4
+    RANKED_PREFIX_LENGTH = 6
+    TOP_SIZE = 20  # largest suggestion limit served
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._product_keys = []    # sorted (key, product_id)
+        self._products = {}        # product_id -> (name, weight, keys, tag keys)
+        self._top_products = {}    # short prefix -> best product ids
+        self._category_keys = []   # sorted (key, category_id)
+        self._categories = {}      # category_id -> name
+        self._tag_keys = []        # sorted (key, key)
+        self._tags = {}            # tag key -> [display, product count]
+        self._top_tags = {}        # short prefix -> best tag keys
+
+    def init_app(self, app):
+        self.max_age = app.config.get('SUGGEST_INDEX_MAX_AGE', 300)
+        app.extensions['suggest_index'] = self
+
+    # Building
+
+    def rebuild(self):
+        """Load all active products and categories"""
+        products = db.session.query(
+            Product.id, Product.name, Product.tags, Product.sold_count
+        ).filter(Product.is_active == True).all()
+        categories = db.session.query(Category.id, Category.name).filter(Category.is_active == True).all()
+
+        with self._lock:
+            self._product_keys, self._products = [], {}
+            self._tag_keys, self._tags = [], {}
+            for row in products:
+                self._add_product(row.id, row.name, row.tags, row.sold_count)
+            self._product_keys.sort()
+            self._tag_keys.sort()
+            self._top_products = self._rank_prefixes(self._product_keys, self._product_rank)
+            self._top_tags = self._rank_prefixes(self._tag_keys, self._tag_rank)
+            self._category_keys = sorted((_normalize(name), category_id) for category_id, name in categories)
+            self._categories = dict(categories)
+            self._built_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._built_at is None or time.monotonic() - self._built_at > self.max_age:
+            self.rebuild()
+
+    def invalidate(self):
+        """Force a full rebuild on next use (after bulk catalog changes)"""
+        with self._lock:
+            self._built_at = None
+
+    def _name_keys(self, name):
+        words = _normalize(name).split()
+        return tuple(' '.join(words[i:]) for i in range(min(len(words), self.MAX_NAME_SUFFIXES)))
+
+    def _add_product(self, product_id, name, tags, weight, sort=False):
+        keys = self._name_keys(name)
+        tag_keys = []
+        for key in keys:
+            entry = (key, product_id)
+            if sort:
+                bisect.insort(self._product_keys, entry)
+            else:
+                self._product_keys.append(entry)
+        for tag in _split_tags(tags):
+            tag_key = _normalize(tag)
+            if tag_key in tag_keys:
+                continue
+            tag_keys.append(tag_key)
+            if tag_key in self._tags:
+                self._tags[tag_key][1] += 1
+            else:
+                self._tags[tag_key] = [tag, 1]
+                if sort:
+                    bisect.insort(self._tag_keys, (tag_key, tag_key))
+                else:
+                    self._tag_keys.append((tag_key, tag_key))
+        self._products[product_id] = (name, weight or 0, keys, tuple(tag_keys))
+
+    def _remove_product(self, product_id):
+        entry = self._products.pop(product_id, None)
+        if entry is None:
+            return
+        _, _, keys, tag_keys = entry
+        for key in keys:
+            i = bisect.bisect_left(self._product_keys, (key, product_id))
+            if i < len(self._product_keys) and self._product_keys[i] == (key, product_id):
+                del self._product_keys[i]
+        for tag_key in tag_keys:
+            self._tags[tag_key][1] -= 1
+            if self._tags[tag_key][1] <= 0:
+                del self._tags[tag_key]
+                i = bisect.bisect_left(self._tag_keys, (tag_key, tag_key))
+                if i < len(self._tag_keys) and self._tag_keys[i] == (tag_key, tag_key):
+                    del self._tag_keys[i]
+
+    def update_product(self, product):
+        """Re-index one product after it was created, edited or deactivated"""
+        with self._lock:
+            if self._built_at is None:
+                return
+            old = self._products.get(product.id)
+            self._remove_product(product.id)
+            if product.is_active:
+                self._add_product(product.id, product.name, product.tags, product.sold_count, sort=True)
+            new = self._products.get(product.id)
+
+            # Re-rank the short prefixes of the old and new names and tags
+            keys = set((old[2] if old else ()) + (new[2] if new else ()))
+            tag_keys = set((old[3] if old else ()) + (new[3] if new else ()))
+            self._rerank(self._top_products, self._product_keys, keys, self._product_rank)
+            self._rerank(self._top_tags, self._tag_keys, tag_keys, self._tag_rank)
+
+    # Ranking
+
+    def _product_rank(self, product_id):
+        return self._products[product_id][1], -product_id
+
+    def _tag_rank(self, tag_key):
+        return self._tags[tag_key][1]
+
+    def _best(self, ids, rank, limit=None):
+        """Best distinct ids, best first"""
+        return heapq.nlargest(limit or self.TOP_SIZE, dict.fromkeys(ids), key=rank)
+
+    def _rank_prefixes(self, keys, rank):
+        """{prefix: best ids} for every prefix up to RANKED_PREFIX_LENGTH characters"""
+        # Rank the longest prefixes from the keys, then each shorter prefix
+        # from its children's best lists (a parent's best are among them)
+        candidates = defaultdict(list)
+        for key, item in keys:
+            candidates[key[:self.RANKED_PREFIX_LENGTH]].append(item)
+        top = {}
+        for length in range(self.RANKED_PREFIX_LENGTH, 0, -1):
+            for prefix in [prefix for prefix in candidates if len(prefix) == length]:
+                top[prefix] = self._best(candidates.pop(prefix), rank)
+                if length > 1:
+                    candidates[prefix[:-1]].extend(top[prefix])
+        return top
+
+    def _rerank(self, top, keys, changed_keys, rank):
+        prefixes = {key[:length] for key in changed_keys
+                    for length in range(1, min(len(key), self.RANKED_PREFIX_LENGTH) + 1)}
+        for prefix in prefixes:
+            best = self._best((item for _, item in self._range(keys, prefix)), rank)
+            if best:
+                top[prefix] = best
+            else:
+                top.pop(prefix, None)
+
+    # Lookup
+
+    @staticmethod
+    def _range(keys, prefix):
+        """Yield the (key, id) entries whose key starts with prefix"""
+        i = bisect.bisect_left(keys, (prefix,))
+        while i < len(keys) and keys[i][0].startswith(prefix):
+            yield keys[i]
+            i += 1
+
+    def _top(self, top, keys, prefix, rank, limit):
+        if len(prefix) <= self.RANKED_PREFIX_LENGTH:
+            return top.get(prefix, [])[:limit]
+        return self._best((item for _, item in self._range(keys, prefix)), rank, limit)
+
+    def suggest(self, prefix, limit=5):
+        """Top product names, categories and tags starting with prefix"""
+        prefix = _normalize(prefix)
+        limit = max(1, min(limit, self.TOP_SIZE))
+        if not prefix:
+            return {'products': [], 'categories': [], 'tags': []}
+
+        with self._lock:
+            self._ensure_fresh()
+            top_products = self._top(self._top_products, self._product_keys, prefix, self._product_rank, limit)
+            category_ids = [cid for _, cid in itertools.islice(self._range(self._category_keys, prefix), limit)]
+            tag_keys = self._top(self._top_tags, self._tag_keys, prefix, self._tag_rank, limit)
+
+            return {
+                'products': [{'id': pid, 'name': self._products[pid][0]} for pid in top_products],
+                'categories': [{'id': cid, 'name': self._categories[cid]} for cid in category_ids],
+                'tags': [{'tag': self._tags[key][0], 'product_count': self._tags[key][1]} for key in tag_keys]
+            }
+
+
+suggest_index = SuggestIndex()
+
+
+def trigrams(word):
+    """pg_trgm-style trigrams of a single lower-cased word"""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """In-process trigram index for typo-tolerant search (non-Postgres databases).
+
+    Words from product names, SKUs and tags form a vocabulary; each word is
+    posted under its trigrams. A query word is matched against vocabulary
+    words by trigram Jaccard similarity, and products are scored by the mean
+    best similarity of the query words. Built lazily, patched per product on
+    admin writes and fully rebuilt after ``max_age`` seconds.
+    """
+
+    def __init__(self, max_age=300, threshold=0.3):
+        self.max_age = max_age
+        self.threshold = threshold
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._word_ids = {}          # word -> word id
+        self._word_sizes = []        # word id -> trigram count
+        self._postings = {}          # trigram -> set of word ids
+        self._word_products = []     # word id -> set of product ids
+        self._product_words = {}     # product id -> word ids
+
+    def init_app(self, app):
+        self.max_age = app.config.get('SUGGEST_INDEX_MAX_AGE', 300)
+        self.threshold = app.config.get('FUZZY_SEARCH_THRESHOLD', 0.3)
+        app.extensions['trigram_index'] = self
+
+    @staticmethod
+    def _product_terms(name, sku, tags):
+        terms = set(_WORD_RE.findall((name or '').lower()))
+        terms.update(_WORD_RE.findall((tags or '').lower()))
+        if sku:
+            terms.add(sku.lower())
+        return terms
+
+    def rebuild(self):
+        """Load all active products"""
+        rows = db.session.query(
+            Product.id, Product.name, Product.sku, Product.tags
+        ).filter(Product.is_active == True).all()
+
+        with self._lock:
+            self._word_ids, self._word_sizes, self._postings = {}, [], {}
+            self._word_products, self._product_words = [], {}
+            for row in rows:
+                self._add_product(row.id, self._product_terms(row.name, row.sku, row.tags))
+            self._built_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._built_at is None or time.monotonic() - self._built_at > self.max_age:
+            self.rebuild()
+
+    def invalidate(self):
+        """Force a full rebuild on next use (after bulk catalog changes)"""
+        with self._lock:
+            self._built_at = None
+
+    def _word_id(self, word):
+        word_id = self._word_ids.get(word)
+        if word_id is None:
+            word_id = len(self._word_sizes)
+            self._word_ids[word] = word_id
+            grams = trigrams(word)
+            self._word_sizes.append(len(grams))
+            self._word_products.append(set())
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(word_id)
+        return word_id
+
+    def _add_product(self, product_id, terms):
+        word_ids = {self._word_id(term) for term in terms}
+        for word_id in word_ids:
+            self._word_products[word_id].add(product_id)
+        self._product_words[product_id] = word_ids
+
+    def _remove_product(self, product_id):
+        for word_id in self._product_words.pop(product_id, ()):
+            self._word_products[word_id].discard(product_id)
+
+    def update_product(self, product):
+        """Re-index one product after it was created, edited or deactivated"""
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._remove_product(product.id)
+            if product.is_active:
+                self._add_product(product.id, self._product_terms(product.name, product.sku, product.tags))
+
+    def _similar_words(self, word):
+        """Vocabulary word ids with trigram similarity >= threshold, with their score"""
+        grams = trigrams(word)
+        shared = {}
+        for gram in grams:
+            for word_id in self._postings.get(gram, ()):
+                shared[word_id] = shared.get(word_id, 0) + 1
+        matches = {}
+        for word_id, count in shared.items():
+            similarity = count / (len(grams) + self._word_sizes[word_id] - count)
+            if similarity >= self.threshold:
+                matches[word_id] = similarity
+        return matches
+
+    def search(self, search_text):
+        """Return [(product_id, score)] best first"""
+        words = [word.lower() for word in _WORD_RE.findall(search_text)]
+        if not words:
+            return []
+
+        with self._lock:
+            self._ensure_fresh()
+            scores = {}
+            for word in words:
+                best = {}
+                for word_id, similarity in self._similar_words(word).items():
+                    for product_id in self._word_products[word_id]:
+                        if similarity > best.get(product_id, 0):
+                            best[product_id] = similarity
+                for product_id, similarity in best.items():
+                    scores[product_id] = scores.get(product_id, 0) + similarity
+
+        ranked = [(product_id, total / len(words)) for product_id, total in scores.items()]
+        ranked = [item for item in ranked if item[1] >= self.threshold]
+        ranked.sort(key=lambda item: (-item[1], -item[0]))
+        return ranked
+
+
+trigram_index = TrigramIndex()
+
+
+class PostgresTrigramSearch:
+    """pg_trgm word similarity over name, SKU and tags, served by the *_trgm GIN indexes"""
+
+    def apply(self, query, search_text, threshold):
+        """Filter and rank a Product query by word similarity to search_text"""
+        # Transaction-local threshold used by the index-backed <% operator
+        db.session.execute(
+            select(func.set_config('pg_trgm.word_similarity_threshold', str(threshold), True))
+        )
+        score = func.greatest(
+            func.word_similarity(search_text, Product.name),
+            func.word_similarity(search_text, Product.sku),
+            func.word_similarity(search_text, func.coalesce(Product.tags, ''))
+        )
+        return query.filter(
+            db.or_(
+                literal(search_text).op('<%')(Product.name),
+                literal(search_text).op('<%')(Product.sku),
+                literal(search_text).op('<%')(Product.tags)
+            )
+        ).order_by(score.desc(), Product.id.desc())
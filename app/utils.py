@@ -2,7 +2,11 @@
 Database utility functions
 """
 from app.models import db, User, Product, Order, Category
-from sqlalchemy import func
+from app.loading import with_profile
+from app.pagination import keyset_paginate, ListPage
+from app.search import get_search_backend, trigram_index, PostgresTrigramSearch
+from flask import current_app
+from sqlalchemy import Integer, Numeric, case, cast, column, func, or_, update, values
 from datetime import datetime, timedelta
 
 class DatabaseUtils:
@@ -29,12 +33,17 @@ class DatabaseUtils:
         return Product.query.filter_by(is_featured=True, is_active=True).limit(limit).all()
     
     @staticmethod
-    def get_products_by_category(category_id, page=1, per_page=12):
-        """Get products by category with pagination"""
-        return Product.query.filter_by(
-            category_id=category_id, 
-            is_active=True
-        ).paginate(
+    def get_products_by_category(category_id, page=1, per_page=12, include_subcategories=True):
+        """Get products by category with pagination, including active subcategories by default"""
+        query = with_profile(Product.query, 'product_card').filter_by(is_active=True)
+        path = db.session.query(Category.path).filter_by(id=category_id).scalar() if include_subcategories else None
+        if path:
+            query = query.filter(Product.category_id.in_(
+                Category.subtree_ids(path).where(Category.is_active == True)
+            ))
+        else:
+            query = query.filter_by(category_id=category_id)
+        return query.paginate(
             page=page, 
             per_page=per_page, 
             error_out=False
@@ -42,21 +51,32 @@ class DatabaseUtils:
     
     @staticmethod
     def search_products(query, page=1, per_page=12):
-        """Search products by name or description"""
-        search_query = f"%{query}%"
-        return Product.query.filter(
-            db.or_(
-                Product.name.ilike(search_query),
-                Product.description.ilike(search_query),
-                Product.tags.ilike(search_query)
-            ),
-            Product.is_active == True
-        ).paginate(
+        """Full-text search over name, tags and description, ranked by relevance"""
+        products = with_profile(Product.query, 'product_card').filter(Product.is_active == True)
+        return get_search_backend().apply(products, query).paginate(
             page=page,
             per_page=per_page,
             error_out=False
         )
     
+    @staticmethod
+    def fuzzy_search_products(query, page=1, per_page=12):
+        """Typo-tolerant search on name, SKU and tags, ranked by trigram similarity"""
+        products = with_profile(Product.query, 'product_card').filter(Product.is_active == True)
+        
+        if db.session.get_bind().dialect.name == 'postgresql':
+            threshold = current_app.config.get('FUZZY_SEARCH_THRESHOLD', 0.3)
+            return PostgresTrigramSearch().apply(products, query, threshold).paginate(
+                page=page,
+                per_page=per_page,
+                error_out=False
+            )
+        
+        ranked = trigram_index.search(query)
+        page_ids = [product_id for product_id, _ in ranked[(page - 1) * per_page:page * per_page]]
+        by_id = {product.id: product for product in products.filter(Product.id.in_(page_ids)).all()}
+        return ListPage([by_id[i] for i in page_ids if i in by_id], page, per_page, len(ranked))
+    
     @staticmethod
     def get_low_stock_products(threshold=None):
         """Get products with low stock"""
@@ -70,15 +90,34 @@ class DatabaseUtils:
             ).all()
     
     @staticmethod
-    def get_user_cart_items(user_id):
-        """Get all cart items for a user"""
+    def count_low_stock_products():
+        """Count products at or below their minimum stock level"""
+        return Product.query.filter(
+            Product.stock_quantity <= Product.min_stock_level
+        ).count()
+    
+    @staticmethod
+    def get_user_cart_items(user_id, options=None):
+        """Get all cart items for a user, with products, images and variants loaded.
+        
+        ``options`` replaces the default cart loading profile.
+        """
         from app.models import CartItem
-        return CartItem.query.filter_by(user_id=user_id).all()
+        query = CartItem.query.filter_by(user_id=user_id)
+        query = query.options(*options) if options is not None else with_profile(query, 'cart')
+        return query.all()
     
     @staticmethod
-    def get_user_orders(user_id, page=1, per_page=10):
-        """Get user orders with pagination"""
-        return Order.query.filter_by(user_id=user_id).order_by(
+    def get_user_orders(user_id, page=1, per_page=10, cursor=None, options=None):
+        """Get user orders with pagination (keyset pagination when a cursor is given).
+        
+        ``options`` replaces the default order_summary loading profile.
+        """
+        query = Order.query.filter_by(user_id=user_id)
+        query = query.options(*options) if options is not None else with_profile(query, 'order_summary')
+        if cursor is not None:
+            return keyset_paginate(query, Order.created_at, Order.id, per_page, cursor)
+        return query.order_by(
             Order.created_at.desc()
         ).paginate(
             page=page,
@@ -92,24 +131,69 @@ class DatabaseUtils:
         return Order.query.filter_by(order_number=order_number).first()
     
     @staticmethod
-    def update_product_rating(product_id):
-        """Update product rating based on reviews"""
+    def add_product_rating(product_id, rating):
+        """Count one new approved review in the product's rating aggregates.
+        
+        A single UPDATE built from the current column values, so concurrent
+        reviews cannot lose increments; the caller commits it together with
+        the review insert. The average comes from the star histogram when it
+        accounts for every counted review, else (rows rated before the
+        histogram was backfilled) from the stored average and count.
+        """
+        histogram = [Product.rating_count_column(stars) for stars in range(1, 6)]
+        previous_count = func.coalesce(Product.rating_count, 0)
+        previous_total = case(
+            (sum(histogram) == previous_count, sum(stars * column for stars, column in enumerate(histogram, start=1))),
+            else_=func.coalesce(Product.rating_average, 0) * previous_count
+        )
+        rating_count = previous_count + 1
+        
+        Product.query.filter_by(id=product_id).update({
+            Product.rating_count_column(rating): Product.rating_count_column(rating) + 1,
+            Product.rating_count: rating_count,
+            Product.rating_average: func.round(cast(previous_total + rating, Numeric) / rating_count, 2)
+        }, synchronize_session=False)
+    
+    @staticmethod
+    def recompute_product_ratings():
+        """Rebuild rating aggregates for all products from approved reviews.
+        
+        One GROUP BY over reviews; only products whose stored aggregates
+        differ are written. Returns the number of products updated.
+        """
         from app.models import Review
         
-        reviews = Review.query.filter_by(
-            product_id=product_id,
-            is_approved=True
-        ).all()
+        aggregates = db.session.query(
+            Review.product_id.label('product_id'),
+            func.count().label('rating_count'),
+            func.round(cast(func.avg(Review.rating), Numeric), 2).label('rating_average'),
+            *[func.sum(case((Review.rating == stars, 1), else_=0)).label(f'rating_{stars}_count')
+              for stars in range(1, 6)]
+        ).filter(Review.is_approved.is_(True)).group_by(Review.product_id).subquery('aggregates')
         
-        if reviews:
-            total_rating = sum(review.rating for review in reviews)
-            avg_rating = total_rating / len(reviews)
-            
-            product = Product.query.get(product_id)
-            if product:
-                product.rating_average = round(avg_rating, 2)
-                product.rating_count = len(reviews)
-                db.session.commit()
+        columns = ['rating_count', 'rating_average'] + [f'rating_{stars}_count' for stars in range(1, 6)]
+        
+        updated = Product.query.filter(
+            Product.id == aggregates.c.product_id,
+            or_(*[getattr(Product, name).is_distinct_from(aggregates.c[name]) for name in columns])
+        ).update({
+            getattr(Product, name): aggregates.c[name] for name in columns
+        }, synchronize_session=False)
+        
+        # Products whose reviews were all removed or unapproved
+        reviewed = db.session.query(Review.product_id).filter(Review.is_approved.is_(True))
+        updated += Product.query.filter(
+            ~Product.id.in_(reviewed),
+            or_(Product.rating_count != 0, Product.rating_average != 0,
+                *[Product.rating_count_column(stars) != 0 for stars in range(1, 6)])
+        ).update({
+            Product.rating_count: 0,
+            Product.rating_average: 0.0,
+            **{Product.rating_count_column(stars): 0 for stars in range(1, 6)}
+        }, synchronize_session=False)
+        
+        db.session.commit()
+        return updated
     
     @staticmethod
     def get_sales_stats(days=30):
@@ -157,12 +241,12 @@ class DatabaseUtils:
     
     @staticmethod
     def get_categories_with_product_count():
-        """Get all categories with product count"""
+        """Get all active categories with their active product count"""
         return db.session.query(
             Category,
             func.count(Product.id).label('product_count')
         ).outerjoin(
-            Product, Category.id == Product.category_id
+            Product, (Category.id == Product.category_id) & (Product.is_active == True)
         ).filter(
             Category.is_active == True
         ).group_by(
@@ -186,21 +270,102 @@ class DatabaseUtils:
                 return order_number
     
     @staticmethod
-    def bulk_update_inventory(updates):
-        """Bulk update product inventory
+    def _reserve_rows(table, lines, extra=None):
+        """Conditionally decrement stock for {id: (quantity, sold)}; returns the ids that succeeded"""
+        stock = func.coalesce(table.c.stock_quantity, 0)
+        
+        if db.session.get_bind().dialect.name == 'postgresql':
+            # One UPDATE ... FROM (VALUES ...) for every line; rows whose stock
+            # is short are simply not matched, so no lock is taken on them
+            rows = values(
+                column('row_id', Integer), column('quantity', Integer), column('sold', Integer), name='lines'
+            ).data([(row_id, quantity, sold) for row_id, (quantity, sold) in sorted(lines.items())])
+            statement = update(table).where(
+                table.c.id == rows.c.row_id, table.c.is_active.is_(True), stock >= rows.c.quantity
+            ).values(stock_quantity=stock - rows.c.quantity, **(extra(rows.c.sold) if extra else {}))
+            return set(db.session.scalars(statement.returning(table.c.id)))
+        
+        # SQLite and others: writers are serialized, one conditional UPDATE per line
+        reserved = set()
+        for row_id, (quantity, sold) in sorted(lines.items()):
+            statement = update(table).where(
+                table.c.id == row_id, table.c.is_active.is_(True), stock >= quantity
+            ).values(stock_quantity=stock - quantity, **(extra(sold) if extra else {}))
+            if db.session.execute(statement).rowcount:
+                reserved.add(row_id)
+        return reserved
+    
+    @staticmethod
+    def reserve_stock(items):
+        """Reserve stock for checkout lines without read-then-write races
         
         Args:
-            updates: List of dictionaries with 'product_id' and 'quantity' keys
+            items: List of (product_id, variant_id or None, quantity)
+        
+        Decrements variant stock for variant lines and product stock
+        otherwise, only where enough stock is left (``stock >= quantity`` in
+        the UPDATE itself), and adds every line to ``sold_count``. Does not
+        commit: returns the out-of-stock lines as dicts, and the caller must
+        roll back if there are any.
         """
-        try:
-            for update in updates:
-                product = Product.query.get(update['product_id'])
-                if product:
-                    product.stock_quantity = max(0, update['quantity'])
+        from app.models import ProductVariant
+        
+        # Repeated lines for the same product or variant are reserved together
+        product_lines = {}
+        variant_lines = {}
+        for product_id, variant_id, quantity in items:
+            reserve = 0 if variant_id else quantity
+            held, sold = product_lines.get(product_id, (0, 0))
+            product_lines[product_id] = (held + reserve, sold + quantity)
+            if variant_id:
+                variant_lines[variant_id] = (variant_lines.get(variant_id, (0, 0))[0] + quantity, 0)
+        
+        product_table = Product.__table__
+        reserved_products = DatabaseUtils._reserve_rows(
+            product_table, product_lines,
+            extra=lambda sold: {'sold_count': func.coalesce(product_table.c.sold_count, 0) + sold}
+        )
+        reserved_variants = DatabaseUtils._reserve_rows(ProductVariant.__table__, variant_lines)
+        
+        failed = []
+        short_products = set(product_lines) - reserved_products
+        short_variants = set(variant_lines) - reserved_variants
+        if short_products or short_variants:
+            available = dict(db.session.query(Product.id, Product.stock_quantity).filter(
+                Product.id.in_(short_products), Product.is_active.is_(True)
+            ).all()) if short_products else {}
+            variant_available = dict(db.session.query(ProductVariant.id, ProductVariant.stock_quantity).filter(
+                ProductVariant.id.in_(short_variants), ProductVariant.is_active.is_(True)
+            ).all()) if short_variants else {}
             
-            db.session.commit()
-            return True
-        except Exception as e:
+            for product_id, variant_id, quantity in items:
+                if variant_id in short_variants:
+                    failed.append({'product_id': product_id, 'variant_id': variant_id,
+                                   'requested': quantity, 'available': variant_available.get(variant_id) or 0})
+                elif product_id in short_products and (not variant_id or product_id not in available):
+                    # Variant lines only fail on the product itself when it is inactive
+                    failed.append({'product_id': product_id, 'variant_id': variant_id,
+                                   'requested': quantity, 'available': available.get(product_id) or 0})
+        return failed
+    
+    @staticmethod
+    def bulk_update_inventory(updates, mode='absolute'):
+        """Bulk update product and variant inventory
+        
+        Args:
+            updates: List of dictionaries with one of 'product_id', 'sku',
+                'variant_id' or 'variant_sku', and a 'quantity'
+            mode: 'absolute' to set stock levels, 'delta' to adjust them
+        
+        Returns the report from app.bulk.InventoryUpdater (updated, unchanged,
+        missing keys, invalid entries). Chunks are committed as they are applied.
+        """
+        from app.bulk import InventoryUpdater
+        
+        updater = InventoryUpdater(mode, chunk_size=current_app.config.get('BULK_INVENTORY_CHUNK_SIZE', 1000))
+        try:
+            return updater.run(updates)
+        except Exception:
             db.session.rollback()
-            print(f"Error updating inventory: {e}")
-            return False
+            current_app.logger.exception('Error updating inventory')
+            raise
@@ -0,0 +1,89 @@
+"""
+Login throughput vs password hashing pool size
+
+Fires concurrent logins at a throwaway SQLite database for each pool size
+and prints logins/s, median and p95 latency, and how many were shed (503).
+
+Usage: python benchmark_login.py [logins] [concurrency] [workers,...]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from app import create_app
+from app.models import db, User
+from config import Config
+
+
+def run(logins, concurrency, workers, db_path):
+    """Time ``logins`` logins from ``concurrency`` threads; returns a result row"""
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'PASSWORD_HASH_WORKERS': workers,
+    })
+    with app.app_context():
+        db.create_all()
+        if not User.query.filter_by(email='bench@example.com').first():
+            user = User(username='bench', email='bench@example.com', first_name='Bench', last_name='User')
+            user.set_password('secret123')
+            db.session.add(user)
+            db.session.commit()
+
+    remaining = iter(range(logins))
+    lock = threading.Lock()
+    latencies, statuses = [], []
+
+    def client_loop():
+        client = app.test_client()
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            started = time.perf_counter()
+            response = client.post('/api/auth/login',
+                                   json={'email': 'bench@example.com', 'password': 'secret123'})
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=client_loop) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'workers': workers,
+        'ok': statuses.count(200),
+        'shed': statuses.count(503),
+        'logins_per_s': statuses.count(200) / wall,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def main(logins=200, concurrency=16, pool_sizes=(1, 2, 4, 8)):
+    print(f"{logins} logins from {concurrency} threads, method {Config.PASSWORD_HASH_METHOD}")
+    print(f"{'workers':>8} {'ok':>6} {'shed':>6} {'logins/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'benchmark.db')
+        for workers in pool_sizes:
+            row = run(logins, concurrency, workers, db_path)
+            print(f"{row['workers']:>8} {row['ok']:>6} {row['shed']:>6} {row['logins_per_s']:>10.1f} "
+                  f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f}")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(
+        int(args[0]) if len(args) > 0 else 200,
+        int(args[1]) if len(args) > 1 else 16,
+        tuple(int(n) for n in args[2].split(',')) if len(args) > 2 else (1, 2, 4, 8),
+    )
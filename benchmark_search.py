@@ -0,0 +1,180 @@
+"""
+Search latency on a large synthetic catalog, with and without the search indexes
+
+Seeds a synthetic catalog (1M products by default) into a throwaway SQLite
+database, or into the empty database named by BENCHMARK_DATABASE_URL, then
+times each query the way SearchAPI runs it (first page of 12, with COUNT):
+
+- full text: DatabaseUtils.search_products (FTS5 on SQLite, the tsvector
+  GIN index on Postgres) against the unindexed ILIKE scan (LikeSearch)
+- fuzzy: DatabaseUtils.fuzzy_search_products (the in-process trigram index,
+  or the pg_trgm GIN indexes on Postgres) against the same search without
+  an index: a full scan scoring every product, or on Postgres the same SQL
+  with the *_trgm indexes dropped inside a rolled-back transaction
+
+Prints median and p95 latency in milliseconds for each query.
+
+Usage: python benchmark_search.py [products] [repeats]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import insert, text
+
+from app import create_app
+from app.models import db, Category, Product
+from app.search import LikeSearch, trigram_index, trigrams
+from app.utils import DatabaseUtils
+
+BRANDS = ['Acme', 'Nimbus', 'Vertex', 'Orion', 'Zephyr', 'Quanta', 'Lumen', 'Helix', 'Solace', 'Kestrel']
+ADJECTIVES = ['wireless', 'portable', 'compact', 'gaming', 'ultra', 'smart', 'classic', 'rugged', 'slim', 'pro']
+NOUNS = ['smartphone', 'headphones', 'laptop', 'keyboard', 'monitor', 'camera', 'speaker', 'charger',
+         'tablet', 'router', 'backpack', 'sneakers', 'jacket', 'blender', 'toaster', 'kettle']
+COLOURS = ['black', 'white', 'silver', 'blue', 'red', 'green']
+
+# (query, what it exercises)
+QUERIES = [
+    ('smartphone', 'exact word'),
+    ('smartphne', 'one typo'),
+    ('wireles headphnes', 'two typos'),
+    ('nimbus laptp', 'brand and typo'),
+    ('SKU-0424242', 'SKU'),
+]
+
+
+def seed(products, batch_size=10000):
+    """Insert the synthetic catalog in batches; returns the seconds taken"""
+    started = time.perf_counter()
+    categories = [Category(name=noun.title()) for noun in NOUNS]
+    db.session.add_all(categories)
+    db.session.commit()
+    category_ids = {noun: category.id for noun, category in zip(NOUNS, categories)}
+
+    rng = random.Random(42)
+    for start in range(0, products, batch_size):
+        rows = []
+        for number in range(start, min(start + batch_size, products)):
+            brand, adjective, noun = rng.choice(BRANDS), rng.choice(ADJECTIVES), rng.choice(NOUNS)
+            rows.append({
+                'name': f'{brand} {adjective.title()} {noun.title()} {rng.randint(1, 999)}',
+                'sku': f'SKU-{number:07d}',
+                'description': f'A {adjective} {noun} by {brand}.',
+                'tags': f'{noun},{adjective},{rng.choice(COLOURS)}',
+                'price': round(rng.uniform(5, 2000), 2),
+                'stock_quantity': rng.randint(0, 100),
+                'category_id': category_ids[noun],
+                'is_active': True,
+            })
+        db.session.execute(insert(Product), rows)
+        db.session.commit()
+    return time.perf_counter() - started
+
+
+def scan_fuzzy(search_text, page=1, per_page=12):
+    """Fuzzy search without an index: score every active product's words"""
+    words = [word.lower() for word in search_text.split()]
+    threshold = trigram_index.threshold
+    query_grams = [trigrams(word) for word in words]
+    scored = []
+    for row in db.session.query(Product.id, Product.name, Product.sku, Product.tags).filter(
+            Product.is_active == True).yield_per(10000):
+        terms = set((row.name or '').lower().split()) | set((row.tags or '').lower().split(','))
+        terms.add(row.sku.lower())
+        term_grams = [trigrams(term) for term in terms]
+        total = 0
+        for grams in query_grams:
+            total += max(len(grams & other) / len(grams | other) for other in term_grams)
+        if total / len(words) >= threshold:
+            scored.append((total / len(words), row.id))
+    scored.sort(reverse=True)
+    return scored[(page - 1) * per_page:page * per_page], len(scored)
+
+
+def like_search(search_text, page=1, per_page=12):
+    """Full-text search without an index: ILIKE over name, description and tags"""
+    products = Product.query.filter(Product.is_active == True)
+    return LikeSearch().apply(products, search_text).paginate(page=page, per_page=per_page, error_out=False)
+
+
+def timings(search, search_text, repeats):
+    """Median and p95 milliseconds of ``repeats`` calls"""
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        search(search_text)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+
+
+def without_trigram_indexes(repeats):
+    """Postgres: time fuzzy search with the *_trgm indexes dropped, then roll the drop back"""
+    names = [index.name for index in Product.__table__.indexes if index.name.endswith('_trgm')]
+    for name in names:
+        db.session.execute(text(f'DROP INDEX {name}'))
+    try:
+        return {search_text: timings(DatabaseUtils.fuzzy_search_products, search_text, repeats)
+                for search_text, _ in QUERIES}
+    finally:
+        db.session.rollback()
+
+
+def report(label, indexed, unindexed):
+    print(f"\n{label}")
+    print(f"{'query':<20} {'kind':<15} {'indexed p50':>12} {'p95':>8} {'no index p50':>13} {'p95':>9}")
+    for search_text, kind in QUERIES:
+        (p50, p95), (scan_p50, scan_p95) = indexed[search_text], unindexed[search_text]
+        print(f"{search_text:<20} {kind:<15} {p50:>12.1f} {p95:>8.1f} {scan_p50:>13.1f} {scan_p95:>9.1f}")
+
+
+def run(products, repeats, database_url):
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    })
+    with app.app_context():
+        db.create_all()
+        dialect = db.engine.dialect.name
+        if not Product.query.first():
+            print(f"Seeded {products} products in {seed(products):.1f}s")
+        products = Product.query.count()
+        print(f"{products} products on {dialect}, {repeats} runs per query")
+
+        indexed = {q: timings(DatabaseUtils.search_products, q, repeats) for q, _ in QUERIES}
+        unindexed = {q: timings(like_search, q, repeats) for q, _ in QUERIES}
+        db.session.rollback()
+        report('Full text (search_products vs ILIKE scan)', indexed, unindexed)
+
+        if dialect != 'postgresql':
+            started = time.perf_counter()
+            trigram_index.rebuild()
+            print(f"\nTrigram index built in {time.perf_counter() - started:.1f}s")
+        indexed = {q: timings(DatabaseUtils.fuzzy_search_products, q, repeats) for q, _ in QUERIES}
+        db.session.rollback()
+        if dialect == 'postgresql':
+            unindexed = without_trigram_indexes(repeats)
+        else:
+            unindexed = {q: timings(scan_fuzzy, q, repeats) for q, _ in QUERIES}
+        report('Fuzzy (fuzzy_search_products vs unindexed scoring)', indexed, unindexed)
+        db.session.remove()
+
+
+def main(products=1000000, repeats=5):
+    database_url = os.environ.get('BENCHMARK_DATABASE_URL')
+    if database_url:
+        run(products, repeats, database_url)
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        run(products, repeats, f"sqlite:///{os.path.join(directory, 'benchmark.db')}")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(
+        int(args[0]) if len(args) > 0 else 1000000,
+        int(args[1]) if len(args) > 1 else 5,
+    )
@@ -0,0 +1,115 @@
+"""
+Serializer throughput for the fieldsets
+
+Loads a seeded catalog from a throwaway SQLite database with each
+selection's own load options, then times serializing the loaded rows three
+ways: the precompiled Selection.serialize, resolving the field getters by
+name on every call, and (product list only) the hand-written dict the
+endpoint used to build. Prints microseconds per row; no SQL is timed.
+
+Usage: python benchmark_serializers.py [products] [repeats]
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+from app import create_app
+from app.models import db, User, Category, Product, ProductImage, ProductVariant, Review, CartItem
+from app.fieldsets import (
+    PRODUCT_FIELDS, PRODUCT_TILE_FIELDS, PRODUCT_DETAIL_FIELDS, REVIEW_FIELDS, CART_ITEM_FIELDS,
+    ADMIN_PRODUCT_DEFAULT
+)
+
+
+def seed(products):
+    user = User(username='bench', email='bench@example.com', first_name='Bench', last_name='User')
+    user.set_password('secret123')
+    category = Category(name='Bench')
+    db.session.add_all([user, category])
+    db.session.flush()
+    for number in range(products):
+        product = Product(name=f'Product {number}', sku=f'BENCH-{number}', price=10.0 + number % 90,
+                          compare_price=120.0, description='x' * 200, category_id=category.id,
+                          stock_quantity=number % 7)
+        db.session.add(product)
+        db.session.flush()
+        db.session.add_all([
+            ProductImage(product_id=product.id, image_url=f'/{number}-1.jpg', is_primary=True),
+            ProductImage(product_id=product.id, image_url=f'/{number}-2.jpg'),
+            ProductVariant(product_id=product.id, name='Blue', sku=f'BENCH-{number}-B', price=12.0),
+            Review(user_id=user.id, product_id=product.id, rating=1 + number % 5, title='Fine',
+                   comment='Works', is_approved=True),
+            CartItem(user_id=user.id, product_id=product.id, quantity=1),
+        ])
+    db.session.commit()
+
+
+def hand_written_product(product):
+    """ProductListAPI's per-row dict before the fieldsets"""
+    return {
+        'id': product.id,
+        'name': product.name,
+        'description': product.description,
+        'short_description': product.short_description,
+        'sku': product.sku,
+        'price': product.price,
+        'compare_price': product.compare_price,
+        'discount_percentage': product.discount_percentage,
+        'stock_quantity': product.stock_quantity,
+        'is_in_stock': product.is_in_stock,
+        'is_featured': product.is_featured,
+        'rating_average': product.rating_average,
+        'rating_count': product.rating_count,
+        'category': {'id': product.category.id, 'name': product.category.name},
+        'images': [{'id': img.id, 'url': img.image_url, 'is_primary': img.is_primary} for img in product.images],
+        'created_at': product.created_at.isoformat(),
+    }
+
+
+def by_name(fieldset, names):
+    """Look every getter up by field name on each call"""
+    def serialize(obj):
+        return {name: fieldset.fields[name].getter(obj) for name in names}
+    return serialize
+
+
+def per_row_us(serialize, rows, repeats):
+    best = min(timeit.repeat(lambda: [serialize(row) for row in rows], number=1, repeat=repeats))
+    return best / len(rows) * 1e6
+
+
+def main(products=2000, repeats=5):
+    cases = [
+        ('product list', Product, PRODUCT_FIELDS.select(), hand_written_product),
+        ('product tile', Product, PRODUCT_TILE_FIELDS.select(), None),
+        ('admin product', Product, PRODUCT_FIELDS.select(default=ADMIN_PRODUCT_DEFAULT), None),
+        ('product detail', Product, PRODUCT_DETAIL_FIELDS.select(), None),
+        ('review', Review, REVIEW_FIELDS.select(), None),
+        ('cart item', CartItem, CART_ITEM_FIELDS.select(), None),
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app('testing', {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(directory, 'benchmark.db')}",
+            'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        })
+        with app.app_context():
+            db.create_all()
+            seed(products)
+            print(f"{products} rows per fieldset, best of {repeats}, microseconds per row")
+            print(f"{'fieldset':<16} {'fields':>6} {'compiled':>9} {'by name':>9} {'by hand':>9}")
+            for label, model, selection, hand_written in cases:
+                rows = model.query.options(*selection.options()).all()
+                compiled = per_row_us(selection.serialize, rows, repeats)
+                named = per_row_us(by_name(selection.fieldset, selection.names), rows, repeats)
+                by_hand = f'{per_row_us(hand_written, rows, repeats):>9.2f}' if hand_written else f"{'-':>9}"
+                print(f"{label:<16} {len(selection.names):>6} {compiled:>9.2f} {named:>9.2f} {by_hand}")
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(
+        int(args[0]) if len(args) > 0 else 2000,
+        int(args[1]) if len(args) > 1 else 5,
+    )
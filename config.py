@@ -12,6 +12,7 @@ class Config:
     # Pagination
     PRODUCTS_PER_PAGE = 12
     ORDERS_PER_PAGE = 10
+    PRODUCT_DETAIL_REVIEW_LIMIT = 5  # latest reviews embedded in product detail
     
     # File Upload
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
@@ -30,8 +31,70 @@ class Config:
     RAZORPAY_KEY_SECRET = os.environ.get('RAZORPAY_KEY_SECRET')
     
     # Cache
-    CACHE_TYPE = 'simple'
+    # JSON encoder for API responses: 'orjson' (used when installed) or 'json'
+    API_JSON_ENCODER = 'orjson'
+    
+    # Response cache for public catalog reads: 'simple' (per-process LRU),
+    # 'filesystem' (shared by all workers on a host, under CACHE_DIR) or 'null'
+    CACHE_TYPE = os.environ.get('CACHE_TYPE') or 'simple'
     CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_THRESHOLD = 2048  # max entries before eviction
+    CACHE_DIR = os.environ.get('CACHE_DIR')  # defaults to <instance folder>/response-cache (mode 0700)
+    # Catalog list validators (ETag/Last-Modified) are reused until the next
+    # catalog write, or this many seconds for other workers' writes
+    CATALOG_VERSION_MAX_AGE = 5
+    
+    # Search suggestions / fuzzy search: seconds before the in-process indexes are fully rebuilt
+    SUGGEST_INDEX_MAX_AGE = 300
+    FUZZY_SEARCH_THRESHOLD = 0.3  # minimum trigram similarity for search?fuzzy=true
+    
+    # Product view counters are buffered in memory and written in batches;
+    # a killed process loses the views since its last flush
+    VIEW_COUNT_FLUSH_INTERVAL = 5  # seconds; 0 writes every view through immediately
+    VIEW_COUNT_FLUSH_BATCH_SIZE = 500  # products per UPDATE statement
+    VIEW_COUNT_FLUSH_MAX_PENDING = 1000  # products with pending views that trigger an early flush
+    
+    # Category tree (with product counts) is cached in memory and rebuilt after
+    # category/product changes, or after this many seconds for other workers' writes
+    CATEGORY_TREE_MAX_AGE = 300
+    
+    # Product list facets (?facets=category,price,rating,stock)
+    FACET_PRICE_BUCKETS = (500, 1000, 5000, 10000, 50000)  # bucket upper bounds
+    FACET_CACHE_SIZE = 1024
+    FACET_CACHE_TTL = 60  # seconds
+    
+    # Bulk product import (/api/admin/products/import and import_products.py)
+    BULK_IMPORT_CHUNK_SIZE = 1000  # rows per upsert transaction
+    BULK_IMPORT_MAX_ERRORS = 1000  # row errors kept in the report
+    BULK_IMPORT_MAX_CONTENT_LENGTH = 512 * 1024 * 1024  # 512MB, import endpoint only
+    
+    # Bulk inventory updates (/api/admin/inventory)
+    BULK_INVENTORY_CHUNK_SIZE = 1000  # keys per UPDATE ... FROM (VALUES ...) transaction
+    BULK_INVENTORY_MAX_UPDATES = 100000  # per request
+    
+    # Admin exports (/api/admin/exports/<dataset>) stream rows from a server-side cursor
+    EXPORT_YIELD_PER = 1000  # rows fetched per round trip
+    EXPORT_CHUNK_SIZE = 64 * 1024  # bytes per streamed response chunk
+    
+    # Password hashing (werkzeug method string with explicit cost parameters,
+    # e.g. 'pbkdf2:sha256:600000'); hashes made with other parameters are
+    # upgraded on the next successful login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)
+    PASSWORD_HASH_QUEUE_DEPTH = int(os.environ.get('PASSWORD_HASH_QUEUE_DEPTH') or 16)  # 503 beyond this
+    PASSWORD_HASH_TIMEOUT = 10  # seconds
+    
+    # Auth tokens: 'database' (random token stored on the user row) or
+    # 'signed' (stateless itsdangerous tokens, revoked via a token-version denylist)
+    AUTH_TOKEN_MODE = os.environ.get('AUTH_TOKEN_MODE', 'database')
+    AUTH_TOKEN_EXPIRES = 3600  # seconds
+    AUTH_TOKEN_DENYLIST_REFRESH = 30  # seconds between denylist reloads
+    
+    SESSION_SWEEP_BATCH_SIZE = 1000  # expired sessions deleted per transaction
+    
+    # Auth token cache (token -> principal, skips the user lookup per request)
+    AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE') or 10000)
+    AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL') or 60)  # seconds
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -0,0 +1,36 @@
+"""
+Bulk product import script (CSV or JSON lines, upsert by SKU)
+
+Usage: python import_products.py <file> [csv|jsonl]
+"""
+import json
+import sys
+
+from app import create_app
+from app.bulk import ProductImporter, ImportFormatError, iter_rows, guess_format
+
+def import_products(path, fmt=None):
+    """Stream a product file into the catalog and print the report"""
+    app = create_app()
+    with app.app_context():
+        importer = ProductImporter(
+            chunk_size=app.config.get('BULK_IMPORT_CHUNK_SIZE', 1000),
+            max_errors=app.config.get('BULK_IMPORT_MAX_ERRORS', 1000)
+        )
+        with open(path, 'rb') as stream:
+            report = importer.run(iter_rows(stream, fmt or guess_format(path)))
+        
+        print(json.dumps(report, indent=2))
+        return report
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__.strip())
+        sys.exit(2)
+    
+    try:
+        report = import_products(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    except ImportFormatError as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+    sys.exit(1 if report['failed'] else 0)
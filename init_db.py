@@ -2,7 +2,9 @@
 Database initialization and management script
 """
 from app import create_app
-from app.models import db, User, Category, Product, ProductImage
+from app.models import db, User, UserSession, Category, Product, ProductImage
+from app.utils import DatabaseUtils
+from app.schema import upgrade_schema
 
 def init_db():
     """Initialize the database with tables"""
@@ -11,8 +13,10 @@ def init_db():
         # Drop all tables (use with caution in production)
         # db.drop_all()
         
-        # Create all tables
+        # Create all tables, then add columns/indexes missing from existing ones
         db.create_all()
+        for step in upgrade_schema():
+            print(f"Upgrade: {step}")
         
         print("Database tables created successfully!")
 
@@ -117,12 +121,50 @@ def reset_db():
         db.create_all()
         print("Database reset successfully!")
 
+def upgrade_db(drop_columns=False):
+    """Apply schema changes to an existing database (safe to re-run)"""
+    app = create_app()
+    with app.app_context():
+        steps = upgrade_schema(drop_columns)
+        for step in steps:
+            print(f"Upgrade: {step}")
+        print("Database is up to date!" if not steps else f"Applied {len(steps)} upgrade steps!")
+
+def sweep_sessions():
+    """Delete expired login sessions in batches"""
+    app = create_app()
+    with app.app_context():
+        deleted = UserSession.sweep_expired(app.config['SESSION_SWEEP_BATCH_SIZE'])
+        print(f"Deleted {deleted} expired sessions!")
+
+def recompute_ratings():
+    """Rebuild product rating aggregates from approved reviews"""
+    app = create_app()
+    with app.app_context():
+        updated = DatabaseUtils.recompute_product_ratings()
+        print(f"Recomputed ratings for {updated} products!")
+
+def rebuild_category_paths():
+    """Recompute materialized category paths from parent_id"""
+    app = create_app()
+    with app.app_context():
+        changed = Category.rebuild_paths()
+        print(f"Rebuilt paths for {changed} categories!")
+
 if __name__ == '__main__':
     import sys
     
     if len(sys.argv) > 1 and sys.argv[1] == '--reset':
         reset_db()
         seed_data()
+    elif len(sys.argv) > 1 and sys.argv[1] == '--upgrade':
+        upgrade_db(drop_columns='--drop-legacy-columns' in sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == '--sweep-sessions':
+        sweep_sessions()
+    elif len(sys.argv) > 1 and sys.argv[1] == '--recompute-ratings':
+        recompute_ratings()
+    elif len(sys.argv) > 1 and sys.argv[1] == '--rebuild-category-paths':
+        rebuild_category_paths()
     else:
         init_db()
         seed_data()
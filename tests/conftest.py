@@ -0,0 +1,47 @@
+"""
+Shared fixtures: an app on a throwaway SQLite database and logged-in users
+"""
+import pytest
+
+from app import create_app
+from app.models import db
+from app.categories import category_tree
+from app.search import suggest_index, trigram_index
+from tests.helpers import create_user, login
+
+
+@pytest.fixture
+def app(request, tmp_path):
+    """App on a fresh database; parametrize indirectly with a dict to override config"""
+    app = create_app('testing', {
+        # A file, not :memory:, so every thread and pooled connection sees the same data
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'VIEW_COUNT_FLUSH_INTERVAL': 0,
+        'CACHE_DIR': str(tmp_path / 'cache'),
+        **getattr(request, 'param', {}),
+    })
+    # Module-level caches outlive the previous test's database
+    category_tree.invalidate()
+    suggest_index.invalidate()
+    trigram_index.invalidate()
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def customer(client):
+    user = create_user()
+    return user, login(client, user)
+
+
+@pytest.fixture
+def admin(client):
+    user = create_user('admin', is_admin=True)
+    return user, login(client, user)
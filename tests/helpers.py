@@ -0,0 +1,58 @@
+"""
+Seeding and SQL statement capture helpers for tests
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.models import db, User, Category, Product
+
+
+def create_user(username='customer', is_admin=False, password='secret123'):
+    user = User(username=username, email=f'{username}@example.com', first_name=username.title(),
+                last_name='Tester', is_admin=is_admin)
+    user.set_password(password)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def login(client, user, password='secret123'):
+    """Authorization header for a fresh login session"""
+    response = client.post('/api/auth/login', json={'email': user.email, 'password': password})
+    assert response.status_code == 200, response.json
+    return {'Authorization': f"Bearer {response.json['auth_token']}"}
+
+
+def create_category(name='Electronics', parent=None):
+    category = Category(name=name, parent_id=parent.id if parent else None)
+    db.session.add(category)
+    db.session.commit()
+    return category
+
+
+def create_product(category, sku='PHONE-1', **fields):
+    product = Product(name=fields.pop('name', f'Product {sku}'), sku=sku, price=fields.pop('price', 100.0),
+                      category_id=category.id, **fields)
+    db.session.add(product)
+    db.session.commit()
+    return product
+
+
+@contextmanager
+def capture_statements(with_parameters=False):
+    """Collect the SQL statements executed on the app's engine inside the block
+
+    With ``with_parameters`` each entry is a (statement, DB-API parameters) pair.
+    """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters) if with_parameters else statement)
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
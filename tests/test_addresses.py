@@ -0,0 +1,33 @@
+from app.models import db, Address
+from tests.helpers import create_user, login
+
+ADDRESS = {
+    'first_name': 'Asha', 'last_name': 'Rao', 'address_line_1': '12 MG Road',
+    'city': 'Bengaluru', 'state': 'Karnataka', 'postal_code': '560001'
+}
+
+
+def test_update_address(client, customer):
+    user, headers = customer
+    created = client.post('/api/addresses', json=ADDRESS, headers=headers)
+    assert created.status_code == 201
+    address_id = created.json['address_id']
+
+    response = client.put(f'/api/addresses/{address_id}', json={'city': 'Mysuru', 'is_default': True},
+                          headers=headers)
+
+    assert response.status_code == 200, response.json
+    address = db.session.get(Address, address_id)
+    db.session.refresh(address)
+    assert address.city == 'Mysuru'
+    assert address.is_default is True
+
+
+def test_update_other_users_address_is_not_found(client, customer):
+    _, headers = customer
+    address_id = client.post('/api/addresses', json=ADDRESS, headers=headers).json['address_id']
+    other = login(client, create_user('other'))
+
+    response = client.put(f'/api/addresses/{address_id}', json={'city': 'Mysuru'}, headers=other)
+
+    assert response.status_code == 404
@@ -0,0 +1,116 @@
+"""
+Signed tokens, the revocation denylist and the principal cache
+"""
+import pytest
+
+from app.auth import signed_tokens, token_cache
+from app.models import db, User
+from tests.helpers import capture_statements, create_user, login
+
+SIGNED = pytest.mark.parametrize('app', [{'AUTH_TOKEN_MODE': 'signed'}], indirect=True)
+
+
+def bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+@SIGNED
+def test_signed_token_is_checked_without_database(client, customer):
+    _, headers = customer
+    # The first lookup loads the denylist; later ones use it until the refresh interval
+    client.get('/api/cart', headers=headers)
+    with capture_statements() as statements:
+        assert client.get('/api/cart', headers=headers).status_code == 200
+    assert not any('user_session' in statement or 'FROM user' in statement for statement in statements)
+
+
+@SIGNED
+def test_signed_token_rejects_tampering_and_expiry(client, customer):
+    user, headers = customer
+    token = headers['Authorization'].split(' ')[1]
+    tampered = token[:-2] + ('AA' if not token.endswith('AA') else 'BB')
+    assert client.get('/api/cart', headers=bearer(tampered)).status_code == 401
+
+    expired = signed_tokens.dumps(user, -1)
+    assert client.get('/api/cart', headers=bearer(expired)).status_code == 401
+
+
+@SIGNED
+def test_signed_logout_revokes_outstanding_tokens(client, customer):
+    user, headers = customer
+    other_device = login(client, user)
+
+    assert client.post('/api/auth/logout', headers=headers).status_code == 200
+    assert client.get('/api/cart', headers=headers).status_code == 401
+    assert client.get('/api/cart', headers=other_device).status_code == 401
+    # Tokens issued after the revocation carry the new version
+    assert client.get('/api/cart', headers=login(client, user)).status_code == 200
+
+
+@pytest.mark.parametrize('app', [{'AUTH_TOKEN_MODE': 'signed', 'AUTH_TOKEN_DENYLIST_REFRESH': 3600}], indirect=True)
+def test_denylist_picks_up_other_workers_revocations_on_refresh(client, customer):
+    user, headers = customer
+    assert client.get('/api/cart', headers=headers).status_code == 200
+
+    # Another worker revokes: the token version changes in the database only
+    db.session.execute(db.update(User).where(User.id == user.id).values(
+        token_version=User.token_version + 1, tokens_revoked_at=db.func.current_timestamp()
+    ))
+    db.session.commit()
+    assert client.get('/api/cart', headers=headers).status_code == 200
+
+    signed_tokens.denylist.refresh()
+    assert client.get('/api/cart', headers=headers).status_code == 401
+
+
+@SIGNED
+def test_signed_refresh_issues_a_working_token(client):
+    user = create_user()
+    response = client.post('/api/auth/login', json={'email': user.email, 'password': 'secret123'})
+    refresh_token = response.json['refresh_token']
+
+    response = client.post('/api/auth/refresh', json={'refresh_token': refresh_token})
+    assert response.status_code == 200
+    assert client.get('/api/cart', headers=bearer(response.json['auth_token'])).status_code == 200
+
+
+@SIGNED
+def test_signed_demotion_revokes_admin_tokens(client, admin):
+    user, headers = admin
+    assert client.get('/api/admin/dashboard', headers=headers).status_code == 200
+
+    user.is_admin = False
+    db.session.commit()
+    assert client.get('/api/admin/dashboard', headers=headers).status_code == 401
+
+
+def test_cached_principal_skips_session_lookup(client, customer):
+    _, headers = customer
+    client.get('/api/cart', headers=headers)
+    with capture_statements() as statements:
+        assert client.get('/api/cart', headers=headers).status_code == 200
+    assert not any('user_session' in statement for statement in statements)
+    assert token_cache.stats()['hits'] >= 1
+
+
+def test_deactivation_drops_cached_principals_on_commit(client, customer):
+    user, headers = customer
+    assert client.get('/api/cart', headers=headers).status_code == 200
+
+    user.is_active = False
+    db.session.rollback()
+    # A rolled-back change keeps the cached principal
+    assert client.get('/api/cart', headers=headers).status_code == 200
+
+    user.is_active = False
+    db.session.commit()
+    assert client.get('/api/cart', headers=headers).status_code == 401
+
+
+def test_demotion_drops_cached_admin_principal(client, admin):
+    user, headers = admin
+    assert client.get('/api/admin/dashboard', headers=headers).status_code == 200
+
+    user.is_admin = False
+    db.session.commit()
+    assert client.get('/api/admin/dashboard', headers=headers).status_code == 403
@@ -0,0 +1,147 @@
+import io
+
+import pytest
+
+from app.bulk import InventoryUpdater
+from app.models import db
+from tests.helpers import create_category, create_product
+
+
+def import_csv(client, headers, text):
+    response = client.post('/api/admin/products/import?format=csv', data=io.BytesIO(text.encode()),
+                           headers=dict(headers, **{'Content-Type': 'text/csv'}))
+    assert response.status_code == 200, response.json
+    return response.json
+
+
+def test_import_purges_cached_product_detail(client, admin):
+    _, headers = admin
+    phones = create_category('Phones')
+    product = create_product(phones, 'PHONE-1', price=25999.0)
+    first = client.get(f'/api/products/{product.id}')
+    assert first.json['product']['price'] == 25999.0
+
+    report = import_csv(client, headers, f'sku,name,price,category_id\nPHONE-1,Phone,19999,{phones.id}\n')
+
+    assert report['updated'] == 1
+    response = client.get(f'/api/products/{product.id}')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.json['product']['price'] == 19999.0
+    # The old validator must not revalidate the new body
+    revalidated = client.get(f'/api/products/{product.id}', headers={'If-None-Match': first.headers['ETag']})
+    assert revalidated.status_code == 200
+
+
+def test_import_purges_old_and_new_category_pages(client, admin):
+    _, headers = admin
+    phones, tablets = create_category('Phones'), create_category('Tablets')
+    create_product(phones, 'PHONE-1')
+    assert client.get(f'/api/categories/{phones.id}').json['pagination']['total'] == 1
+    assert client.get(f'/api/categories/{tablets.id}').json['pagination']['total'] == 0
+    assert client.get('/api/categories').json['categories'][0]['product_count'] == 1
+
+    import_csv(client, headers, f'sku,name,price,category_id\nPHONE-1,Phone,100,{tablets.id}\n')
+
+    assert client.get(f'/api/categories/{phones.id}').json['pagination']['total'] == 0
+    assert client.get(f'/api/categories/{tablets.id}').json['pagination']['total'] == 1
+    counts = {node['id']: node['product_count'] for node in client.get('/api/categories').json['categories']}
+    assert counts == {phones.id: 0, tablets.id: 1}
+
+
+def patch_products(client, headers, **body):
+    response = client.patch('/api/admin/products/bulk', json=body, headers=headers)
+    assert response.status_code == 200, response.json
+    return response.json
+
+
+def test_patch_tag_wildcards_match_literally(client, admin):
+    _, headers = admin
+    phones = create_category('Phones')
+    sale = create_product(phones, 'PHONE-1', tags='50%_off, summer')
+    other = create_product(phones, 'PHONE-2', tags='50xxoff, summer')
+
+    report = patch_products(client, headers, select={'tag': '50%_off'}, changes={'is_featured': True},
+                            dry_run=True)
+    assert report == {'dry_run': True, 'matched': 1}
+
+    assert patch_products(client, headers, select={'tag': '50%_off'}, changes={'is_featured': True})['updated'] == 1
+    db.session.expire_all()
+    assert sale.is_featured and not other.is_featured
+
+
+def test_patch_purges_every_updated_product(client, admin):
+    _, headers = admin
+    phones = create_category('Phones')
+    products = [create_product(phones, f'PHONE-{n}', price=100.0) for n in range(3)]
+    for product in products:
+        assert client.get(f'/api/products/{product.id}').json['product']['price'] == 100.0
+
+    report = patch_products(client, headers, select={'category_id': phones.id}, changes={'price': {'percent': -20}})
+
+    assert report == {'dry_run': False, 'matched': 3, 'updated': 3}
+    for product in products:
+        response = client.get(f'/api/products/{product.id}')
+        assert response.headers['X-Cache'] == 'MISS'
+        assert response.json['product']['price'] == 80.0
+    # Already at the new value: nothing matched or purged
+    assert patch_products(client, headers, select={'category_id': phones.id}, changes={'price': 80})['matched'] == 0
+
+
+def test_inventory_failure_purges_committed_chunks(client, monkeypatch):
+    phones = create_category('Phones')
+    first = create_product(phones, 'PHONE-1', stock_quantity=5)
+    create_product(phones, 'PHONE-2')
+    assert client.get(f'/api/products/{first.id}').json['product']['stock_quantity'] == 5
+
+    write = InventoryUpdater._write
+    calls = []
+
+    def fail_second_chunk(self, model, changes):
+        calls.append(changes)
+        if len(calls) == 2:
+            raise RuntimeError('connection lost')
+        write(self, model, changes)
+
+    monkeypatch.setattr(InventoryUpdater, '_write', fail_second_chunk)
+    with pytest.raises(RuntimeError):
+        InventoryUpdater(chunk_size=1).run([{'sku': 'PHONE-1', 'quantity': 2}, {'sku': 'PHONE-2', 'quantity': 2}])
+    db.session.rollback()
+
+    response = client.get(f'/api/products/{first.id}')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.json['product']['stock_quantity'] == 2
+
+
+def update_inventory(client, headers, mode, updates):
+    response = client.post('/api/admin/inventory', json={'mode': mode, 'updates': updates}, headers=headers)
+    assert response.status_code == 200, response.json
+    return response.json
+
+
+def test_inventory_deltas_for_one_row_add_up_across_keys(client, admin):
+    _, headers = admin
+    product = create_product(create_category(), 'PHONE-1', stock_quantity=10)
+
+    report = update_inventory(client, headers, 'delta', [{'sku': 'PHONE-1', 'quantity': -3},
+                                                         {'product_id': product.id, 'quantity': -2}])
+
+    assert report['updated'] == 1 and report['errors'] == []
+    db.session.expire_all()
+    assert product.stock_quantity == 5
+
+
+def test_inventory_conflicting_levels_for_one_row_are_rejected(client, admin):
+    _, headers = admin
+    product = create_product(create_category(), 'PHONE-1', stock_quantity=10)
+
+    report = update_inventory(client, headers, 'absolute', [{'sku': 'PHONE-1', 'quantity': 4},
+                                                            {'product_id': product.id, 'quantity': 6}])
+
+    assert report['updated'] == 0
+    assert [error['index'] for error in report['errors']] == [1]
+    db.session.expire_all()
+    assert product.stock_quantity == 10
+    # The same level under both keys is not a conflict
+    report = update_inventory(client, headers, 'absolute', [{'sku': 'PHONE-1', 'quantity': 4},
+                                                            {'product_id': product.id, 'quantity': 4}])
+    assert report['updated'] == 1 and report['errors'] == []
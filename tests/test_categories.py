@@ -0,0 +1,34 @@
+from app.models import db
+from tests.helpers import create_category, create_product
+
+
+def category_products(client, category):
+    return client.get(f'/api/categories/{category.id}').json['products']
+
+
+def test_review_purges_ancestor_category_pages(client, customer):
+    _, headers = customer
+    electronics = create_category('Electronics')
+    phones = create_category('Phones', parent=electronics)
+    product = create_product(phones)
+    assert category_products(client, electronics)[0]['rating_average'] == 0.0
+    assert category_products(client, phones)[0]['rating_average'] == 0.0
+
+    client.post(f'/api/products/{product.id}/reviews', json={'rating': 5}, headers=headers)
+
+    assert category_products(client, electronics)[0]['rating_average'] == 5.0
+    assert category_products(client, phones)[0]['rating_average'] == 5.0
+
+
+def test_moving_a_category_purges_old_and_new_ancestors(client):
+    electronics, appliances = create_category('Electronics'), create_category('Appliances')
+    phones = create_category('Phones', parent=electronics)
+    create_product(phones)
+    assert len(category_products(client, electronics)) == 1
+    assert len(category_products(client, appliances)) == 0
+
+    phones.parent_id = appliances.id
+    db.session.commit()
+
+    assert len(category_products(client, electronics)) == 0
+    assert len(category_products(client, appliances)) == 1
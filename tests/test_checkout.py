@@ -0,0 +1,44 @@
+import threading
+
+import pytest
+
+from app.models import db, Product, OrderItem
+from tests.helpers import create_user, login, create_category, create_product
+
+SHOPPERS = 12
+STOCK = 5
+
+
+@pytest.mark.parametrize('quantity', [1, 2])
+def test_concurrent_checkouts_never_oversell(app, client, quantity):
+    product = create_product(create_category(), stock_quantity=STOCK, sold_count=0)
+    shoppers = []
+    for number in range(SHOPPERS):
+        headers = login(client, create_user(f'shopper{number}'))
+        assert client.post('/api/cart', json={'product_id': product.id, 'quantity': quantity},
+                           headers=headers).status_code == 201
+        shoppers.append(headers)
+
+    start = threading.Barrier(SHOPPERS)
+    statuses = []
+
+    def checkout(headers):
+        shopper = app.test_client()
+        start.wait()
+        statuses.append(shopper.post('/api/orders', json={}, headers=headers).status_code)
+
+    threads = [threading.Thread(target=checkout, args=(headers,)) for headers in shoppers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db.session.expire_all()
+    product = db.session.get(Product, product.id)
+    sold = db.session.query(db.func.coalesce(db.func.sum(OrderItem.quantity), 0)).filter_by(
+        product_id=product.id).scalar()
+    assert sorted(set(statuses)) == [201, 409]
+    assert statuses.count(201) == STOCK // quantity
+    assert product.stock_quantity >= 0
+    assert product.sold_count == sold == statuses.count(201) * quantity
+    assert product.stock_quantity + product.sold_count == STOCK
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import db, Product, ProductImage
+from tests.helpers import capture_statements, create_category, create_product
+
+
+def test_product_list_revalidates_with_304(client):
+    create_product(create_category())
+    first = client.get('/api/products')
+
+    response = client.get('/api/products', headers={'If-None-Match': first.headers['ETag']})
+
+    assert response.status_code == 304
+
+
+def test_cached_product_list_runs_no_queries(client):
+    create_product(create_category())
+    etag = client.get('/api/products').headers['ETag']
+
+    with capture_statements() as statements:
+        hit = client.get('/api/products')
+        not_modified = client.get('/api/products', headers={'If-None-Match': etag})
+
+    assert hit.headers['X-Cache'] == 'HIT'
+    assert not_modified.status_code == 304
+    assert statements == []
+
+
+@pytest.mark.parametrize('app', [{'CACHE_TYPE': 'null'}, {'CACHE_TYPE': 'simple'}, {'CACHE_TYPE': 'filesystem'}],
+                         indirect=True)
+def test_product_update_changes_list_etag(client, admin):
+    _, headers = admin
+    product = create_product(create_category())
+    etag = client.get('/api/products').headers['ETag']
+
+    client.put(f'/api/admin/products/{product.id}', json={'price': 150.0}, headers=headers)
+    response = client.get('/api/products', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.json['products'][0]['price'] == 150.0
+
+
+def test_deleting_an_image_advances_last_modified(client):
+    category = create_category()
+    product = create_product(category)
+    image = ProductImage(product_id=product.id, image_url='/img/1.jpg', is_primary=True)
+    db.session.add(image)
+    db.session.commit()
+    product.updated_at = category.updated_at = datetime.utcnow() - timedelta(days=1)
+    db.session.commit()
+
+    before = client.get(f'/api/products/{product.id}')
+    list_before = client.get('/api/products')
+    assert len(before.json['product']['images']) == 1
+
+    db.session.delete(image)
+    db.session.commit()
+
+    after = client.get(f'/api/products/{product.id}')
+    list_after = client.get('/api/products')
+    assert after.json['product']['images'] == []
+    assert list_after.json['products'][0]['images'] == []
+    assert after.last_modified > before.last_modified
+    assert list_after.last_modified > list_before.last_modified
+    assert after.headers['ETag'] != before.headers['ETag']
+
+
+def test_removing_an_image_from_the_collection_touches_the_product(app):
+    product = create_product(create_category())
+    product.images.append(ProductImage(image_url='/img/1.jpg'))
+    db.session.commit()
+    product.updated_at = stale = datetime.utcnow() - timedelta(days=1)
+    db.session.commit()
+
+    product.images.clear()
+    db.session.commit()
+
+    db.session.expire_all()
+    product = db.session.get(Product, product.id)
+    assert product.images == []
+    assert product.updated_at > stale
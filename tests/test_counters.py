@@ -0,0 +1,79 @@
+import time
+
+from app.counters import ViewCounterBuffer, view_counter
+from app.models import db, Product
+from tests.helpers import create_category, create_product
+
+
+def view_counts(products):
+    db.session.expire_all()
+    return [db.session.get(Product, product.id).view_count for product in products]
+
+
+def test_flushes_early_when_pending_reaches_max(app):
+    category = create_category()
+    products = [create_product(category, sku=f'SKU-{number}', view_count=0) for number in range(3)]
+    counter = ViewCounterBuffer(interval=60, max_pending=3)
+    counter.app = app
+
+    for product in products[:2]:
+        counter.increment(product.id)
+    time.sleep(0.2)
+    assert view_counts(products) == [0, 0, 0]
+
+    counter.increment(products[2].id)
+    deadline = time.time() + 5
+    while counter.flushed < 3 and time.time() < deadline:
+        time.sleep(0.02)
+    assert view_counts(products) == [1, 1, 1]
+
+
+def test_write_through_without_interval(app):
+    product = create_product(create_category(), view_count=0)
+    counter = ViewCounterBuffer(interval=0)
+    counter.app = app
+
+    counter.increment(product.id, 2)
+
+    assert view_counts([product]) == [2]
+
+
+def failing_writes(counter, monkeypatch, failures=1):
+    """Make the next ``failures`` batch writes raise"""
+    write_batch = counter._write_batch
+    remaining = [failures]
+
+    def flaky(batch):
+        if remaining[0]:
+            remaining[0] -= 1
+            raise RuntimeError('database is locked')
+        write_batch(batch)
+
+    monkeypatch.setattr(counter, '_write_batch', flaky)
+
+
+def test_failed_write_through_keeps_counts(app, monkeypatch, caplog):
+    product = create_product(create_category(), view_count=0)
+    counter = ViewCounterBuffer(interval=0)
+    counter.app = app
+    failing_writes(counter, monkeypatch)
+
+    counter.increment(product.id, 2)
+
+    assert 'View counter flush failed' in caplog.text
+    assert view_counts([product]) == [0]
+    assert counter.stats()['pending_products'] == 1
+
+    counter.increment(product.id)
+    assert view_counts([product]) == [3]
+    assert counter.stats()['pending_products'] == 0
+
+
+def test_product_detail_survives_failed_view_flush(client, monkeypatch):
+    product = create_product(create_category(), view_count=0)
+    failing_writes(view_counter, monkeypatch)
+
+    response = client.get(f'/api/products/{product.id}')
+    assert response.status_code == 200
+    assert client.get(f'/api/products/{product.id}').status_code == 200
+    assert view_counts([product]) == [2]
@@ -0,0 +1,18 @@
+import csv
+import io
+
+import pytest
+
+from tests.helpers import create_category, create_product
+
+
+@pytest.mark.parametrize('name', ['=HYPERLINK("x")', '+1', '-1', '@SUM(A1)', '\t=1+1', '\r=1+1'])
+def test_csv_export_neutralizes_formulas(client, admin, name):
+    _, headers = admin
+    create_product(create_category(), name=name)
+
+    response = client.get('/api/admin/exports/products?format=csv', headers=headers)
+
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0]['name'] == "'" + name
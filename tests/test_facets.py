@@ -0,0 +1,30 @@
+from app.facets import facet_counter
+from app.models import db, Review
+from tests.helpers import create_category, create_product
+
+
+def rating_facets(client):
+    response = client.get('/api/products?facets=rating')
+    return {entry['rating']: entry['count'] for entry in response.json['facets']['rating']}
+
+
+def test_review_refreshes_rating_facets(client, customer):
+    _, headers = customer
+    product = create_product(create_category())
+    assert rating_facets(client) == {0: 1}
+
+    client.post(f'/api/products/{product.id}/reviews', json={'rating': 5}, headers=headers)
+
+    assert rating_facets(client) == {5: 1}
+
+
+def test_any_committed_review_write_clears_facet_counts(client, customer):
+    user, _ = customer
+    product = create_product(create_category())
+    rating_facets(client)
+    assert len(facet_counter.cache)
+
+    db.session.add(Review(user_id=user.id, product_id=product.id, rating=4))
+    db.session.commit()
+
+    assert not len(facet_counter.cache)
@@ -0,0 +1,55 @@
+"""
+Endpoint payloads built from the fieldsets
+"""
+from app.models import db, ProductImage, ProductVariant, CartItem
+from tests.helpers import create_category, create_product
+
+
+def test_admin_products_accept_sparse_fieldsets(client, admin):
+    product = create_product(create_category(), sku='PHONE-1')
+    headers = admin[1]
+
+    response = client.get('/api/admin/products', headers=headers)
+    assert response.status_code == 200
+    assert response.json['products'][0]['category_name'] == 'Electronics'
+    assert 'description' not in response.json['products'][0]
+
+    response = client.get('/api/admin/products?fields=id,sku&include=description', headers=headers)
+    assert response.json['products'] == [{'id': product.id, 'sku': 'PHONE-1', 'description': None}]
+
+    response = client.get('/api/admin/products?fields=cost_price', headers=headers)
+    assert response.status_code == 400
+
+
+def test_product_detail_lists_active_variants_only(client):
+    product = create_product(create_category(), sku='PHONE-1', weight=1.5)
+    db.session.add_all([
+        ProductImage(product_id=product.id, image_url='/phone.jpg', alt_text='Phone', is_primary=True),
+        ProductVariant(product_id=product.id, name='Blue', sku='PHONE-1-BLUE', price=120.0),
+        ProductVariant(product_id=product.id, name='Red', sku='PHONE-1-RED', is_active=False),
+    ])
+    db.session.commit()
+
+    payload = client.get(f'/api/products/{product.id}').json['product']
+    assert [variant['sku'] for variant in payload['variants']] == ['PHONE-1-BLUE']
+    assert payload['images'][0]['alt_text'] == 'Phone'
+    assert payload['category'] == {'id': product.category_id, 'name': 'Electronics', 'description': None}
+    assert payload['weight'] == 1.5 and payload['reviews'] == []
+
+
+def test_cart_totals_use_variant_prices(client, customer):
+    user, headers = customer
+    product = create_product(create_category(), sku='PHONE-1', price=100.0)
+    variant = ProductVariant(product_id=product.id, name='Blue', sku='PHONE-1-BLUE', price=120.0)
+    db.session.add(variant)
+    db.session.flush()
+    db.session.add_all([
+        CartItem(user_id=user.id, product_id=product.id, quantity=2),
+        CartItem(user_id=user.id, product_id=product.id, product_variant_id=variant.id, quantity=1),
+    ])
+    db.session.commit()
+
+    cart = client.get('/api/cart', headers=headers).json
+    assert [line['item_total'] for line in cart['cart_items']] == [200.0, 120.0]
+    assert cart['total_amount'] == 320.0 and cart['total_items'] == 2
+    assert cart['cart_items'][1]['variant']['name'] == 'Blue'
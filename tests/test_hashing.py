@@ -0,0 +1,132 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import hashing
+from app.hashing import PasswordHasher, HashingPoolSaturated
+from app.models import db, User
+from tests.helpers import create_user, login
+
+
+@pytest.mark.parametrize('method,stored,rehash', [
+    ('pbkdf2:sha256', 'pbkdf2:sha256:1000000', False),
+    ('pbkdf2', 'pbkdf2:sha256:1000000', False),
+    ('pbkdf2:sha256:600000', 'pbkdf2:sha256:600000', False),
+    ('pbkdf2:sha256', 'pbkdf2:sha256:600000', True),
+    ('pbkdf2:sha512', 'pbkdf2:sha256:1000000', True),
+    ('scrypt', 'scrypt:32768:8:1', False),
+    ('scrypt:65536:8:1', 'scrypt:32768:8:1', True),
+    ('scrypt:32768:8:1', 'pbkdf2:sha256:1000000', True),
+])
+def test_needs_rehash_compares_effective_parameters(method, stored, rehash):
+    assert PasswordHasher(method).needs_rehash(f'{stored}$salt$hash') is rehash
+
+
+def test_needs_rehash_without_hash():
+    assert PasswordHasher().needs_rehash(None)
+
+
+@pytest.mark.parametrize('app', [{'PASSWORD_HASH_METHOD': 'scrypt'}], indirect=True)
+def test_login_keeps_hash_made_with_default_parameters(client):
+    user = create_user()
+    stored = user.password_hash
+    assert stored.startswith('scrypt:32768:8:1$')
+
+    login(client, user)
+
+    db.session.expire_all()
+    assert db.session.get(User, user.id).password_hash == stored
+
+
+@pytest.fixture
+def blocked_hashing(monkeypatch):
+    """Hash and verify jobs signal ``started`` on a pool thread, then wait for ``release``"""
+    gate = SimpleNamespace(started=threading.Semaphore(0), release=threading.Event())
+
+    def wait_then(fn):
+        def blocked(*args):
+            gate.started.release()
+            gate.release.wait(5)
+            return fn(*args)
+        return blocked
+
+    monkeypatch.setattr(hashing, 'check_password_hash', wait_then(hashing.check_password_hash))
+    monkeypatch.setattr(hashing, 'generate_password_hash', wait_then(hashing.generate_password_hash))
+    yield gate
+    gate.release.set()
+
+
+def test_saturated_pool_rejects_immediately(blocked_hashing):
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1, queue_depth=1)
+    busy = [threading.Thread(target=hasher.hash, args=('secret123',)) for _ in range(2)]
+    for thread in busy:
+        thread.start()
+    # One job running, one queued
+    assert blocked_hashing.started.acquire(timeout=1)
+    while hasher._slots._value:
+        time.sleep(0.01)
+
+    started = time.perf_counter()
+    with pytest.raises(HashingPoolSaturated):
+        hasher.hash('secret123')
+    assert time.perf_counter() - started < 1
+
+    blocked_hashing.release.set()
+    for thread in busy:
+        thread.join()
+    # Slots are released once the queued hashes finish
+    assert hasher.verify(hasher.hash('secret123'), 'secret123')
+
+
+def test_queued_hash_times_out(blocked_hashing):
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1, queue_depth=1, timeout=0.1)
+    with pytest.raises(HashingPoolSaturated):
+        hasher.hash('secret123')
+
+
+@pytest.mark.parametrize('app', [{'PASSWORD_HASH_WORKERS': 1, 'PASSWORD_HASH_QUEUE_DEPTH': 0}], indirect=True)
+def test_login_returns_503_when_pool_is_saturated(app, client, customer, blocked_hashing):
+    user = customer[0]
+    first = {}
+
+    def slow_login():
+        with app.app_context():
+            first['response'] = app.test_client().post(
+                '/api/auth/login', json={'email': user.email, 'password': 'secret123'})
+
+    thread = threading.Thread(target=slow_login)
+    thread.start()
+    assert blocked_hashing.started.acquire(timeout=5)
+
+    started = time.perf_counter()
+    response = client.post('/api/auth/login', json={'email': user.email, 'password': 'secret123'})
+    assert response.status_code == 503
+    assert time.perf_counter() - started < 1
+    assert response.headers['Retry-After'] == '1'
+
+    blocked_hashing.release.set()
+    thread.join()
+    assert first['response'].status_code == 200
+
+
+def test_login_skips_rehash_when_pool_is_saturated(client, monkeypatch):
+    user = create_user()
+    outdated = hashing.generate_password_hash('secret123', 'pbkdf2:sha256:500')
+    user.password_hash = outdated
+    db.session.commit()
+
+    def saturated(password):
+        raise HashingPoolSaturated('Password hashing pool is saturated')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(hashing.password_hasher, 'hash', saturated)
+        login(client, user)
+    db.session.expire_all()
+    assert db.session.get(User, user.id).password_hash == outdated
+
+    # Upgraded on the next login with capacity
+    login(client, user)
+    db.session.expire_all()
+    assert db.session.get(User, user.id).password_hash.startswith('pbkdf2:sha256:1000$')
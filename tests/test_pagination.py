@@ -0,0 +1,37 @@
+import pytest
+
+from tests.helpers import create_category, create_product
+
+
+@pytest.mark.parametrize('per_page', [0, -5])
+def test_cursor_mode_clamps_non_positive_page_size(client, per_page):
+    category = create_category()
+    for number in range(3):
+        create_product(category, sku=f'SKU-{number}')
+
+    response = client.get(f'/api/products?cursor=&per_page={per_page}')
+
+    assert response.status_code == 200, response.json
+    assert len(response.json['products']) == 1
+    assert response.json['pagination']['per_page'] == 1
+    assert response.json['pagination']['has_next']
+
+
+def test_cursor_mode_caps_page_size(client):
+    create_product(create_category())
+
+    response = client.get('/api/products?cursor=&per_page=100000')
+
+    assert response.json['pagination']['per_page'] == 100
+
+
+@pytest.mark.parametrize('per_page', [0, -1])
+def test_review_cursor_clamps_non_positive_page_size(client, customer, per_page):
+    _, headers = customer
+    product = create_product(create_category())
+    client.post(f'/api/products/{product.id}/reviews', json={'rating': 5}, headers=headers)
+
+    response = client.get(f'/api/products/{product.id}/reviews?per_page={per_page}')
+
+    assert response.status_code == 200, response.json
+    assert len(response.json['reviews']) == 1
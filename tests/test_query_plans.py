@@ -0,0 +1,135 @@
+"""
+The hot filters and sorts are served by the indexes declared for them
+
+Each case runs the real code path (an endpoint or a DatabaseUtils call),
+captures the SQL it emits and asks the database for the plan of every
+SELECT, bound parameters included.
+"""
+from datetime import datetime
+
+import pytest
+
+from app.models import db, Order, OrderItem, CartItem, Review, ProductImage, ProductVariant
+from app.utils import DatabaseUtils
+from tests.helpers import capture_statements, create_category, create_product
+
+
+def query_plans(statements):
+    """The database's plan for each captured SELECT, as one string per statement"""
+    connection = db.session.connection()
+    if db.engine.dialect.name == 'postgresql':
+        # Tiny test tables are always cheaper to scan sequentially
+        connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        explain = 'EXPLAIN'
+    else:
+        explain = 'EXPLAIN QUERY PLAN'
+    plans = []
+    for statement, parameters in statements:
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            rows = connection.exec_driver_sql(f'{explain} {statement}', parameters)
+            plans.append('\n'.join(str(row[-1]) for row in rows))
+    db.session.rollback()
+    return plans
+
+
+@pytest.fixture
+def shop(client, customer, admin):
+    """A two-level catalog and a customer with a cart item, an order and a review"""
+    user, headers = customer
+    electronics = create_category('Electronics')
+    phones = create_category('Phones', parent=electronics)
+    product = create_product(phones, name='Phone', tags='mobile', stock_quantity=1, min_stock_level=5)
+    order = Order(order_number='ORD-1', user_id=user.id, status='pending', subtotal=100, total_amount=100,
+                  shipping_address={}, billing_address={}, created_at=datetime.utcnow())
+    db.session.add(order)
+    db.session.flush()
+    db.session.add_all([
+        ProductImage(product_id=product.id, image_url='/phone.jpg', is_primary=True),
+        ProductVariant(product_id=product.id, name='Blue', sku='PHONE-1-BLUE', stock_quantity=1),
+        OrderItem(order_id=order.id, product_id=product.id, product_name=product.name, product_sku=product.sku,
+                  quantity=1, unit_price=100, total_price=100),
+        CartItem(user_id=user.id, product_id=product.id, quantity=1),
+        Review(user_id=user.id, product_id=product.id, rating=5, is_approved=True),
+    ])
+    db.session.commit()
+    return {'client': client, 'user': user, 'headers': headers, 'admin_headers': admin[1],
+            'category': electronics, 'subcategory': phones, 'product': product}
+
+
+def get(shop, url, admin=False):
+    response = shop['client'].get(url, headers=shop['admin_headers' if admin else 'headers'])
+    assert response.status_code == 200, response.json
+
+
+CASES = {
+    # Product listing filters and sorts
+    'ix_product_active_category_price': lambda shop: get(
+        shop, f"/api/products?category_id={shop['subcategory'].id}&min_price=10&max_price=500"),
+    'ix_product_active_created_at': lambda shop: get(shop, '/api/products'),
+    # Dashboard low-stock count (partial index)
+    'ix_product_low_stock': lambda shop: DatabaseUtils.count_low_stock_products(),
+    # Customer order history, admin order list and dashboard recent orders
+    'ix_order_user_created_at': lambda shop: DatabaseUtils.get_user_orders(shop['user'].id),
+    'ix_order_status_created_at': lambda shop: get(shop, '/api/admin/orders?status=pending', admin=True),
+    'ix_order_created_at': lambda shop: get(shop, '/api/admin/dashboard', admin=True),
+    # Product reviews, newest first
+    'ix_review_product_approved_created_at': lambda shop: get(shop, f"/api/products/{shop['product'].id}/reviews"),
+    # Category subtree filter
+    'ix_category_path': lambda shop: DatabaseUtils.get_products_by_category(shop['category'].id),
+    # Catalog Last-Modified validator
+    'ix_product_updated_at': lambda shop: get(shop, '/api/products'),
+    # selectin loaders
+    'ix_product_image_product_id': lambda shop: get(shop, '/api/products'),
+    'ix_product_variant_product_id': lambda shop: get(shop, f"/api/products/{shop['product'].id}"),
+    'ix_order_item_order_id': lambda shop: get(shop, '/api/orders'),
+    'ix_cart_item_user_id': lambda shop: get(shop, '/api/cart'),
+}
+
+# The code paths whose result order must come straight off the index
+SORTED = ['ix_product_active_created_at', 'ix_order_user_created_at', 'ix_order_status_created_at',
+          'ix_order_created_at']
+
+UNCACHED = pytest.mark.parametrize('app', [{'CACHE_TYPE': 'null'}], indirect=True)
+
+
+def plans_for(shop, index):
+    with capture_statements(with_parameters=True) as statements:
+        CASES[index](shop)
+    return query_plans(statements)
+
+
+@UNCACHED
+@pytest.mark.parametrize('index', CASES)
+def test_query_uses_index(shop, index):
+    plans = plans_for(shop, index)
+    assert any(index in plan for plan in plans), '\n\n'.join(plans)
+
+
+@UNCACHED
+@pytest.mark.parametrize('index', SORTED)
+def test_sort_is_read_from_index(shop, index):
+    plan = next(plan for plan in plans_for(shop, index) if index in plan)
+    # SQLite: no separate sort step; Postgres: no Sort node
+    assert 'TEMP B-TREE' not in plan and 'Sort' not in plan, plan
+
+
+@UNCACHED
+def test_search_uses_full_text_index(shop):
+    expected = {'postgresql': 'ix_product_search_vector', 'sqlite': 'product_fts'}[db.engine.dialect.name]
+    with capture_statements(with_parameters=True) as statements:
+        result = DatabaseUtils.search_products('phone')
+    assert [product.id for product in result.items] == [shop['product'].id]
+    plans = query_plans(statements)
+    assert any(expected in plan for plan in plans), '\n\n'.join(plans)
+    # SQLite: MATCH runs once per query, not once per product row (rowid-constrained)
+    assert not any('VIRTUAL TABLE INDEX 0:=' in plan for plan in plans), '\n\n'.join(plans)
+
+
+@UNCACHED
+def test_subtree_filter_seeks_path_index(shop):
+    plans = plans_for(shop, 'ix_category_path')
+    lines = [line for plan in plans for line in plan.splitlines() if 'ix_category_path' in line]
+    # A prefix range lookup, not a full scan of the index
+    assert lines and not any(line.lstrip().startswith('SCAN') for line in lines), '\n\n'.join(plans)
+    assert [product.id for product in DatabaseUtils.get_products_by_category(shop['category'].id).items] == [
+        shop['product'].id]
@@ -0,0 +1,57 @@
+import os
+import stat
+
+import pytest
+
+from app.bulk import invalidate_catalog
+from app.response_cache import FileSystemBackend
+from tests.helpers import create_category, create_product
+
+
+def test_filesystem_directory_is_private(tmp_path):
+    backend = FileSystemBackend(str(tmp_path / 'cache'))
+
+    for path in (backend.directory, backend._entries, backend._tags):
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o700
+
+
+def test_filesystem_tag_versions_do_not_count_toward_threshold(tmp_path):
+    backend = FileSystemBackend(str(tmp_path), threshold=5)
+    for product_id in range(50):
+        backend.set(f'tag:product:{product_id}', f'v{product_id}', timeout=0)
+
+    for index in range(5):
+        backend.set(f'response:{index}', index)
+
+    assert all(backend.get(f'response:{index}') == index for index in range(5))
+    assert all(backend.get(f'tag:product:{product_id}') == f'v{product_id}' for product_id in range(50))
+
+
+def test_filesystem_prunes_oldest_entries_over_threshold(tmp_path):
+    backend = FileSystemBackend(str(tmp_path), threshold=20)
+    for index in range(40):
+        backend.set(f'response:{index}', index)
+        path = backend._path(f'response:{index}')
+        os.utime(path, (index, index))  # distinct mtimes, oldest first
+
+    assert backend.stats()['size'] <= 20 + backend._check_every
+    assert backend.get('response:39') == 39
+    assert backend.get('response:0') is None
+
+
+def test_filesystem_expired_entry_is_dropped_on_read(tmp_path):
+    backend = FileSystemBackend(str(tmp_path))
+    backend.set('response:old', 'payload', timeout=-1)
+
+    assert backend.get('response:old') is None
+    assert backend.stats()['size'] == 0
+
+
+@pytest.mark.parametrize('app', [{'CACHE_TYPE': 'simple'}, {'CACHE_TYPE': 'filesystem'}], indirect=True)
+def test_cached_response_is_purged_by_tag(client):
+    product = create_product(create_category())
+
+    assert client.get(f'/api/products/{product.id}').headers['X-Cache'] == 'MISS'
+    assert client.get(f'/api/products/{product.id}').headers['X-Cache'] == 'HIT'
+    invalidate_catalog(product_ids=[product.id], search=False)
+    assert client.get(f'/api/products/{product.id}').headers['X-Cache'] == 'MISS'
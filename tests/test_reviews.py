@@ -0,0 +1,48 @@
+from app.models import db, Product
+from tests.helpers import create_category, create_product
+
+
+def post_review(client, headers, product_id, rating):
+    return client.post(f'/api/products/{product_id}/reviews', json={'rating': rating, 'title': 'Nice'},
+                       headers=headers)
+
+
+def test_review_updates_rating_aggregates(client, customer):
+    _, headers = customer
+    product = create_product(create_category())
+
+    assert post_review(client, headers, product.id, 4).status_code == 201
+
+    summary = client.get(f'/api/products/{product.id}/reviews').json['summary']
+    assert summary['rating_average'] == 4.0
+    assert summary['rating_count'] == 1
+    assert summary['rating_histogram'] == {'1': 0, '2': 0, '3': 0, '4': 1, '5': 0}
+
+
+def test_whole_float_rating_is_accepted(client, customer):
+    _, headers = customer
+    product = create_product(create_category())
+
+    assert post_review(client, headers, product.id, 4.0).status_code == 201
+    assert client.get(f'/api/products/{product.id}/reviews').json['summary']['rating_histogram']['4'] == 1
+
+
+def test_fractional_rating_is_rejected(client, customer):
+    _, headers = customer
+    product = create_product(create_category())
+
+    assert post_review(client, headers, product.id, 4.5).status_code == 400
+
+
+def test_rating_average_before_histogram_backfill(client, customer):
+    # Rated before the histogram columns existed: count and average only
+    _, headers = customer
+    product = create_product(create_category(), rating_count=10, rating_average=4.0)
+
+    assert post_review(client, headers, product.id, 5).status_code == 201
+
+    db.session.expire_all()
+    product = db.session.get(Product, product.id)
+    assert product.rating_count == 11
+    assert product.rating_average == round(45 / 11, 2)
+    assert product.rating_5_count == 1
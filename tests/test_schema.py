@@ -0,0 +1,129 @@
+import sqlite3
+
+from sqlalchemy import inspect
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from app.models import db, Category, Product
+from app.schema import upgrade_schema
+from tests.helpers import login
+
+# The user, category, product and review tables as created before the
+# session table, category paths, rating histograms and catalog indexes
+LEGACY_SCHEMA = """
+CREATE TABLE category (
+    id INTEGER NOT NULL, name VARCHAR(100) NOT NULL, description TEXT, image_url VARCHAR(255),
+    is_active BOOLEAN, parent_id INTEGER, created_at DATETIME,
+    PRIMARY KEY (id), UNIQUE (name), FOREIGN KEY(parent_id) REFERENCES category (id)
+);
+CREATE TABLE user (
+    id INTEGER NOT NULL, username VARCHAR(100) NOT NULL, email VARCHAR(120) NOT NULL,
+    password_hash VARCHAR(255) NOT NULL, first_name VARCHAR(100) NOT NULL, last_name VARCHAR(100) NOT NULL,
+    phone VARCHAR(20), is_active BOOLEAN, is_admin BOOLEAN, auth_token VARCHAR(500), token_expires_at DATETIME,
+    refresh_token VARCHAR(500), refresh_token_expires_at DATETIME, last_login_at DATETIME,
+    created_at DATETIME, updated_at DATETIME,
+    PRIMARY KEY (id), UNIQUE (username), UNIQUE (email), UNIQUE (auth_token), UNIQUE (refresh_token)
+);
+CREATE TABLE product (
+    id INTEGER NOT NULL, name VARCHAR(200) NOT NULL, description TEXT, short_description VARCHAR(500),
+    sku VARCHAR(100) NOT NULL, price FLOAT NOT NULL, compare_price FLOAT, cost_price FLOAT,
+    stock_quantity INTEGER, min_stock_level INTEGER, weight FLOAT, dimensions VARCHAR(100),
+    is_active BOOLEAN, is_featured BOOLEAN, is_digital BOOLEAN, requires_shipping BOOLEAN,
+    meta_title VARCHAR(200), meta_description VARCHAR(500), tags VARCHAR(500), rating_average FLOAT,
+    rating_count INTEGER, view_count INTEGER, sold_count INTEGER, created_at DATETIME, updated_at DATETIME,
+    category_id INTEGER NOT NULL,
+    PRIMARY KEY (id), UNIQUE (sku), FOREIGN KEY(category_id) REFERENCES category (id)
+);
+CREATE TABLE review (
+    id INTEGER NOT NULL, user_id INTEGER NOT NULL, product_id INTEGER NOT NULL, rating INTEGER NOT NULL,
+    title VARCHAR(200), comment TEXT, is_verified_purchase BOOLEAN, is_approved BOOLEAN,
+    created_at DATETIME, updated_at DATETIME,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id), FOREIGN KEY(product_id) REFERENCES product (id)
+);
+"""
+
+
+def legacy_app(tmp_path):
+    path = tmp_path / 'legacy.db'
+    connection = sqlite3.connect(path)
+    connection.executescript(LEGACY_SCHEMA)
+    connection.executemany('INSERT INTO user (id, username, email, password_hash, first_name, last_name, '
+                           'is_active, is_admin, auth_token, created_at) VALUES (?, ?, ?, ?, ?, ?, 1, 0, ?, ?)', [
+        (1, 'legacy', 'legacy@example.com', generate_password_hash('secret123', 'pbkdf2:sha256:1000'),
+         'Legacy', 'User', 'plaintext-token', '2024-01-01 00:00:00'),
+        (2, 'reviewer', 'reviewer@example.com', 'x', 'Second', 'User', None, '2024-01-01 00:00:00'),
+    ])
+    connection.execute("INSERT INTO category (id, name, is_active, created_at) VALUES (1, 'Electronics', 1, '2024-01-01')")
+    connection.execute("INSERT INTO category (id, name, is_active, parent_id, created_at) "
+                       "VALUES (2, 'Phones', 1, 1, '2024-01-01')")
+    connection.execute("INSERT INTO product (id, name, sku, price, stock_quantity, is_active, tags, rating_average, "
+                       "rating_count, created_at, updated_at, category_id) "
+                       "VALUES (1, 'Smartphone XYZ', 'PHONE-1', 25999, 5, 1, 'mobile', 4.5, 2, "
+                       "'2024-01-01', '2024-01-01', 2)")
+    connection.executemany("INSERT INTO review (user_id, product_id, rating, is_approved, created_at) "
+                           "VALUES (?, 1, ?, 1, '2024-01-01')", [(1, 4), (2, 5)])
+    connection.commit()
+    connection.close()
+    return create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'CACHE_TYPE': 'null',
+    })
+
+
+def test_upgrade_legacy_database(tmp_path):
+    app = legacy_app(tmp_path)
+    with app.app_context():
+        steps = upgrade_schema()
+
+        assert 'added user.token_version' in steps
+        inspector = inspect(db.engine)
+        columns = {column['name'] for column in inspector.get_columns('product')}
+        assert {f'rating_{stars}_count' for stars in range(1, 6)} <= columns
+        assert {'path', 'updated_at'} <= {column['name'] for column in inspector.get_columns('category')}
+        indexes = {index['name'] for index in inspector.get_indexes('product')}
+        assert {'ix_product_active_category_price', 'ix_product_active_created_at', 'ix_product_low_stock',
+                'ix_product_updated_at'} <= indexes
+        assert 'ix_category_path' in {index['name'] for index in inspector.get_indexes('category')}
+        assert 'ix_review_product_approved_created_at' in {index['name'] for index in inspector.get_indexes('review')}
+
+        # Backfills
+        assert db.session.get(Category, 2).path == '/1/2/'
+        assert db.session.get(Category, 1).updated_at is not None
+        product = db.session.get(Product, 1)
+        assert product.rating_histogram == {'1': 0, '2': 0, '3': 0, '4': 1, '5': 1}
+        # Retired columns are kept unless dropping is asked for
+        assert db.session.execute(db.text('SELECT auth_token FROM user WHERE id = 1')).scalar() == 'plaintext-token'
+
+        # The app works against the upgraded tables
+        client = app.test_client()
+        headers = login(client, type('Legacy', (), {'email': 'legacy@example.com'}))
+        assert client.get('/api/profile', headers=headers).json['user']['username'] == 'legacy'
+        assert client.get('/api/categories/1').json['pagination']['total'] == 1
+        assert [p['id'] for p in client.get('/api/search?q=smartphone').json['products']] == [1]
+
+        db.session.remove()
+
+
+def test_upgrade_is_idempotent(tmp_path):
+    app = legacy_app(tmp_path)
+    with app.app_context():
+        assert upgrade_schema()
+        assert upgrade_schema() == []
+        db.session.remove()
+
+
+def test_upgrade_of_current_schema_is_a_no_op(app):
+    assert upgrade_schema() == []
+
+
+def test_legacy_columns_are_dropped_only_on_request(tmp_path):
+    app = legacy_app(tmp_path)
+    with app.app_context():
+        assert not any('auth_token' in step for step in upgrade_schema())
+
+        # SQLite cannot drop the UNIQUE token columns, so they are cleared
+        assert 'cleared user.auth_token' in upgrade_schema(drop_columns=True)
+        assert db.session.execute(db.text('SELECT auth_token FROM user WHERE id = 1')).scalar() is None
+        assert upgrade_schema(drop_columns=True) == []
+        db.session.remove()
@@ -0,0 +1,91 @@
+"""
+Per-device login sessions: logout, refresh and the expired-session sweeper
+"""
+from datetime import datetime, timedelta
+
+from app.models import db, UserSession
+from tests.helpers import capture_statements, create_user
+
+
+def start(client, user, password='secret123'):
+    """(auth headers, refresh token) for a new login session"""
+    response = client.post('/api/auth/login', json={'email': user.email, 'password': password})
+    assert response.status_code == 200, response.json
+    return {'Authorization': f"Bearer {response.json['auth_token']}"}, response.json['refresh_token']
+
+
+def test_logout_ends_only_the_current_session(client):
+    user = create_user()
+    laptop, _ = start(client, user)
+    phone, _ = start(client, user)
+    assert UserSession.query.filter_by(user_id=user.id).count() == 2
+
+    assert client.post('/api/auth/logout', headers=laptop).status_code == 200
+
+    assert client.get('/api/profile', headers=laptop).status_code == 401
+    assert client.get('/api/profile', headers=phone).status_code == 200
+    assert UserSession.query.filter_by(user_id=user.id).count() == 1
+
+
+def test_password_change_ends_every_session(client):
+    user = create_user()
+    laptop, laptop_refresh = start(client, user)
+    phone, _ = start(client, user)
+
+    response = client.post('/api/profile/change-password', headers=laptop,
+                           json={'current_password': 'secret123', 'new_password': 'newsecret456'})
+    assert response.status_code == 200
+
+    assert client.get('/api/profile', headers=laptop).status_code == 401
+    assert client.get('/api/profile', headers=phone).status_code == 401
+    assert client.post('/api/auth/refresh', json={'refresh_token': laptop_refresh}).status_code == 401
+    assert UserSession.query.filter_by(user_id=user.id).count() == 0
+    assert client.get('/api/profile', headers=start(client, user, 'newsecret456')[0]).status_code == 200
+
+
+def test_refresh_replaces_the_session_access_token(client):
+    user = create_user()
+    laptop, laptop_refresh = start(client, user)
+    phone, _ = start(client, user)
+    # Cached principal for the old token
+    assert client.get('/api/profile', headers=laptop).status_code == 200
+
+    response = client.post('/api/auth/refresh', json={'refresh_token': laptop_refresh})
+    assert response.status_code == 200
+    refreshed = {'Authorization': f"Bearer {response.json['auth_token']}"}
+
+    assert client.get('/api/profile', headers=laptop).status_code == 401
+    assert client.get('/api/profile', headers=refreshed).status_code == 200
+    assert client.get('/api/profile', headers=phone).status_code == 200
+    # Same session, refreshed in place
+    assert UserSession.query.filter_by(user_id=user.id).count() == 2
+
+
+def test_expired_refresh_token_is_rejected(client):
+    user = create_user()
+    _, refresh_token = start(client, user)
+    session = UserSession.find_by_refresh_token(refresh_token)
+    session.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+    assert client.post('/api/auth/refresh', json={'refresh_token': refresh_token}).status_code == 401
+    assert client.post('/api/auth/refresh', json={'refresh_token': 'unknown'}).status_code == 401
+
+
+def test_sweep_deletes_expired_sessions_in_batches(app):
+    user = create_user()
+    now = datetime.utcnow()
+    for number in range(7):
+        session = UserSession(user=user)
+        session.set_refresh_token()
+        if number < 5:
+            session.expires_at = now - timedelta(minutes=number + 1)
+        db.session.add(session)
+    db.session.commit()
+
+    with capture_statements() as statements:
+        assert UserSession.sweep_expired(batch_size=2) == 5
+    assert sum(statement.startswith('DELETE FROM user_session') for statement in statements) == 3
+    remaining = UserSession.query.filter_by(user_id=user.id).all()
+    assert len(remaining) == 2 and all(session.expires_at > now for session in remaining)
+    assert UserSession.sweep_expired(batch_size=2) == 0
@@ -0,0 +1,131 @@
+import pytest
+
+from app.models import db, Order, OrderItem, ProductImage, ProductVariant, CartItem, wishlist
+from tests.helpers import create_category, create_product, capture_statements
+
+
+def create_orders(user, products, count):
+    for number in range(count):
+        order = Order(order_number=f'ORD-{user.id}-{number}', user_id=user.id, subtotal=0, total_amount=0)
+        order.order_items = [OrderItem(product_id=product.id, product_name=product.name, product_sku=product.sku,
+                                       quantity=1, unit_price=product.price, total_price=product.price)
+                             for product in products]
+        db.session.add(order)
+    db.session.commit()
+    return order
+
+
+def statement_count(client, url, headers):
+    with capture_statements() as statements:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.json
+    return len(statements)
+
+
+def test_profile_statement_count(client, customer):
+    _, headers = customer
+    # Session lookup only (no wishlist load), then served from the token cache
+    assert statement_count(client, '/api/profile', headers) == 1
+    assert statement_count(client, '/api/profile', headers) == 0
+
+
+# Constant in the number of orders and order lines
+@pytest.mark.parametrize('orders,lines', [(1, 1), (8, 4)])
+def test_order_statement_counts(client, customer, admin, orders, lines):
+    user, headers = customer
+    category = create_category()
+    products = [create_product(category, sku=f'SKU-{number}') for number in range(lines)]
+    order = create_orders(user, products, orders)
+    admin_headers = admin[1]
+    # Warm the token cache so only the endpoint's own statements are counted
+    client.get('/api/profile', headers=headers)
+    client.get('/api/profile', headers=admin_headers)
+
+    # Page, selectin order items, COUNT
+    assert statement_count(client, '/api/orders', headers) == 3
+    # Order, payments, order items, product images
+    assert statement_count(client, f'/api/orders/{order.id}', headers) == 4
+    assert statement_count(client, '/api/admin/orders', admin_headers) == 3
+
+
+# List endpoints, uncached, for a small and a larger page of a small and a larger catalog
+SIZES = pytest.mark.parametrize('rows,per_page', [(2, 2), (9, 6)])
+UNCACHED = pytest.mark.parametrize('app', [{'CACHE_TYPE': 'null'}], indirect=True)
+
+
+@pytest.fixture
+def catalog(request, customer, admin):
+    """rows products in a subcategory, each with images and a variant, in the customer's cart and wishlist"""
+    user, headers = customer
+    rows = request.node.callspec.params['rows']
+    electronics = create_category('Electronics')
+    phones = create_category('Phones', parent=electronics)
+    products = [create_product(phones, sku=f'SKU-{number}', name=f'Phone {number}', tags='mobile')
+                for number in range(rows)]
+    for product in products:
+        db.session.add_all([
+            ProductImage(product_id=product.id, image_url=f'/{product.id}-1.jpg', is_primary=True),
+            ProductImage(product_id=product.id, image_url=f'/{product.id}-2.jpg'),
+            ProductVariant(product_id=product.id, name='Blue', sku=f'{product.sku}-BLUE', stock_quantity=3),
+            CartItem(user_id=user.id, product_id=product.id, quantity=1),
+        ])
+        db.session.execute(wishlist.insert().values(user_id=user.id, product_id=product.id))
+    db.session.commit()
+    create_orders(user, products, rows)
+    return electronics, headers, admin[1]
+
+
+def steady_count(client, url, headers):
+    """Statements for a repeated request (token cache and category tree warm)"""
+    client.get(url, headers=headers)
+    return statement_count(client, url, headers)
+
+
+@UNCACHED
+@SIZES
+def test_product_list_statement_count(client, catalog, rows, per_page):
+    _, headers, _ = catalog
+    # Catalog version, page, selectin images, COUNT
+    assert steady_count(client, f'/api/products?per_page={per_page}', headers) == 4
+    # Keyset mode skips the COUNT
+    assert steady_count(client, f'/api/products?per_page={per_page}&cursor=', headers) == 3
+
+
+@UNCACHED
+@SIZES
+def test_category_detail_statement_count(client, catalog, rows, per_page):
+    electronics, headers, _ = catalog
+    # Category, its path, subtree page, selectin images, COUNT
+    assert steady_count(client, f'/api/categories/{electronics.id}?per_page={per_page}', headers) == 5
+
+
+@UNCACHED
+@SIZES
+def test_search_statement_count(client, catalog, rows, per_page):
+    _, headers, _ = catalog
+    # Page, selectin images, COUNT
+    assert steady_count(client, f'/api/search?q=phone&per_page={per_page}', headers) == 3
+
+
+@UNCACHED
+@SIZES
+def test_wishlist_statement_count(client, catalog, rows, per_page):
+    _, headers, _ = catalog
+    # Products joined to the wishlist, selectin images
+    assert steady_count(client, '/api/wishlist', headers) == 2
+
+
+@UNCACHED
+@SIZES
+def test_cart_statement_count(client, catalog, rows, per_page):
+    _, headers, _ = catalog
+    # Cart items with products and variants, selectin images
+    assert steady_count(client, '/api/cart', headers) == 2
+
+
+@UNCACHED
+@SIZES
+def test_admin_dashboard_statement_count(client, catalog, rows, per_page):
+    _, _, admin_headers = catalog
+    # Sales stats, four counts, recent orders with customers, products and order items
+    assert steady_count(client, '/api/admin/dashboard', admin_headers) == 8
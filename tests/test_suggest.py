@@ -0,0 +1,51 @@
+from app.models import db, Product
+from app.search import suggest_index
+from tests.helpers import create_category
+
+
+def seed(category, count):
+    # Alphabetically first, never sold
+    db.session.add_all(Product(name=f'Phone A{number:04d}', sku=f'A-{number}', price=1.0,
+                               category_id=category.id, sold_count=0, tags='mobile')
+                       for number in range(count))
+    best = Product(name='Phone Zeta', sku='ZETA', price=1.0, category_id=category.id, sold_count=100,
+                   tags='mobile, zeta')
+    db.session.add(best)
+    db.session.commit()
+    return best
+
+
+def names(result):
+    return [product['name'] for product in result['products']]
+
+
+def test_best_seller_beyond_the_first_keys_is_suggested(app):
+    seed(create_category(), 600)
+
+    assert names(suggest_index.suggest('pho', 3))[0] == 'Phone Zeta'
+    assert names(suggest_index.suggest('phone z', 3)) == ['Phone Zeta']
+
+
+def test_reindexed_product_is_reranked(app):
+    category = create_category()
+    best = seed(category, 30)
+    assert names(suggest_index.suggest('ph', 1)) == ['Phone Zeta']
+
+    runner_up = db.session.query(Product).filter_by(sku='A-7').one()
+    runner_up.sold_count = 500
+    db.session.commit()
+    suggest_index.update_product(runner_up)
+    assert names(suggest_index.suggest('ph', 2)) == ['Phone A0007', 'Phone Zeta']
+
+    best.is_active = False
+    db.session.commit()
+    suggest_index.update_product(best)
+    assert 'Phone Zeta' not in names(suggest_index.suggest('ph', 20))
+    assert suggest_index.suggest('zet')['tags'] == []
+
+
+def test_limit_is_at_least_one(app):
+    seed(create_category(), 3)
+
+    assert len(suggest_index.suggest('phone', 0)['products']) == 1
+    assert len(suggest_index.suggest('phone', -4)['products']) == 1